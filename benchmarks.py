@@ -0,0 +1,453 @@
+"""Benchmarks for the scraping and storage code
+
+All scraping benchmarks run against the recorded pages in fixtures/, served by a local FixtureServer.
+Run with `python benchmarks.py [--output results.json]`, results are written as JSON for regression tracking
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List
+
+from tabulate import tabulate
+
+from columns import area_of, columns_of
+from fetcher import AsyncFetcher
+from notify import split_table
+from parsers import available_parsers, get_parser
+from replay import FIXTURES_DIR, FixtureServer
+from scrapers import DataStorage, Property, RightMoveScraper, SiteScraper, UniHomesScraper, ZooplaScraper
+from storage import SQLiteDataStorage
+from tables import TableCache
+
+LOCATIONS = ['Camberwell Grove, London SE5', 'Denmark Hill, London SE5', 'Walworth Road, London SE17',
+             'Borough High Street, London SE1', 'Peckham Road, London SE15', 'Brixton Hill, London SW9']
+
+
+class UnslottedProperty:
+    """The previous Property layout, with a __dict__ and the date kept as a string, as a memory baseline
+    """
+
+    def __init__(self, prop: Property):
+        self.date_added = prop.getDateAdded()
+        self.num_people = prop.num_people
+        self.pricepm = prop.getPricePM()
+        self.pricepw = prop.getPricePW()
+        # Copied so the baseline does not benefit from Property's interning
+        self.location = ''.join(prop.getLocation())
+        self.link = prop.getLink()
+        self.propertyId = prop.getPropertyId()
+
+
+def make_properties(num_properties: int, seed: int = 0) -> List[Property]:
+    """Builds num_properties synthetic RightMove-like properties with unique propertyIds
+    """
+
+    rng = random.Random(seed)
+    today = datetime.now()
+    properties = []
+    for i in range(num_properties):
+        prop = Property(4)
+        date_added = (today - timedelta(days=rng.randint(0, 365))).strftime('%d/%m/%Y')
+        prop.addDateAdded(date_added)
+        prop.addPricePM(str(rng.randint(2400, 4200)))
+        prop.addPricePW(str(rng.randint(550, 970)))
+        prop.addLocation(f'{rng.randint(1, 200)} {rng.choice(LOCATIONS)}')
+        prop.addLink(f'https://rightmove.co.uk/properties/{138400000 + i}#/?channel=RES_LET')
+        prop.propertyId = f'RM{138400000 + i}'
+        properties.append(prop)
+    return properties
+
+
+def measure_allocated(build) -> int:
+    """Returns the number of bytes still allocated by build() once it returns
+    """
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        allocated, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return allocated
+
+
+def benchmark_storage_memory(num_properties: int) -> dict:
+    """Measures memory per stored listing, against the previous format of one dict per listing next to its Property
+
+    The slotted records are reported apart from the indexes DataStorage keeps over them (by propertyId, date order
+    and duplicate fingerprints), which the previous format did not have, so the record saving is not hidden by them
+
+    Returns:
+        dict: The bytes per listing of the records, of the indexes and of both, of the dict records, and their ratios
+    """
+
+    def build_storage():
+        storage = DataStorage()
+        storage.add_properties(make_properties(num_properties))
+        return storage
+
+    def build_records():
+        return make_properties(num_properties)
+
+    def build_dict_records():
+        # Previous storage format: the scraped property plus a six-key dict holding a datetime
+        scraped = [UnslottedProperty(prop) for prop in make_properties(num_properties)]
+        records = [{
+            'propertyId': prop.propertyId,
+            'dateAdded': datetime.strptime(prop.date_added, '%d/%m/%Y'),
+            'ppm': prop.pricepm,
+            'pppw': prop.pricepw,
+            'location': prop.location,
+            'link': prop.link
+        } for prop in scraped]
+        return scraped, records
+
+    storage_bytes = measure_allocated(build_storage)
+    record_bytes = measure_allocated(build_records)
+    dict_bytes = measure_allocated(build_dict_records)
+
+    return {
+        'benchmark': 'storage_memory',
+        'listings': num_properties,
+        'record_bytes_per_listing': round(record_bytes / num_properties, 1),
+        'index_bytes_per_listing': round((storage_bytes - record_bytes) / num_properties, 1),
+        'bytes_per_listing': round(storage_bytes / num_properties, 1),
+        'dict_records_bytes_per_listing': round(dict_bytes / num_properties, 1),
+        'record_ratio': round(record_bytes / dict_bytes, 3),
+        'ratio': round(storage_bytes / dict_bytes, 3),
+    }
+
+
+def property_fields(properties: List[Property]) -> List[tuple]:
+    return [(prop.getPropertyId(), prop.getDateOrdinal(), prop.getPricePM(), prop.getPricePW(), prop.getLocation(), prop.getLink())
+            for prop in properties]
+
+
+def benchmark_parsers(scrapers: List[SiteScraper], repeat: int) -> List[dict]:
+    """Times every available parser backend on the recorded pages of each scraper's site
+
+    Each backend's output is compared with the reference SoupParser's, so a backend that is fast
+    but extracts different listings is reported with matches_reference set to false
+
+    Returns:
+        List[dict]: One result per site and backend, with the median parse time per page in milliseconds
+    """
+
+    results = []
+    for scraper in scrapers:
+        site = scraper.SITE
+        pages = [open(path, encoding='utf-8').read() for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, site, '*.html')))]
+
+        scraper.parser = get_parser('soup')
+        reference = [property_fields(scraper.parse_html(html)) for html in pages]
+
+        for name in available_parsers():
+            scraper.parser = get_parser(name)
+            timings = []
+            for _ in range(repeat):
+                for html in pages:
+                    start = time.perf_counter()
+                    scraper.parse_html(html)
+                    timings.append(time.perf_counter() - start)
+            results.append({
+                'benchmark': 'parse_page',
+                'site': site,
+                'parser': name,
+                'pages': len(pages),
+                'median_ms_per_page': round(statistics.median(timings) * 1000, 3),
+                'matches_reference': [property_fields(scraper.parse_html(html)) for html in pages] == reference,
+            })
+    return results
+
+
+def fixture_urls(scrapers: List[SiteScraper]) -> List[str]:
+    # The scrapers only learn their number of pages from a fetched first page
+    urls = []
+    for scraper in scrapers:
+        scraper.fetch_pages()
+        first_page = scraper.SPEC.pagination.first_page
+        urls += [scraper.page_url(page) for page in range(first_page, first_page + scraper.num_of_pages())]
+    return urls
+
+
+def benchmark_fetch(server: FixtureServer, urls: List[str], repeat: int) -> dict:
+    """Times fetching each recorded page from the local stand-in, without rate limiting
+
+    Returns:
+        dict: The median and 95th percentile fetch time per page in milliseconds
+    """
+
+    async def fetch_all() -> List[float]:
+        timings = []
+        async with AsyncFetcher(per_host_interval=0) as fetcher:
+            for _ in range(repeat):
+                for url in urls:
+                    start = time.perf_counter()
+                    await fetcher.fetch(url)
+                    timings.append(time.perf_counter() - start)
+        return timings
+
+    timings = sorted(asyncio.run(fetch_all()))
+    return {
+        'benchmark': 'fetch_page',
+        'pages': len(urls),
+        'median_ms_per_page': round(statistics.median(timings) * 1000, 3),
+        'p95_ms_per_page': round(timings[int(len(timings) * 0.95) - 1] * 1000, 3),
+    }
+
+
+def benchmark_add_properties(sizes: List[int]) -> List[dict]:
+    """Measures DataStorage.add_properties throughput, in memory and on SQLite, for batches of each size
+
+    Returns:
+        List[dict]: One result per storage and size, in listings added per second
+    """
+
+    results = []
+    for size in sizes:
+        properties = make_properties(size)
+        with tempfile.TemporaryDirectory() as directory:
+            storages = {'memory': DataStorage(), 'sqlite': SQLiteDataStorage(os.path.join(directory, 'benchmark.db'))}
+            for name, storage in storages.items():
+                start = time.perf_counter()
+                storage.add_properties(storage.check_new_properties(properties))
+                elapsed = time.perf_counter() - start
+                results.append({
+                    'benchmark': 'add_properties',
+                    'storage': name,
+                    'listings': size,
+                    'seconds': round(elapsed, 4),
+                    'listings_per_second': round(size / elapsed),
+                })
+            storages['sqlite'].close()
+    return results
+
+
+def benchmark_queries(num_properties: int, repeat: int) -> List[dict]:
+    """Times the stored-listing queries on PropertyColumns against the same queries written as loops over the properties
+
+    Returns:
+        List[dict]: One result per query, with the median seconds of each approach (the columns are built once, outside the timings)
+    """
+
+    storage = DataStorage()
+    storage.add_properties(make_properties(num_properties))
+    properties = storage.get_properties()
+    start = time.perf_counter()
+    columns = columns_of(storage)
+    build_seconds = time.perf_counter() - start
+    median_ordinal = int(statistics.median(columns.date_ordinals))
+
+    def loop_area_stats():
+        by_area = {}
+        for prop in properties:
+            by_area.setdefault(area_of(prop.getLocation()), []).append(prop.getPricePW())
+        return {area: statistics.quantiles(prices, n=4, method='inclusive') for area, prices in by_area.items()}
+
+    queries = {
+        'price_band': (lambda: [prop for prop in properties if 150 <= prop.getPricePW() <= 250],
+                       lambda: columns.select(columns.price_band(150, 250))),
+        'date_range': (lambda: [prop for prop in properties if prop.getDateOrdinal() >= median_ordinal],
+                       lambda: columns.select(columns.date_range(median_ordinal))),
+        'location_prefix': (lambda: [prop for prop in properties if prop.getLocation().lower().startswith('denmark')],
+                            lambda: columns.select(columns.location_prefix('denmark'))),
+        'cheapest_10': (lambda: sorted(properties, key=Property.getPricePW)[:10],
+                        lambda: columns.cheapest(10)),
+        'area_stats': (loop_area_stats, lambda: columns.area_stats()),
+    }
+
+    results = []
+    for name, (loop_query, column_query) in queries.items():
+        timings = {}
+        for approach, query in (('loop', loop_query), ('columns', column_query)):
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                runs.append(time.perf_counter() - start)
+            timings[approach] = statistics.median(runs)
+        results.append({
+            'benchmark': 'query',
+            'query': name,
+            'listings': num_properties,
+            'loop_seconds': round(timings['loop'], 5),
+            'columns_seconds': round(timings['columns'], 5),
+            'columns_build_seconds': round(build_seconds, 4),
+        })
+    return results
+
+
+def benchmark_latest(num_properties: int, commands: int, repeat: int) -> List[dict]:
+    """Times a burst of concurrent !latest commands, each rendering its table, against the same burst served by a TableCache
+
+    The commands run as concurrent tasks on one event loop, like commands from many users; a new property is stored
+    halfway through each burst, so the cached tables are rendered again once per burst
+
+    Returns:
+        List[dict]: One result per approach, with the burst's total seconds and the median and 95th percentile command latency
+    """
+
+    storage = DataStorage()
+    storage.add_properties(make_properties(num_properties))
+    extra = iter(make_properties(commands * repeat * 2, seed=1))
+
+    def render_latest() -> List[str]:
+        rows = [prop.to_dict() for prop in storage.get_latest_properties(20)]
+        table = tabulate(rows, headers="keys", tablefmt="pipe", numalign="left", stralign="center")
+        return split_table('Latest 20 properties found:', table)
+
+    table_cache = TableCache()
+
+    def cached_latest() -> List[str]:
+        return split_table('Latest 20 properties found:', table_cache.latest_table(storage, 20))
+
+    async def burst(command) -> List[float]:
+        async def run(index: int) -> float:
+            await asyncio.sleep(0)
+            if index == commands // 2:
+                storage.add_property(next(extra))
+            start = time.perf_counter()
+            command()
+            return time.perf_counter() - start
+        return list(await asyncio.gather(*(run(index) for index in range(commands))))
+
+    results = []
+    for approach, command in (('render', render_latest), ('cached', cached_latest)):
+        totals, latencies = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            latencies += asyncio.run(burst(command))
+            totals.append(time.perf_counter() - start)
+        latencies.sort()
+        results.append({
+            'benchmark': 'latest_burst',
+            'approach': approach,
+            'listings': num_properties,
+            'commands': commands,
+            'median_burst_seconds': round(statistics.median(totals), 4),
+            'median_ms_per_command': round(statistics.median(latencies) * 1000, 4),
+            'p95_ms_per_command': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 4),
+        })
+    return results
+
+
+def benchmark_bot_scrape(server: FixtureServer, repeat: int) -> dict:
+    """Times PropertyBot.scrape end to end against the local stand-in, from fetching to storing, and its peak memory
+
+    The bot is built without connecting to Discord. Scrapes are full sweeps into an empty store,
+    so every run does the same work; fetches are rate limited as in production
+
+    Returns:
+        dict: The median scrape time in seconds and the peak memory allocated by the bot's process during a scrape
+    """
+
+    # Imported here so the other benchmarks run without discord.py installed
+    import discord
+    from bot import PropertyBot
+
+    async def scrape_all() -> dict:
+        bot = PropertyBot(command_prefix='!', intents=discord.Intents.none(), BOT_TOKEN='', COMMAND_CHANNEL_ID=0, UPDATE_CHANNEL_ID=0,
+                          PASTEBIN_API_KEY='', PASTEBIN_USERNAME='', PASTEBIN_PASSWORD='')
+        search = bot.add_parameters(max_ppw=250, num_bedrooms=4, num_ppl=4)
+        group = bot.searches.group_of(search)
+        for scraper in (RightMoveScraper(0, 9000, 4, 4, base_url=server.url, incremental=False), UniHomesScraper(0, 250, 4, 4, base_url=server.url),
+                        ZooplaScraper(0, 4344, 4, 4, base_url=server.url, incremental=False)):
+            group.set_scraper(scraper.SITE, scraper)
+        timings, found, peak = [], 0, 0
+        try:
+            for _ in range(repeat):
+                search.data_storage = DataStorage()
+                tracemalloc.start()
+                start = time.perf_counter()
+                found = len((await bot.scrape())[search])
+                timings.append(time.perf_counter() - start)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        finally:
+            bot.scrape_executor.shutdown()
+        return {'timings': timings, 'found': found, 'peak': peak}
+
+    # The bot logs to stdout, which may be carrying the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        run = asyncio.run(scrape_all())
+    return {
+        'benchmark': 'bot_scrape',
+        'listings': run['found'],
+        'median_seconds': round(statistics.median(run['timings']), 4),
+        'peak_traced_bytes': run['peak'],
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+BENCHMARKS = ['memory', 'parse', 'fetch', 'storage', 'query', 'latest', 'scrape']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the scraper and storage benchmarks')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS, help='benchmarks to run, all by default')
+    parser.add_argument('--listings', type=int, default=100000, help='number of synthetic listings for the storage memory and query benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='batch sizes for the add_properties benchmark')
+    parser.add_argument('--commands', type=int, default=1000, help='number of concurrent commands in each burst of the latest benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='number of repetitions of the page and scrape benchmarks')
+    parser.add_argument('--output', help='file to write the JSON results to, printed if not given')
+    args = parser.parse_args()
+
+    results = []
+    if 'memory' in args.benchmarks:
+        results.append(benchmark_storage_memory(args.listings))
+    if 'storage' in args.benchmarks:
+        results += benchmark_add_properties(args.sizes)
+    if 'query' in args.benchmarks:
+        results += benchmark_queries(args.listings, args.repeat)
+    if 'latest' in args.benchmarks:
+        results += benchmark_latest(args.listings, args.commands, args.repeat)
+
+    with FixtureServer() as server:
+        scrapers = [RightMoveScraper(0, 9000, 4, 4, base_url=server.url), UniHomesScraper(0, 250, 4, 4, base_url=server.url),
+                    ZooplaScraper(0, 4344, 4, 4, base_url=server.url)]
+        if 'fetch' in args.benchmarks:
+            results.append(benchmark_fetch(server, fixture_urls(scrapers), args.repeat))
+        if 'parse' in args.benchmarks:
+            results += benchmark_parsers(scrapers, args.repeat)
+        if 'scrape' in args.benchmarks:
+            results.append(benchmark_bot_scrape(server, args.repeat))
+
+    report = json.dumps({'meta': run_metadata(), 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,24 @@
 from scrapers import *
-import requests
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Dict
+from executor import QueueScrapeExecutor, ScrapeExecutor
+from jobqueue import JobQueue
+from transport import Transport
+from storage import SQLiteDataStorage
+from cache import ResponseCache
+from parsers import default_parser, get_parser
+from searches import Search, SearchRegistry
+from columns import PropertyColumns, columns_of
+from tables import TableCache
+from notify import NotificationDispatcher
+from export import ExportCache, PasteBinClient, get_export_format
+from metrics import METRICS, MetricsServer
+from scheduling import AdaptiveSchedule
+from snapshot import SNAPSHOT_INTERVAL, Snapshot, read_snapshot, store_columns, write_snapshot
 from discord.ext import commands
 from tabulate import tabulate
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -16,32 +35,45 @@ Rightmove calculations: pppw * 4 * 4.34524 = pm
 """
 
 class PropertyBot(commands.Bot):
-    PB_API_USERKEY_URL = 'https://pastebin.com/api/api_login.php'
-    PB_API_PASTE_URL = 'https://pastebin.com/api/api_post.php'
-
     weeks_per_month = 4.34524
     
-    def __init__(self, command_prefix, intents, BOT_TOKEN, COMMAND_CHANNEL_ID, UPDATE_CHANNEL_ID, PASTEBIN_API_KEY, PASTEBIN_USERNAME, PASTEBIN_PASSWORD):
+    def __init__(self, command_prefix, intents, BOT_TOKEN, COMMAND_CHANNEL_ID, UPDATE_CHANNEL_ID, PASTEBIN_API_KEY, PASTEBIN_USERNAME, PASTEBIN_PASSWORD, DATABASE_PATH=None, CACHE_DIR=None, PARSER=None, METRICS_PORT=None, SNAPSHOT_PATH=None, HTTP2=None, HTTP_TIMEOUT=None, SITES=None, WORKER_QUEUE=None):
         super().__init__(command_prefix=command_prefix, intents=intents)
         """Initialises the bot with the given command prefix, intents, and token
 
-        Initialises various variables used for calculations and initialising scrapers later
-        (e.g. min_price_per_week, max_price_per_week, num_bedrooms)
-
-        Creates objects for storing data and scheduling jobs
+        Creates the registry of searches, each channel registering its own search with its own store,
+        and objects for scheduling jobs. Properties are stored in SQLite databases next to DATABASE_PATH
+        if one is given and in memory otherwise.
+        If CACHE_DIR is given, fetched pages are cached there and refetched with conditional requests.
+        PARSER picks the scrapers' parser backend (soup, strainer, lxml or json), lxml by default or strainer without the lxml package.
+        If METRICS_PORT is given, scrape metrics are served in the Prometheus text format on that local port.
+        If SNAPSHOT_PATH is given, the searches, in-memory stores and scrape schedule are saved there every few minutes
+        and on shutdown, and restored from there on startup.
+        Every request goes through one pooled Transport, speaking HTTP/2 if HTTP2 is set and
+        giving up on a request after HTTP_TIMEOUT seconds, 30 by default.
+        SITES is a comma separated list of the sites scraped, every site in SITE_SCRAPERS by default.
+        If WORKER_QUEUE is given, scrapes are queued as jobs in the SQLite database at that path and run by
+        `python -m worker` processes instead of in the bot's own process
 
         Retrieves the bot's token and channel ids from the .env file and stores them in instance variables
 
         """
 
-        self.min_price_per_week, self.max_price_per_week = 0, 0
-
-        self.min_price_per_month, self.max_price_per_month = 0, 0
-        self.num_bedrooms = 0
-        self.num_people = 0
-
-        self.data_storage = DataStorage()
+        self.DATABASE_PATH = DATABASE_PATH
+        self.searches = SearchRegistry(self.new_data_storage)
         self.scheduler = AsyncIOScheduler()
+        self.scrape_schedule = AdaptiveSchedule()
+        self.SNAPSHOT_PATH = SNAPSHOT_PATH
+        self.snapshot_key = None
+        self.scrape_executor = QueueScrapeExecutor(JobQueue(WORKER_QUEUE)) if WORKER_QUEUE else ScrapeExecutor()
+        self.response_cache = ResponseCache(CACHE_DIR) if CACHE_DIR else None
+        self.transport = Transport(http2=str(HTTP2).lower() in ('1', 'true', 'yes'), total_timeout=float(HTTP_TIMEOUT) if HTTP_TIMEOUT else 30.0)
+        self.parser_name = PARSER or default_parser()
+        self.site_names = [site.strip() for site in SITES.split(',') if site.strip()] if SITES else list(SITE_SCRAPERS)
+        unknown_sites = [site for site in self.site_names if site not in SITE_SCRAPERS]
+        if unknown_sites:
+            raise ValueError(f"Unknown sites {', '.join(unknown_sites)}, expected some of {', '.join(SITE_SCRAPERS)}")
+        self.notifier = NotificationDispatcher(partial(self.properties_to_table, tablefmt='pipe'))
 
         self.BOT_TOKEN = BOT_TOKEN
         self.COMMAND_CHANNEL_ID = COMMAND_CHANNEL_ID
@@ -49,6 +81,10 @@ class PropertyBot(commands.Bot):
         self.PB_API_KEY = PASTEBIN_API_KEY
         self.PB_USERNAME = PASTEBIN_USERNAME
         self.PB_PASSWORD = PASTEBIN_PASSWORD
+        self.pastebin = PasteBinClient(PASTEBIN_API_KEY, PASTEBIN_USERNAME, PASTEBIN_PASSWORD, transport=self.transport)
+        self.export_cache = ExportCache()
+        self.table_cache = TableCache()
+        self.metrics_server = MetricsServer(METRICS, int(METRICS_PORT)).start() if METRICS_PORT else None
         
     async def on_ready(self):
         """Prints the bot's name and guilds to the console when the bot is ready to use
@@ -61,95 +97,271 @@ class PropertyBot(commands.Bot):
         print(f'{self.user.name} is connected to the following guilds:\n')
         for guild in self.guilds:
             print(guild)
+        if self.searches or await self.restore_snapshot():
+            await self.update_channel.send(f"Bot ready! Resumed {len(self.searches)} searches, see !countdown for the next scrapes")
+            return
         await self.update_channel.send("Bot ready! Initialise scraping with the following command: !initialise [max price per week] [number of bedrooms] [number of people]")
 
+    async def close(self):
+        """Sends any queued notifications, saves a last snapshot, removes the export files, and shuts down the scrape executor's worker pools and the HTTP transport before shutting the bot down
+        """
+
+        await self.save_snapshot()
+        await self.notifier.close()
+        self.export_cache.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        self.scrape_executor.shutdown()
+        self.transport.close()
+        await super().close()
+
     def run_bot(self):
         """Runs the bot with the given token
         """
 
         self.run(self.BOT_TOKEN)
 
-    def add_parameters(self, max_ppw: int, num_bedrooms: int, num_ppl: int):
-        """Adds the given parameters to the bot's instance variables
+    def new_data_storage(self, channel_id: int) -> DataStorage:
+        """Creates the DataStorage of a new search
+
+        The command channel's search uses the database at DATABASE_PATH, other channels get their own database next to it
+
+        Args:
+            channel_id (int): The id of the channel the search is registered from
+        """
+
+        if not self.DATABASE_PATH:
+            return DataStorage()
+        if channel_id == self.COMMAND_CHANNEL_ID:
+            return SQLiteDataStorage(self.DATABASE_PATH)
+        root, ext = os.path.splitext(self.DATABASE_PATH)
+        return SQLiteDataStorage(f'{root}_{channel_id}{ext}')
+
+    def add_parameters(self, max_ppw: int, num_bedrooms: int, num_ppl: int, channel_id: int = None) -> Search:
+        """Registers a search with the given parameters for the given channel, replacing the channel's previous search
 
         Performs a calculation to convert max_ppw to a price per month
 
         Args:
             max_ppw (int): The maximum price per person per week
             num_bedrooms (int): The number of bedrooms
-        """
-        self.add_num_people(num_ppl)
-        self.add_price_per_week(max_ppw)
-        self.add_num_bedrooms(num_bedrooms)
-        self.add_price_per_month(int(max_ppw * PropertyBot.weeks_per_month * num_ppl))
-    
-    def add_num_people(self, num_people: int):
-        """Adds the given number of people to the bot's instance va riable num_people
+            num_ppl (int): The number of people
+            channel_id (int): The id of the channel registering the search, the command channel by default
 
-        Args:
-            num_people (int): The number of people to add
+        Returns:
+            Search: The registered search
         """
 
-        self.num_people = num_people
+        if channel_id is None:
+            channel_id = self.COMMAND_CHANNEL_ID
+        return self.searches.register(channel_id, max_ppw, int(max_ppw * PropertyBot.weeks_per_month * num_ppl), num_bedrooms, num_ppl)
 
-    def add_price_per_week(self, ppw: int):
-        """Adds the given price per week to the bot's instance variable max_price_per_week
+    def update_channel_for(self, search: Search):
+        """Returns the channel new properties of the given search are sent to
 
-        Args:
-            ppw (int): The price per week to add
+        The command channel's search reports to the update channel, other searches report to the channel they were registered from
         """
 
-        self.max_price_per_week = ppw
+        if search.channel_id == self.COMMAND_CHANNEL_ID:
+            return self.update_channel
+        return self.get_channel(search.channel_id)
     
-    def add_price_per_month(self, ppm: int):
-        """Adds the given price per month to the bot's instance variable max_price_per_month
+    async def initialise_scrapers(self):
+        """Builds the scrapers of any search group that has none yet, runs a scrape and schedules the auto_rescrape() method for each site
 
-        Args:
-            ppm (int): The price per month to add
+        Each site gets its own job, rescheduled after every scrape of the site by the bot's AdaptiveSchedule.
+        Safe to call again after registering another search: jobs are only added and the scheduler only started once
+        """
+
+        self.build_scrapers()
+        await self.scrape()
+        self.schedule_jobs()
+        await self.save_snapshot()
+
+    def build_scrapers(self):
+        """Gives every search group a scraper for each of the bot's sites it has none for yet
+
+        The scrapers fetch nothing until they are first scraped, so they are built on the event loop
         """
 
-        self.max_price_per_month = ppm
+        for group in self.searches.groups.values():
+            for site in self.site_names:
+                if site not in group.scrapers_by_site:
+                    scraper_class = SITE_SCRAPERS[site]
+                    group.set_scraper(site, scraper_class(0, group.max_price(scraper_class.SPEC.price_filter), group.num_bedrooms, group.num_people,
+                                                          is_known_property=group.is_known, response_cache=self.response_cache,
+                                                          parser=get_parser(self.parser_name), transport=self.transport))
 
-    def add_num_bedrooms(self, num_bedrooms: int):
-        """Adds the given number of bedrooms to the bot's instance variable num_bedrooms
+    def schedule_jobs(self, next_runs: Dict[str, float] = None):
+        """Adds the missing auto_rescrape job of each site and the snapshot job, and starts the scheduler if needed
 
         Args:
-            num_bedrooms (int): The number of bedrooms to add
+            next_runs (Dict[str, float]): The unix time each site's first run is due at, e.g. restored from a snapshot.
+                Sites missing from it first run after their current interval, and overdue sites run straight away
         """
 
-        self.num_bedrooms = num_bedrooms
-    
-    def initialise_scrapers(self):
-        """Initialises the RightMoveScraper and UniHomesScraper objects and schedules the auto_rescrape() method to run every hour
+        next_runs = next_runs or {}
+        for site in self.sites():
+            if self.scheduler.get_job(f"auto_rescrape_{site}") is None:
+                first_run = {}
+                if site in next_runs:
+                    first_run['next_run_time'] = datetime.fromtimestamp(max(next_runs[site], time.time()), timezone.utc)
+                self.scheduler.add_job(self.auto_rescrape, 'interval', seconds=self.scrape_schedule.site(site).interval, args=[site],
+                                       id=f"auto_rescrape_{site}", coalesce=True, max_instances=1, **first_run)
+        if self.SNAPSHOT_PATH and self.scheduler.get_job("snapshot") is None:
+            self.scheduler.add_job(self.save_snapshot, 'interval', seconds=SNAPSHOT_INTERVAL, id="snapshot", coalesce=True, max_instances=1)
+        if not self.scheduler.running:
+            self.scheduler.start()
+
+    def take_snapshot(self) -> Snapshot:
+        """Returns a Snapshot of the registered searches, their in-memory stores, the scrape schedule, the next run of each site
+        and the high-water mark of each scraper, so incremental scrapes carry on after a restart instead of sweeping every page
+        """
+
+        searches = [{
+            'channel_id': search.channel_id,
+            'max_price_per_week': search.max_price_per_week,
+            'max_price_per_month': search.max_price_per_month,
+            'num_bedrooms': search.num_bedrooms,
+            'num_people': search.num_people,
+        } for search in self.searches.searches.values()]
+        stores = {search.channel_id: search.data_storage for search in self.searches.searches.values()
+                  if not isinstance(search.data_storage, SQLiteDataStorage)}
+        next_runs = {}
+        for site in self.sites():
+            job = self.scheduler.get_job(f"auto_rescrape_{site}")
+            if job is not None and job.next_run_time is not None:
+                next_runs[site] = job.next_run_time.timestamp()
+        scrapers = [{
+            'num_bedrooms': group.num_bedrooms,
+            'num_people': group.num_people,
+            'site': site,
+            'high_water_mark': scraper.high_water_mark,
+            'scrapes_since_full_sweep': scraper.scrapes_since_full_sweep,
+        } for group in self.searches.groups.values() for site, scraper in group.scrapers_by_site.items()]
+        return Snapshot(searches, stores, self.scrape_schedule.state(), next_runs, scrapers=scrapers)
+
+    async def save_snapshot(self):
+        """Writes a snapshot to SNAPSHOT_PATH in the executor's threads, unless nothing changed since the last one
         """
 
-        self.RMscraper = RightMoveScraper(self.min_price_per_month, self.max_price_per_month, self.num_bedrooms, self.num_people)
-        self.UHscraper = UniHomesScraper(self.min_price_per_week, self.max_price_per_week, self.num_bedrooms, self.num_people)
+        if not self.SNAPSHOT_PATH or not self.searches:
+            return
+        snapshot = self.take_snapshot()
+        key = (json.dumps(snapshot.searches), json.dumps(snapshot.scrapers), tuple(sorted(snapshot.next_runs.items())),
+               tuple((channel_id, data_storage.generation) for channel_id, data_storage in snapshot.stores.items()))
+        if key == self.snapshot_key:
+            return
+        # The columns are read on the event loop, where the stores change, and encoded and written in a thread
+        columns = {channel_id: store_columns(data_storage) for channel_id, data_storage in snapshot.stores.items()}
+        start = time.perf_counter()
+        size = await self.scrape_executor.run_blocking(write_snapshot, self.SNAPSHOT_PATH, snapshot, columns)
+        self.snapshot_key = key
+        print(f"Saved a snapshot of {len(snapshot.searches)} searches to {self.SNAPSHOT_PATH} ({size / 1024:.0f} kB in {time.perf_counter() - start:.2f}s)")
+
+    async def restore_snapshot(self) -> bool:
+        """Brings back the searches, stores and scrape schedule saved at SNAPSHOT_PATH and resumes each site's job at its saved next run,
+        without scraping first
 
-        self.scrape()
+        Returns:
+            bool: Whether a snapshot was restored
+        """
 
-        # Add the scheduled job to run every hour
-        self.scheduler.add_job(self.auto_rescrape, 'interval', hours=1, id="auto_rescrape")
-        self.scheduler.start()
+        if not self.SNAPSHOT_PATH:
+            return False
+        start = time.perf_counter()
+        snapshot = await self.scrape_executor.run_blocking(read_snapshot, self.SNAPSHOT_PATH)
+        if snapshot is None or not snapshot.searches:
+            return False
+
+        for parameters in snapshot.searches:
+            self.searches.register(**parameters, data_storage=snapshot.stores.get(parameters['channel_id']))
+        self.scrape_schedule.restore(snapshot.schedule)
+        print(f"Restored {len(snapshot.searches)} searches from {self.SNAPSHOT_PATH} in {time.perf_counter() - start:.2f}s")
+
+        self.build_scrapers()
+        for state in snapshot.scrapers:
+            group = self.searches.groups.get((state['num_bedrooms'], state['num_people']))
+            scraper = group.scrapers_by_site.get(state['site']) if group is not None else None
+            if scraper is not None:
+                scraper.high_water_mark = state['high_water_mark']
+                scraper.scrapes_since_full_sweep = state['scrapes_since_full_sweep']
+        self.schedule_jobs(snapshot.next_runs)
+        return True
+
+    def sites(self) -> List[str]:
+        """Returns the sites scraped for the registered searches
+        """
+        return sorted({scraper.SITE for group in self.searches.groups.values() for scraper in group.scrapers})
     
-    def scrape(self) -> List[Property]:
-        """Scrapes the RightMove and UniHomes websites for properties and adds them to the bot's instance variable data_storage
+    async def scrape(self, sites: List[str] = None) -> Dict[Search, List[Property]]:
+        """Scrapes the given sites, all of them by default, for every search group and adds the properties to each search's data_storage
+
+        Each group is fetched once at the widest price range of its searches, then the properties found
+        are filtered for each search. The scrape runs in the bot's scrape_executor, so the event loop keeps serving commands meanwhile.
+        The number of new listings found on each site then sets when the site is scraped next, see reschedule()
+
+        Args:
+            sites (List[str]): The SITE names of the scrapers to run, e.g. ['rightmove']
 
         Returns:
-            List[Property]: A list of Property objects, each representing a property found by the scrapers
+            Dict[Search, List[Property]]: The new properties found for each search
         """
 
-        print("Scraping...")
-        RMproperties = self.RMscraper.scrape()
-        UHproperties = self.UHscraper.scrape()
-        foundProperties = RMproperties + UHproperties
+        print(f"Scraping {', '.join(sites) if sites else 'all sites'}...")
+        groups = [group for group in self.searches.groups.values() if group.scrapers]
+        scrapers = [scraper for group in groups for scraper in group.scrapers if sites is None or scraper.SITE in sites]
+        # A scrape joining one already in progress shares its results, but only the scrape that started it is recorded
+        joined = {scraper for scraper in scrapers if self.scrape_executor.is_running(scraper)}
+        results = {}
+        for scraper, result in zip(scrapers, await self.scrape_executor.run(scrapers)):
+            if isinstance(result, Exception):
+                # Counted in propertybot_scrape_errors_total by the executor, the other sites' listings are still stored
+                print(f"Scraping {scraper.SITE} failed, its listings are left as they were: {result!r}")
+            else:
+                results[scraper] = result
+        scrapers = [scraper for scraper in scrapers if scraper in results]
+        if self.response_cache is not None:
+            print(f"Response cache: {self.response_cache.stats}")
+
+        new_properties = {}
+        new_property_ids = set()
+        for group in groups:
+            found_properties = {search: [] for search in group.searches}
+            for scraper in group.scrapers:
+                if scraper in results:
+                    for search, accepted in group.fan_out(scraper, results[scraper]).items():
+                        found_properties[search] += accepted
+            for search, properties in found_properties.items():
+                new_properties[search] = search.data_storage.check_new_properties(properties)
+                search.data_storage.add_properties(new_properties[search])
+                new_property_ids.update(prop.getPropertyId() for prop in new_properties[search])
+                METRICS.set('propertybot_storage_properties', len(search.data_storage), channel=search.channel_id)
+
+        for site in {scraper.SITE for scraper in scrapers if scraper not in joined}:
+            site_scrapers = [scraper for scraper in scrapers if scraper.SITE == site]
+            new_listings = len({prop.getPropertyId() for scraper in site_scrapers for prop in results[scraper]} & new_property_ids)
+            self.reschedule(site, new_listings, sum(scraper.pages_fetched for scraper in site_scrapers))
+
+        return new_properties
+
+    def reschedule(self, site: str, new_listings: int, pages: int):
+        """Records a scrape of a site in the bot's AdaptiveSchedule and moves the site's job to the wait it decides
+        """
+
+        delay = self.scrape_schedule.record_scrape(site, new_listings, pages)
+        if self.scheduler.get_job(f"auto_rescrape_{site}") is not None:
+            self.scheduler.reschedule_job(f"auto_rescrape_{site}", trigger='interval', seconds=delay)
+        print(f"{site}: {new_listings} new listings from {pages} pages, next scrape in {delay / 60:.1f} minutes")
+    
+    def properties_to_table(self, properties: List[Property], tablefmt: str) -> str:
+        """Formats a list of Property objects as a text table with the tabulate library, in the given tabulate format
 
-        newProperties = self.data_storage.check_new_properties(foundProperties)
+        Each property's row is only built the first time it is shown, see TableCache
+        """
 
-        self.data_storage.add_properties(newProperties)
+        return self.table_cache.render(properties, tablefmt)
 
-        return newProperties
-    
     def properties_to_string(self, properties: List[Property], for_Discord: bool) -> str:
         """Converts a list of Property objects to a string
 
@@ -165,83 +377,219 @@ class PropertyBot(commands.Bot):
         """
 
         if for_Discord:
-            property_string = f'```{tabulate(properties, headers="keys", tablefmt="pipe", numalign="left", stralign="center")}```'
-        else:
-            property_string = f'{tabulate(properties, headers="keys", tablefmt="psql", numalign="left", stralign="center")}'
-        return property_string
+            return f'```{self.properties_to_table(properties, "pipe")}```'
+        return self.properties_to_table(properties, "psql")
     
-    async def auto_rescrape(self):
-        """Runs the scrape() method and sends a message to the Discord channel if new properties are found
+    async def auto_rescrape(self, site: str = None):
+        """Runs the scrape() method for one site, all sites by default, and queues a notification to each search's Discord channel if new properties are found
+
+        Skipped if the site is already being scraped, the running scrape will report its own new properties
         """
 
-        # Get new properties and add them to the data storage
-        new_properties = self.scrape()
-        
-        if len(new_properties) > 0:
-            # Format the new properties as a string and send to the Discord channel
-            new_properties_string = self.properties_to_string(new_properties)
-            
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            await self.update_channel.send(f"New properties found at {timestamp}:\n{new_properties_string}")
+        if any(self.scrape_executor.is_running(scraper) for group in self.searches.groups.values() for scraper in group.scrapers
+               if site is None or scraper.SITE == site):
+            return
 
-    def remove_property(self, property_id: str):
-        """Removes the property with the given id from the bot's instance variable data_storage
+        # Get new properties and add them to each search's data storage
+        new_properties = await self.scrape([site] if site is not None else None)
+        
+        # Queue the new properties for each search's Discord channel, the notifier sends them in the background
+        for search, properties in new_properties.items():
+            if not properties:
+                continue
+            channel = self.update_channel_for(search)
+            if channel is None:
+                print(f"Cannot find channel {search.channel_id} to send {len(properties)} new properties to")
+                continue
+            self.notifier.notify(channel, properties)
+
+    def remove_property(self, property_id: str, channel_id: int):
+        """Removes the property with the given id from the data_storage of the given channel's search
+
+        Raises:
+            KeyError: If the channel has no search or its search has no property with the given id
         """
 
-        self.data_storage.remove_property(property_id)
+        self.searches.get(channel_id).data_storage.remove_property(property_id)
 
-    def get_properties(self, num_properties: int) -> List[Property]:
-        """Returns the last num_properties properties stored in the bot's instance variable data_storage
+    def get_properties(self, num_properties: int, channel_id: int) -> List[Property]:
+        """Returns the num_properties most recently added properties stored for the given channel's search
 
         Args:
             num_properties (int): The number of properties to return
+            channel_id (int): The id of the channel whose search to read
+
+        Raises:
+            KeyError: If the channel has no search
 
         Returns:
             List[Property]: A list of Property objects, each representing a property stored in the bot
         """
 
-        return self.data_storage.get_properties()[-(num_properties+1):]
+        return self.searches.get(channel_id).data_storage.get_latest_properties(num_properties)
     
-    def get_all_properties(self) -> List[Property]:
-        """Returns all the properties stored in the bot's instance variable data_storage
+    def latest_table(self, num_properties: int, channel_id: int) -> str:
+        """Returns the table of the num_properties most recently added properties stored for the given channel's search
+
+        The table is kept until the search's store changes, so repeated !latest commands do not render it again
+
+        Raises:
+            KeyError: If the channel has no search
+        """
+
+        return self.table_cache.latest_table(self.searches.get(channel_id).data_storage, num_properties)
+
+    def get_all_properties(self, channel_id: int) -> List[Property]:
+        """Returns all the properties stored for the given channel's search
+
+        Raises:
+            KeyError: If the channel has no search
 
         Returns:
             List[Property]: A list of Property objects, each representing a property stored in the bot
         """
 
-        return self.data_storage.get_properties()
+        return self.searches.get(channel_id).data_storage.get_properties()
     
-    def generate_pastebin_user_key(self):
-        """Generates a user key for the pastebin API and stores it in the bot's instance variable PB_USERKEY
+    def countdown_to_table(self) -> str:
+        """Formats the time until the next scrape of each site, its current interval and new-listing arrival rate as a table
+        """
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for site in self.sites():
+            job = self.scheduler.get_job(f"auto_rescrape_{site}")
+            if job is None or job.next_run_time is None:
+                continue
+            schedule = self.scrape_schedule.site(site)
+            remaining = max(int((job.next_run_time - now).total_seconds()), 0)
+            hours, remainder = divmod(remaining, 3600)
+            minutes, seconds = divmod(remainder, 60)
+            rows.append({
+                'site': site,
+                'next scrape in': f'{hours}h {minutes}m {seconds}s',
+                'interval': f'{schedule.interval / 60:.0f} min',
+                'new listings per hour': f'{schedule.arrival_rate:.1f}',
+            })
+        return tabulate(rows, headers="keys", tablefmt="pipe", numalign="left", stralign="center")
+
+    def stats_to_table(self) -> str:
+        """Formats a summary of the recorded metrics as a table with one row per site: the last scrape's time, pages and listings,
+        the mean scrape and page fetch times, the listings parsed and dropped so far, the fields they were dropped for and the failed scrapes
+        """
+
+        def mean(name: str, **labels) -> str:
+            count, total = METRICS.get(name, **labels) or (0, 0)
+            return f'{total / count:.2f}s' if count else '-'
+
+        def value(name: str, **labels):
+            found = METRICS.get(name, **labels)
+            return '-' if found is None else int(found)
+
+        sites = sorted({labels['site'] for labels, _ in METRICS.series('propertybot_last_scrape_timestamp_seconds')})
+        rows = []
+        for site in sites:
+            last_scrape = METRICS.get('propertybot_last_scrape_timestamp_seconds', site=site)
+            page_latencies = [latency for labels, latency in METRICS.series('propertybot_page_fetch_seconds') if labels['site'] == site]
+            field_failures = sorted((labels['field'], int(count)) for labels, count in METRICS.series('propertybot_field_failures_total') if labels['site'] == site)
+            rows.append({
+                'site': site,
+                'last scrape': datetime.fromtimestamp(last_scrape).strftime("%Y-%m-%d %H:%M:%S"),
+                'pages': value('propertybot_last_scrape_pages', site=site),
+                'listings': value('propertybot_last_scrape_listings', site=site),
+                'scrape time': mean('propertybot_scrape_seconds', site=site),
+                'page fetch': f'{sum(page_latencies) / len(page_latencies):.2f}s' if page_latencies else '-',
+                'parsed': value('propertybot_listings_parsed_total', site=site),
+                'dropped': value('propertybot_listings_dropped_total', site=site),
+                'dropped for': ', '.join(f'{field} {count}' for field, count in field_failures) or '-',
+                'failed scrapes': value('propertybot_scrape_errors_total', site=site),
+            })
+        return tabulate(rows, headers="keys", tablefmt="pipe", numalign="left", stralign="center")
+
+    def get_columns(self, channel_id: int) -> PropertyColumns:
+        """Returns the columnar view of the properties stored for the given channel's search, rebuilt only after the store changes
+
+        Raises:
+            KeyError: If the channel has no search
+        """
+
+        search = self.searches.get(channel_id)
+        return columns_of(search.data_storage, search.num_people)
+
+    def get_cheapest_properties(self, num_properties: int, channel_id: int, column: str = 'pppw') -> List[Property]:
+        """Returns the num_properties cheapest properties stored for the given channel's search, cheapest first
+
+        Args:
+            num_properties (int): The number of properties to return
+            channel_id (int): The id of the channel whose search to read
+            column (str): The price to rank by, pppw (per person per week) or ppm (total per month)
+        """
+
+        return self.get_columns(channel_id).cheapest(num_properties, column)
+
+    def get_properties_in_price_band(self, min_price: int, max_price: int, channel_id: int, column: str = 'pppw') -> List[Property]:
+        """Returns the properties stored for the given channel's search priced between min_price and max_price inclusive, newest first
         """
 
-        POST_params = {
-            "api_dev_key": self.PB_API_KEY,
-            "api_user_name": self.PB_USERNAME,
-            "api_user_password": self.PB_PASSWORD
-        }
-        response = requests.post(PropertyBot.PB_API_USERKEY_URL, data=POST_params)
-        self.PB_USERKEY = response.text
+        columns = self.get_columns(channel_id)
+        return columns.select(columns.price_band(min_price, max_price, column))
 
-    def generate_pastebin_paste(self, paste_code: str) -> str:
-        """_summary_
+    def get_properties_added_between(self, first_date: str, last_date: str, channel_id: int) -> List[Property]:
+        """Returns the properties stored for the given channel's search added between the two dates inclusive, newest first
 
         Args:
-            paste_code (str): The text to be pasted in the pastebin 
+            first_date (str): The first date, formatted as dd/mm/yyyy
+            last_date (str): The last date, formatted as dd/mm/yyyy
+
+        Raises:
+            ValueError: If a date is not formatted as dd/mm/yyyy
+        """
+
+        columns = self.get_columns(channel_id)
+        return columns.select(columns.date_range(date_string_to_ordinal(first_date), date_string_to_ordinal(last_date)))
+
+    def get_properties_in_area(self, prefix: str, channel_id: int) -> List[Property]:
+        """Returns the properties stored for the given channel's search whose location or postcode district starts with prefix, newest first
+        """
+
+        columns = self.get_columns(channel_id)
+        return columns.select(columns.location_prefix(prefix))
+
+    def area_stats_to_table(self, channel_id: int, column: str = 'pppw') -> str:
+        """Formats the number of properties and the 25th, 50th (median) and 75th price percentiles of each area as a table
+        """
+
+        stats = self.get_columns(channel_id).area_stats(column, (25, 50, 75))
+        rows = [{'area': area, 'count': area_stats['count'], 'p25': area_stats['p25'], 'median': area_stats['p50'], 'p75': area_stats['p75']}
+                for area, area_stats in sorted(stats.items(), key=lambda item: -item[1]['count'])]
+        return tabulate(rows, headers="keys", tablefmt="pipe", numalign="left", stralign="center")
+
+    async def generate_pastebin_user_key(self):
+        """Generates a user key for the pastebin API, kept by the bot's pastebin client
+        """
+
+        await self.pastebin.login()
+
+    async def export_properties(self, channel_id: int, format_name: str = 'psql', destination: str = 'paste'):
+        """Exports all the properties stored for the given channel's search, reusing the last export until the store changes
+
+        The store is streamed through the formatter in the scrape executor's threads and pastes are uploaded asynchronously,
+        so the event loop keeps serving commands meanwhile
+
+        Args:
+            channel_id (int): The id of the channel whose search to export
+            format_name (str): psql, csv or jsonl
+            destination (str): paste to upload pastes of at most PASTE_MAX_BYTES each, file to write one local file
+
+        Raises:
+            KeyError: If the channel has no search or there is no format with the given name
 
         Returns:
-            str: The url of the pastebin paste
-        """
-
-        POST_params = {
-            "api_dev_key": self.PB_API_KEY,
-            "api_paste_code": paste_code,
-            "api_paste_private": 1,
-            "api_paste_name": "PropertyBot's currently stored properties",
-            "api_past_expire_date": "1H",
-            "api_option": "paste",
-            "api_user_key": self.PB_USERKEY
-        }
-        response = requests.post(PropertyBot.PB_API_PASTE_URL, data=POST_params)
-        pastebin_raw_url = response.text.replace("https://pastebin.com/", "https://pastebin.com/raw/")
-        return pastebin_raw_url
\ No newline at end of file
+            List[str] | str: The raw urls of the pastes, or the path of the file
+        """
+
+        data_storage = self.searches.get(channel_id).data_storage
+        get_export_format(format_name)
+        if destination == 'file':
+            return await self.export_cache.export_file(data_storage, format_name, f'properties_{channel_id}', self.scrape_executor.run_blocking)
+        return await self.export_cache.export_pastes(data_storage, format_name, self.pastebin, self.scrape_executor.run_blocking)
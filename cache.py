@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+
+def content_hash(body: str) -> str:
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """On-disk cache of fetched pages, used to send conditional requests and to skip re-parsing unchanged pages
+
+    Each url is kept in one JSON file holding its body, content hash, ETag and Last-Modified values.
+    Files are evicted least recently used first once the cache grows past max_bytes.
+    Parsed results are memoised in memory by content hash, so a page whose content has not changed is not parsed again
+
+    Attributes:
+        stats (Dict[str, int]): Counts of not_modified (304 answered from the cache), stale_validators (304 for an evicted entry),
+            unchanged (same content hash), misses (new or changed content), parse_hits, parse_misses and evictions
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 50 * 1024 * 1024, max_parsed: int = 64):
+        """Initialises the ResponseCache object, creating the cache directory if needed
+
+        Args:
+            directory (str): The directory the cached responses are stored in
+            max_bytes (int): The maximum total size of the cached responses on disk
+            max_parsed (int): The maximum number of parsed results memoised in memory
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_parsed = max_parsed
+        self.lock = threading.RLock()
+        self.parsed = OrderedDict()
+        self.stats = {'not_modified': 0, 'stale_validators': 0, 'unchanged': 0, 'misses': 0, 'parse_hits': 0, 'parse_misses': 0, 'evictions': 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self.file_sizes = {}
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                self.file_sizes[entry.path] = entry.stat().st_size
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.file_sizes.values())
+
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode('utf-8')).hexdigest()[:32] + '.json')
+
+    def load(self, url: str) -> Dict[str, str]:
+        path = self.path_for(url)
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Returns the If-None-Match/If-Modified-Since headers to send when fetching the given url
+        """
+
+        with self.lock:
+            entry = self.load(url)
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def resolve(self, url: str, status: int, body: str, etag: str = None, last_modified: str = None) -> str:
+        """Returns the body for a response to a conditional request, storing it if it is new
+
+        Args:
+            url (str): The url that was fetched
+            status (int): The response's HTTP status
+            body (str): The response body, ignored on a 304
+            etag (str): The response's ETag header
+            last_modified (str): The response's Last-Modified header
+
+        Returns:
+            str: The page body, taken from the cache on a 304. None on a 304 for a url whose entry was evicted since
+                its conditional headers were read, the url must then be fetched again without them
+        """
+
+        with self.lock:
+            entry = self.load(url)
+            path = self.path_for(url)
+            if status == 304:
+                if entry is None:
+                    self.stats['stale_validators'] += 1
+                    return None
+                self.stats['not_modified'] += 1
+                os.utime(path)
+                return entry['body']
+
+            body_hash = content_hash(body)
+            if entry is not None and entry['content_hash'] == body_hash:
+                self.stats['unchanged'] += 1
+            else:
+                self.stats['misses'] += 1
+
+            entry = {'url': url, 'etag': etag, 'last_modified': last_modified, 'content_hash': body_hash, 'body': body}
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            self.file_sizes[path] = os.path.getsize(path)
+            self.evict()
+            return body
+
+    def evict(self):
+        """Deletes the least recently used responses until the cache fits in max_bytes
+        """
+
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            for path in sorted(self.file_sizes, key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                del self.file_sizes[path]
+                self.stats['evictions'] += 1
+
+    def get_parsed(self, key: Hashable) -> Any:
+        """Returns the memoised parse result for the given key, or None
+        """
+
+        with self.lock:
+            if key in self.parsed:
+                self.parsed.move_to_end(key)
+                self.stats['parse_hits'] += 1
+                return self.parsed[key]
+            self.stats['parse_misses'] += 1
+            return None
+
+    def put_parsed(self, key: Hashable, value: Any):
+        with self.lock:
+            self.parsed[key] = value
+            self.parsed.move_to_end(key)
+            while len(self.parsed) > self.max_parsed:
+                self.parsed.popitem(last=False)
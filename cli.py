@@ -0,0 +1,168 @@
+"""Runs the scrapers from the command line, without Discord
+
+Scrapes one or all sites live, or the recorded pages of a fixtures folder served by a local FixtureServer,
+and prints the listings found and the time each scrape took. discord.py and APScheduler are never imported,
+so no token or channel is needed. Examples:
+
+    python cli.py --fixtures --repeat 20 --profile cprofile
+    python cli.py rightmove zoopla --max-ppw 200 --bedrooms 3 --people 3 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import contextlib
+import statistics
+import time
+from typing import Dict, List
+
+from tabulate import tabulate
+
+from fetcher import AsyncFetcher
+from parsers import available_parsers, default_parser, get_parser
+from scrapers import SITE_SCRAPERS, Property, SiteScraper
+from tables import TableCache
+from transport import Transport
+
+# The weeks in a month the bot converts weekly prices per person with, see PropertyBot.weeks_per_month
+WEEKS_PER_MONTH = 4.34524
+
+
+def build_scrapers(sites: List[str], max_ppw: int, num_bedrooms: int, num_people: int, base_url: str, parser_name: str,
+                   transport: Transport) -> List[SiteScraper]:
+    """Builds one full-sweep scraper per site for the search, priced as !initialise prices it
+    """
+
+    scrapers = []
+    for site in sites:
+        scraper_class = SITE_SCRAPERS[site]
+        max_price = max_ppw if scraper_class.SPEC.price_filter == 'pppw' else int(max_ppw * WEEKS_PER_MONTH * num_people)
+        scrapers.append(scraper_class(0, max_price, num_bedrooms, num_people, base_url=base_url, incremental=False,
+                                      parser=get_parser(parser_name), transport=transport))
+    return scrapers
+
+
+async def scrape_all(scrapers: List[SiteScraper], concurrency: int, per_host_interval: float) -> Dict[str, dict]:
+    """Scrapes every site at once on one event loop, parsing in this process so a profile sees all of the work
+
+    Returns:
+        Dict[str, dict]: The properties found, the pages fetched and the seconds taken, by site
+    """
+
+    async def scrape(scraper: SiteScraper) -> dict:
+        start = time.perf_counter()
+        properties = await scraper.scrape_async(fetcher)
+        return {'properties': properties, 'pages': scraper.pages_fetched, 'seconds': time.perf_counter() - start}
+
+    async with AsyncFetcher(max_concurrency=concurrency, per_host_interval=per_host_interval, transport=scrapers[0].transport) as fetcher:
+        results = await asyncio.gather(*(scrape(scraper) for scraper in scrapers))
+    return {scraper.SITE: result for scraper, result in zip(scrapers, results)}
+
+
+@contextlib.contextmanager
+def profiled(profile: str, output: str = None):
+    """Profiles the block with cProfile or tracemalloc and prints the report, or writes cProfile's stats to output
+    """
+
+    if profile is None:
+        yield
+        return
+
+    if profile == 'cprofile':
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            if output:
+                profiler.dump_stats(output)
+                print(f"cProfile stats written to {output}, read them with `python -m pstats {output}`")
+            else:
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        return
+
+    import tracemalloc
+    tracemalloc.start(25)
+    try:
+        yield
+    finally:
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Traced memory: {current / 1024:.0f} KiB at the end, {peak / 1024:.0f} KiB at the peak")
+        for statistic in snapshot.statistics('lineno')[:15]:
+            print(statistic)
+
+
+def print_report(runs: List[Dict[str, dict]], show: int):
+    """Prints the last run's first listings of each site and the timing of every site over all runs
+    """
+
+    table_cache = TableCache()
+    for site, result in runs[-1].items():
+        properties: List[Property] = result['properties']
+        print(f"\n{site}: {len(properties)} listings from {result['pages']} pages")
+        if show and properties:
+            print(table_cache.render(properties[:show], 'psql'))
+
+    rows = []
+    for site in runs[0]:
+        seconds = [run[site]['seconds'] for run in runs]
+        rows.append({
+            'site': site,
+            'listings': len(runs[-1][site]['properties']),
+            'pages': runs[-1][site]['pages'],
+            'runs': len(seconds),
+            'median seconds': round(statistics.median(seconds), 4),
+            'min seconds': round(min(seconds), 4),
+            'max seconds': round(max(seconds), 4),
+        })
+    print()
+    print(tabulate(rows, headers="keys", tablefmt="psql", numalign="left", stralign="center"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the scrapers without Discord, against the live sites or recorded pages')
+    parser.add_argument('sites', nargs='*', help=f'sites to scrape, all by default: {", ".join(sorted(SITE_SCRAPERS))}')
+    parser.add_argument('--fixtures', nargs='?', const='', metavar='DIR',
+                        help='scrape the recorded pages in DIR (fixtures/ if no DIR is given) instead of the live sites')
+    parser.add_argument('--base-url', help='scrape this base url instead of each site\'s own, e.g. a running FixtureServer')
+    parser.add_argument('--max-ppw', type=int, default=250, help='maximum price per person per week, as in !initialise')
+    parser.add_argument('--bedrooms', type=int, default=4, help='number of bedrooms')
+    parser.add_argument('--people', type=int, default=4, help='number of people')
+    parser.add_argument('--parser', default=default_parser(), choices=available_parsers(), help='parser backend')
+    parser.add_argument('--concurrency', type=int, default=8, help='maximum number of requests in flight across all sites')
+    parser.add_argument('--interval', type=float, help='minimum seconds between two requests to a host, 0.25 live and 0 on recorded pages by default')
+    parser.add_argument('--repeat', type=int, default=1, help='number of times to scrape every site')
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'], help='profile the scrapes and print the report')
+    parser.add_argument('--profile-output', help='file to write the cProfile stats to instead of printing them')
+    parser.add_argument('--show', type=int, default=10, help='number of listings printed per site, 0 for none')
+    args = parser.parse_args()
+
+    unknown_sites = [site for site in args.sites if site not in SITE_SCRAPERS]
+    if unknown_sites:
+        parser.error(f"unknown sites {', '.join(unknown_sites)}, expected some of {', '.join(sorted(SITE_SCRAPERS))}")
+    sites = args.sites or sorted(SITE_SCRAPERS)
+    with contextlib.ExitStack() as stack:
+        base_url = args.base_url
+        if args.fixtures is not None:
+            # Only imported for recorded pages, the live mode needs no local server
+            from replay import FIXTURES_DIR, FixtureServer
+            base_url = stack.enter_context(FixtureServer(args.fixtures or FIXTURES_DIR)).url
+        interval = args.interval if args.interval is not None else (0.0 if base_url else 0.25)
+
+        transport = Transport(pool_size=max(args.concurrency, 1), per_host=max(args.concurrency, 1))
+        stack.callback(transport.close)
+        scrapers = build_scrapers(sites, args.max_ppw, args.bedrooms, args.people, base_url, args.parser, transport)
+
+        runs = []
+        with profiled(args.profile, args.profile_output):
+            for _ in range(args.repeat):
+                runs.append(asyncio.run(scrape_all(scrapers, args.concurrency, interval)))
+        print_report(runs, args.show)
+
+
+if __name__ == '__main__':
+    main()
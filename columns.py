@@ -0,0 +1,196 @@
+import re
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from scrapers import DataStorage, Property
+
+# The postcode district at the end of a location, e.g. SE15 in "167 Coldharbour Lane, London SE15"
+POSTCODE_DISTRICT = re.compile(r'\b([A-Z]{1,2}[0-9][A-Z0-9]?)\s*$')
+
+PRICE_COLUMNS = ('pppw', 'ppm')
+
+
+@lru_cache(maxsize=4096)
+def area_of(location: str) -> str:
+    """Returns the area of a location: its postcode district if it ends with one, otherwise its last comma separated part
+    """
+
+    if not location:
+        return 'Unknown'
+    match = POSTCODE_DISTRICT.search(location.upper())
+    if match is not None:
+        return match.group(1)
+    return location.rsplit(',', 1)[-1].strip() or 'Unknown'
+
+
+class PropertyColumns:
+    """Columnar snapshot of stored properties, one NumPy array per field, for filtered queries and price statistics
+
+    Rows keep the order the properties were given in (newest first for a DataStorage), missing prices are NaN.
+    Filters return boolean masks which can be combined with & and |, then turned back into properties.
+    The sites list different weekly prices, RightMove and Zoopla the whole property's and UniHomes the price per person,
+    so given the search's number of people the pppw column is worked out from the monthly price of every property
+    """
+
+    def __init__(self, properties: Iterable[Property], num_people: int = None):
+        """Initialises the PropertyColumns object
+
+        Args:
+            properties (Iterable[Property]): The properties to lay out in columns
+            num_people (int): The number of people of the search, the pppw column holds the listed weekly prices if None
+        """
+
+        self.properties: List[Property] = list(properties)
+        count = len(self.properties)
+
+        self.date_ordinals = np.fromiter((prop.getDateOrdinal() for prop in self.properties), dtype=np.int64, count=count)
+        ppm = np.fromiter((np.nan if prop.getPricePM() is None else prop.getPricePM() for prop in self.properties), dtype=np.float64, count=count)
+        if num_people:
+            # Rounded up as the listed weekly prices are, so a UniHomes price per person comes back as listed
+            pppw = np.ceil(ppm / (Property.weeks_per_month * num_people))
+        else:
+            pppw = np.fromiter((np.nan if prop.getPricePW() is None else prop.getPricePW() for prop in self.properties), dtype=np.float64, count=count)
+        self.prices = {'ppm': ppm, 'pppw': pppw}
+        locations = [prop.getLocation() or '' for prop in self.properties]
+        self.locations = np.array(locations, dtype=str)
+        self.folded_locations = np.char.lower(self.locations)
+
+        # Each distinct area is stored once, rows hold the index of their area
+        if count:
+            self.areas, self.area_codes = np.unique(np.array([area_of(location) for location in locations], dtype=str), return_inverse=True)
+        else:
+            self.areas, self.area_codes = np.empty(0, dtype=str), np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.properties)
+
+    def everything(self) -> np.ndarray:
+        return np.ones(len(self), dtype=bool)
+
+    def price(self, column: str) -> np.ndarray:
+        """Returns the price column by name, pppw (per person per week) or ppm (total per month)
+
+        Raises:
+            KeyError: If there is no price column with the given name
+        """
+        return self.prices[column]
+
+    def price_band(self, min_price: float = None, max_price: float = None, column: str = 'pppw') -> np.ndarray:
+        """Returns the mask of the properties priced between min_price and max_price inclusive, unbounded where None
+        """
+
+        prices = self.price(column)
+        mask = ~np.isnan(prices)
+        if min_price is not None:
+            mask &= prices >= min_price
+        if max_price is not None:
+            mask &= prices <= max_price
+        return mask
+
+    def date_range(self, first_ordinal: int = None, last_ordinal: int = None) -> np.ndarray:
+        """Returns the mask of the properties added between the two date ordinals inclusive, unbounded where None
+        """
+
+        mask = self.everything()
+        if first_ordinal is not None:
+            mask &= self.date_ordinals >= first_ordinal
+        if last_ordinal is not None:
+            mask &= self.date_ordinals <= last_ordinal
+        return mask
+
+    def location_prefix(self, prefix: str) -> np.ndarray:
+        """Returns the mask of the properties whose location or area starts with the given prefix, ignoring case
+
+        Args:
+            prefix (str): The start of a location (e.g. "25 Denmark") or of a postcode district (e.g. "SE1" also matches SE15)
+        """
+
+        folded = prefix.lower()
+        area_matches = np.char.startswith(np.char.lower(self.areas), folded)
+        return np.char.startswith(self.folded_locations, folded) | area_matches[self.area_codes]
+
+    def select(self, mask: np.ndarray) -> List[Property]:
+        """Returns the properties in the given mask, in row order
+        """
+        return [self.properties[row] for row in np.flatnonzero(mask)]
+
+    def cheapest(self, num_properties: int, column: str = 'pppw', mask: np.ndarray = None) -> List[Property]:
+        """Returns the num_properties cheapest properties by the given price column, cheapest first
+
+        Only the cheapest rows are partitioned out and sorted, rather than sorting every row
+
+        Args:
+            num_properties (int): The number of properties to return
+            column (str): The price column to rank by, pppw or ppm
+            mask (np.ndarray): Only rank the properties in this mask, all properties by default
+        """
+
+        prices = self.price(column)
+        rows = np.flatnonzero(~np.isnan(prices) if mask is None else mask & ~np.isnan(prices))
+        if num_properties <= 0 or len(rows) == 0:
+            return []
+        if num_properties < len(rows):
+            rows = rows[np.argpartition(prices[rows], num_properties - 1)[:num_properties]]
+        # Stable, so equally priced properties stay newest first
+        rows = rows[np.argsort(prices[rows], kind='stable')]
+        return [self.properties[row] for row in rows]
+
+    def area_stats(self, column: str = 'pppw', percentiles: Sequence[float] = (25, 50, 75), mask: np.ndarray = None) -> Dict[str, Dict[str, float]]:
+        """Returns the number of properties and the price percentiles of each area, computed in bulk
+
+        The rows are sorted once by area then price, so every area is a contiguous sorted run
+        and its percentiles are interpolated straight from the run
+
+        Args:
+            column (str): The price column, pppw or ppm
+            percentiles (Sequence[float]): The percentiles to compute, between 0 and 100
+            mask (np.ndarray): Only count the properties in this mask, all properties by default
+
+        Returns:
+            Dict[str, Dict[str, float]]: For each area with a priced property, its count and a p<percentile> entry per percentile
+        """
+
+        prices = self.price(column)
+        rows = np.flatnonzero(~np.isnan(prices) if mask is None else mask & ~np.isnan(prices))
+        if len(rows) == 0:
+            return {}
+
+        order = np.lexsort((prices[rows], self.area_codes[rows]))
+        codes, sorted_prices = self.area_codes[rows][order], prices[rows][order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        counts = np.diff(np.r_[starts, len(codes)])
+
+        # Linear interpolation between the two closest ranks of each run, as numpy.percentile does by default
+        fractions = np.asarray(percentiles, dtype=np.float64) / 100
+        positions = (counts[:, None] - 1) * fractions[None, :]
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, counts[:, None] - 1)
+        weights = positions - lower
+        values = sorted_prices[starts[:, None] + lower] * (1 - weights) + sorted_prices[starts[:, None] + upper] * weights
+
+        stats = {}
+        for run, code in enumerate(codes[starts]):
+            area_stats = {'count': int(counts[run])}
+            for percentile, value in zip(percentiles, values[run]):
+                area_stats[f'p{percentile:g}'] = round(float(value), 2)
+            stats[str(self.areas[code])] = area_stats
+        return stats
+
+
+# The columns built for each store, with the store generation and number of people they were built for
+_columns_by_storage = weakref.WeakKeyDictionary()
+
+
+def columns_of(data_storage: DataStorage, num_people: int = None) -> PropertyColumns:
+    """Returns the columnar view of a store's properties for a search of num_people, see PropertyColumns,
+    rebuilt only when the store has changed since the last call
+    """
+
+    cached = _columns_by_storage.get(data_storage)
+    if cached is None or cached[:2] != (data_storage.generation, num_people):
+        cached = (data_storage.generation, num_people, PropertyColumns(data_storage.iter_properties(), num_people))
+        _columns_by_storage[data_storage] = cached
+    return cached[2]
@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Union
+
+from jobqueue import JobFailedError, JobQueue
+from metrics import METRICS
+from scrapers import Property, Scraper, SiteScraper
+
+
+class ScrapeExecutor:
+    """Runs scrapes off the event loop: pages are fetched in a thread pool and parsed in a process pool
+
+    Each scraper only runs once at a time: a run asking for a scraper that is already being scraped waits for and
+    shares the result of the running scrape instead of starting a second one, so the sites can be scheduled independently
+    """
+
+    def __init__(self, fetch_workers: int = 4, parse_workers: int = None):
+        """Initialises the ScrapeExecutor object
+
+        Args:
+            fetch_workers (int): The number of threads fetching pages, one site per thread
+            parse_workers (int): The number of processes parsing pages, defaults to the number of CPUs
+        """
+
+        self.parse_workers = parse_workers
+        self.thread_pool = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='scrape-fetch')
+        # Started on the first page parsed, so an executor that never parses, e.g. a QueueScrapeExecutor, starts no processes
+        self.process_pool: ProcessPoolExecutor = None
+        self.running: Dict[Scraper, asyncio.Future] = {}
+
+    @property
+    def in_progress(self) -> bool:
+        return any(not future.done() for future in self.running.values())
+
+    def is_running(self, scraper: Scraper) -> bool:
+        future = self.running.get(scraper)
+        return future is not None and not future.done()
+
+    async def run_blocking(self, func: Callable, *args):
+        """Runs a blocking callable in the fetch thread pool and waits for its result
+
+        Args:
+            func (Callable): The callable to run, e.g. a scraper constructor that fetches its first page
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, func, *args)
+
+    async def run(self, scrapers: List[Scraper]) -> List[Union[List[Property], Exception]]:
+        """Scrapes all the given scrapers concurrently, joining the scrape of any scraper already in progress
+
+        One scraper failing does not stop the others: its exception is returned in place of its properties
+
+        Args:
+            scrapers (List[Scraper]): The scrapers to run
+
+        Returns:
+            List[Union[List[Property], Exception]]: The properties found by each scraper, or the exception its scrape raised,
+                in the same order as scrapers
+        """
+
+        futures = []
+        for scraper in scrapers:
+            if not self.is_running(scraper):
+                future = asyncio.ensure_future(self.scrape(scraper))
+                # A finished scrape is forgotten, so running does not keep every scraper's last properties alive
+                future.add_done_callback(functools.partial(self.forget, scraper))
+                self.running[scraper] = future
+            futures.append(self.running[scraper])
+        results = await asyncio.gather(*(asyncio.shield(future) for future in futures), return_exceptions=True)
+        for result in results:
+            # Only failures of the scrapes themselves are returned, a cancelled scrape cancels the run
+            if isinstance(result, BaseException) and not isinstance(result, Exception):
+                raise result
+        return list(results)
+
+    def forget(self, scraper: Scraper, future: asyncio.Future):
+        # A newer scrape of the same scraper may have replaced the finished one before this callback ran
+        if self.running.get(scraper) is future:
+            del self.running[scraper]
+
+    async def scrape(self, scraper: Scraper) -> List[Property]:
+        """Fetches every page of one scraper in a worker thread, then parses the pages in parallel processes
+
+        Args:
+            scraper (Scraper): The scraper to run
+
+        Returns:
+            List[Property]: The properties found, in the order of the results pages
+        """
+
+        start = time.perf_counter()
+        try:
+            pages = await self.run_blocking(scraper.fetch_pages)
+            parsed_pages = await asyncio.gather(*(self.parse(scraper, html) for html in pages))
+        except Exception:
+            METRICS.inc('propertybot_scrape_errors_total', site=scraper.SITE)
+            raise
+        properties_found = [prop for page in parsed_pages for prop in page]
+        scraper.after_scrape(properties_found)
+        scraper.record_scrape(time.perf_counter() - start, len(properties_found), len(pages))
+        return properties_found
+
+    async def parse(self, scraper: Scraper, html: str) -> List[Property]:
+        """Parses one page in the process pool, unless the scraper's response cache already holds its parse
+        """
+
+        properties = scraper.cached_parse(html)
+        if properties is not None:
+            return properties
+
+        loop = asyncio.get_running_loop()
+        # Timed here, including the transfer to and from the parsing process, since metrics recorded there would be lost
+        start = time.perf_counter()
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        try:
+            properties, failures = await loop.run_in_executor(self.process_pool, scraper.parse_page, html)
+        except BrokenProcessPool:
+            # A parser process died, replace the pool and parse this page in a thread instead
+            self.process_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            properties, failures = await self.run_blocking(scraper.parse_page, html)
+        scraper.record_parse(time.perf_counter() - start, len(properties), failures)
+        scraper.remember_parse(html, properties)
+        return properties
+
+    def shutdown(self):
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=False, cancel_futures=True)
+
+
+class QueueScrapeExecutor(ScrapeExecutor):
+    """Hands scrapes to worker processes through a JobQueue instead of fetching and parsing in the bot's own pools
+
+    A scrape first queues a job for the site's first page, which tells how many pages there are, then queues the
+    remaining pages in jobs of pages_per_job pages, so several workers share one site. Workers run with `python -m worker`.
+    Every scrape is a full sweep, since the bot only learns which listings are new once the pages come back.
+    Scrapes are coalesced per scraper as in ScrapeExecutor, and blocking calls still run in its thread pool
+    """
+
+    def __init__(self, queue: JobQueue, pages_per_job: int = 2, poll_interval: float = 0.5, job_timeout: float = 600.0):
+        """Initialises the QueueScrapeExecutor object
+
+        Args:
+            queue (JobQueue): The queue shared with the workers
+            pages_per_job (int): The number of results pages in each job after the first
+            poll_interval (float): Seconds between two checks of the queue for finished jobs
+            job_timeout (float): Seconds to wait for a set of jobs before failing the scrape, e.g. while no worker is running
+        """
+
+        super().__init__()
+        self.queue = queue
+        self.pages_per_job = pages_per_job
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+
+    async def scrape(self, scraper: SiteScraper) -> List[Property]:
+        """Scrapes one site through the job queue
+
+        Raises:
+            JobFailedError: If a job failed on every attempt or was not finished within job_timeout
+        """
+
+        start = time.perf_counter()
+        first = scraper.SPEC.pagination.first_page
+        try:
+            results = await self.run_jobs(scraper, [[first]])
+            last = first + results[0]['num_of_pages']
+            results += await self.run_jobs(scraper, [list(range(page, min(page + self.pages_per_job, last)))
+                                                     for page in range(first + 1, last, self.pages_per_job)])
+        except Exception:
+            METRICS.inc('propertybot_scrape_errors_total', site=scraper.SITE)
+            raise
+
+        rows_by_page, failures, parse_seconds = {}, {}, 0.0
+        for result in results:
+            rows_by_page.update((int(page), rows) for page, rows in result['pages'].items())
+            for field, dropped in result['failures'].items():
+                failures[field] = failures.get(field, 0) + dropped
+            parse_seconds += result['parse_seconds']
+        properties_found = [Property.from_fields(*row, num_people=scraper.num_people) for page in sorted(rows_by_page) for row in rows_by_page[page]]
+        scraper.record_parse(parse_seconds, len(properties_found), failures)
+        scraper.after_scrape(properties_found)
+        scraper.record_scrape(time.perf_counter() - start, len(properties_found), len(rows_by_page))
+        return properties_found
+
+    async def run_jobs(self, scraper: SiteScraper, page_lists: List[List[int]]) -> List[dict]:
+        """Queues one job per list of pages and waits for all of them, returning their results in the same order
+        """
+
+        if not page_lists:
+            return []
+        job_ids = await self.run_blocking(self.queue.enqueue, scraper.SITE, scraper.parameters(), page_lists)
+        deadline = time.monotonic() + self.job_timeout
+        try:
+            while True:
+                finished = await self.run_blocking(self.queue.finished, job_ids)
+                failed = [(job_id, error) for job_id, (state, _, error) in finished.items() if state == 'failed']
+                if failed:
+                    raise JobFailedError(f"{scraper.SITE} job {failed[0][0]} failed: {failed[0][1]}")
+                if len(finished) == len(job_ids):
+                    return [finished[job_id][1] for job_id in job_ids]
+                if time.monotonic() > deadline:
+                    raise JobFailedError(f"{scraper.SITE} jobs not finished after {self.job_timeout:.0f}s, is a worker running?")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            # Finished or abandoned, the jobs are not needed in the queue anymore
+            await self.run_blocking(self.queue.delete, job_ids)
+
+    def shutdown(self):
+        super().shutdown()
+        self.queue.close()
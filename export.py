@@ -0,0 +1,312 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import weakref
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from scrapers import DataStorage, Property
+from transport import Transport, shared_transport
+
+# Pastebin rejects pastes over 512 kB on free accounts
+PASTE_MAX_BYTES = 512 * 1024
+# Pastes are created to expire after an hour, so their urls are only reused for a little less than that
+PASTE_EXPIRY = '1H'
+PASTE_REUSE_SECONDS = 55 * 60
+
+EXPORT_FIELDS = ['propertyId', 'dateAdded', 'ppm', 'pppw', 'location', 'link']
+
+
+def export_row(prop: Property) -> list:
+    return [prop.getPropertyId(), prop.getDateAdded(), prop.getPricePM(), prop.getPricePW(), prop.getLocation() or '', prop.getLink() or '']
+
+
+class ExportFormat:
+    """Incremental formatter turning stored properties into lines of text, one property at a time
+
+    header_lines and footer_lines frame every part of a split export, so each paste or file stands on its own
+    """
+    name = None
+    extension = None
+
+    def prepare(self, properties: Iterable[Property]):
+        """Called once with the properties before any lines are formatted, for formats that need a first pass
+        """
+        pass
+
+    def header_lines(self) -> List[str]:
+        return []
+
+    def footer_lines(self) -> List[str]:
+        return []
+
+    def row_line(self, prop: Property) -> str:
+        raise NotImplementedError("Subclasses should implement this!")
+
+
+class CSVFormat(ExportFormat):
+    name = 'csv'
+    extension = 'csv'
+
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def line(self, values: list) -> str:
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerow(values)
+        return self.buffer.getvalue()
+
+    def header_lines(self) -> List[str]:
+        return [self.line(EXPORT_FIELDS)]
+
+    def row_line(self, prop: Property) -> str:
+        return self.line(export_row(prop))
+
+
+class JSONLinesFormat(ExportFormat):
+    name = 'jsonl'
+    extension = 'jsonl'
+
+    def row_line(self, prop: Property) -> str:
+        return json.dumps(dict(zip(EXPORT_FIELDS, export_row(prop)))) + '\n'
+
+
+class PSQLFormat(ExportFormat):
+    """The psql table layout of tabulate, with the column widths measured in a first pass over the rows
+    instead of holding every row in memory
+    """
+    name = 'psql'
+    extension = 'txt'
+
+    def __init__(self):
+        self.widths = [len(field) for field in EXPORT_FIELDS]
+
+    def prepare(self, properties: Iterable[Property]):
+        for prop in properties:
+            for column, value in enumerate(export_row(prop)):
+                if len(str(value)) > self.widths[column]:
+                    self.widths[column] = len(str(value))
+
+    def border(self, left: str, joint: str, right: str) -> str:
+        return left + joint.join('-' * (width + 2) for width in self.widths) + right + '\n'
+
+    def line(self, values: list) -> str:
+        return '| ' + ' | '.join(str(value).ljust(width) for value, width in zip(values, self.widths)) + ' |\n'
+
+    def header_lines(self) -> List[str]:
+        return [self.border('+', '+', '+'), self.line(EXPORT_FIELDS), self.border('|', '+', '|')]
+
+    def footer_lines(self) -> List[str]:
+        return [self.border('+', '+', '+')]
+
+    def row_line(self, prop: Property) -> str:
+        return self.line(export_row(prop))
+
+
+EXPORT_FORMATS = {export_format.name: export_format for export_format in (PSQLFormat, CSVFormat, JSONLinesFormat)}
+
+
+def get_export_format(name: str) -> ExportFormat:
+    """Returns a new formatter by name: psql, csv or jsonl
+
+    Raises:
+        KeyError: If there is no format with the given name
+    """
+    return EXPORT_FORMATS[name]()
+
+
+def iter_export_parts(properties: List[Property], export_format: ExportFormat, max_bytes: int = None) -> Iterator[str]:
+    """Streams the properties through the formatter, yielding the export in parts of at most max_bytes of UTF-8
+
+    Each part has the format's header and footer. Only one part is held in memory at a time
+
+    Args:
+        properties (List[Property]): The properties to export, e.g. a store's list(iter_properties()) taken on the event loop,
+            so the export can be rendered in another thread while the store changes
+        export_format (ExportFormat): The formatter
+        max_bytes (int): The maximum size of a part, unbounded if None
+    """
+
+    export_format.prepare(properties)
+    header, footer = ''.join(export_format.header_lines()), ''.join(export_format.footer_lines())
+    frame_bytes = len(header.encode('utf-8')) + len(footer.encode('utf-8'))
+
+    lines, part_bytes, parts = [], frame_bytes, 0
+    for prop in properties:
+        line = export_format.row_line(prop)
+        line_bytes = len(line.encode('utf-8'))
+        if lines and max_bytes is not None and part_bytes + line_bytes > max_bytes:
+            yield header + ''.join(lines) + footer
+            lines, part_bytes, parts = [], frame_bytes, parts + 1
+        lines.append(line)
+        part_bytes += line_bytes
+    # An empty store still exports its header, unless the format has none
+    if lines or (parts == 0 and frame_bytes > 0):
+        yield header + ''.join(lines) + footer
+
+
+def write_export(properties: List[Property], export_format: ExportFormat, path: str) -> str:
+    """Streams the whole export of the properties into a file at path and returns the path
+    """
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for part in iter_export_parts(properties, export_format):
+            f.write(part)
+    return path
+
+
+class PasteBinClient:
+    """Asynchronous client of the pastebin API over the bot's pooled Transport
+    """
+
+    USERKEY_URL = 'https://pastebin.com/api/api_login.php'
+    PASTE_URL = 'https://pastebin.com/api/api_post.php'
+
+    def __init__(self, api_key: str, username: str, password: str, transport: Transport = None):
+        self.api_key = api_key
+        self.username = username
+        self.password = password
+        self.transport = transport or shared_transport()
+        self.user_key = None
+
+    async def post(self, url: str, data: Dict[str, str]) -> str:
+        response = await self.transport.request('POST', url, data=data)
+        text = response.text
+        # The API answers errors with a 200 or 422 and a message starting with "Bad API request"
+        if response.status >= 400 or text.startswith('Bad API request'):
+            raise RuntimeError(f'Pastebin request failed: {response.status} {text}')
+        return text
+
+    async def login(self) -> str:
+        """Generates a user key for the pastebin API, kept for the pastes created after
+        """
+
+        self.user_key = await self.post(PasteBinClient.USERKEY_URL, {
+            "api_dev_key": self.api_key,
+            "api_user_name": self.username,
+            "api_user_password": self.password
+        })
+        return self.user_key
+
+    async def paste(self, paste_code: str, name: str) -> str:
+        """Creates a private paste expiring after PASTE_EXPIRY and returns its raw url
+        """
+
+        if self.user_key is None:
+            await self.login()
+        url = await self.post(PasteBinClient.PASTE_URL, {
+            "api_dev_key": self.api_key,
+            "api_paste_code": paste_code,
+            "api_paste_private": 1,
+            "api_paste_name": name,
+            "api_paste_expire_date": PASTE_EXPIRY,
+            "api_option": "paste",
+            "api_user_key": self.user_key
+        })
+        return url.replace("https://pastebin.com/", "https://pastebin.com/raw/")
+
+
+class ExportCache:
+    """Remembers the pastes and files exported from each store, until the store changes
+
+    Entries are keyed by the store and the export format and hold the store generation they were made at.
+    Paste urls are also dropped once the pastes are about to expire
+    """
+
+    def __init__(self, directory: str = None):
+        """Initialises the ExportCache object
+
+        Args:
+            directory (str): The folder export files are written to, by default a temporary folder removed by close
+        """
+
+        self.temporary_directory = tempfile.TemporaryDirectory(prefix='propertybot-exports-') if directory is None else None
+        self.directory = directory or self.temporary_directory.name
+        os.makedirs(self.directory, exist_ok=True)
+        self.entries = weakref.WeakKeyDictionary()
+
+    def close(self):
+        """Forgets every export and removes the temporary folder with the export files, if the cache made one
+        """
+
+        self.entries = weakref.WeakKeyDictionary()
+        if self.temporary_directory is not None:
+            self.temporary_directory.cleanup()
+
+    def get(self, data_storage: DataStorage, key: Tuple[str, str]):
+        cached = self.entries.get(data_storage, {}).get(key)
+        if cached is None:
+            return None
+        generation, created, value = cached
+        if generation != data_storage.generation:
+            return None
+        if key[0] == 'paste' and time.monotonic() - created > PASTE_REUSE_SECONDS:
+            return None
+        return value
+
+    def put(self, data_storage: DataStorage, key: Tuple[str, str], value, generation: int):
+        # An export of a store that changed since it was listed is already stale, so it is not kept
+        if generation == data_storage.generation:
+            self.entries.setdefault(data_storage, {})[key] = (generation, time.monotonic(), value)
+
+    async def export_pastes(self, data_storage: DataStorage, format_name: str, client: PasteBinClient,
+                            run_blocking: Callable = None, max_bytes: int = PASTE_MAX_BYTES) -> List[str]:
+        """Returns the raw urls of pastes holding the whole store in the given format, at most max_bytes each
+
+        Parts are rendered one at a time and uploaded as they are rendered
+
+        Args:
+            data_storage (DataStorage): The store to export
+            format_name (str): psql, csv or jsonl
+            client (PasteBinClient): The client the pastes are created with
+            run_blocking (Callable): Awaitable runner of blocking calls, e.g. ScrapeExecutor.run_blocking, so rendering
+                stays off the event loop. Parts are rendered inline if None
+            max_bytes (int): The maximum size of a paste
+        """
+
+        key = ('paste', format_name)
+        urls = self.get(data_storage, key)
+        if urls is not None:
+            return urls
+
+        # The store's properties are listed here on the event loop, the thread rendering the parts never reads the store
+        generation, properties = data_storage.generation, list(data_storage.iter_properties())
+        parts = iter_export_parts(properties, get_export_format(format_name), max_bytes)
+        urls = []
+        while True:
+            part = await run_blocking(next, parts, None) if run_blocking is not None else next(parts, None)
+            if part is None:
+                break
+            urls.append(await client.paste(part, f"PropertyBot's currently stored properties ({len(urls) + 1})"))
+        self.put(data_storage, key, urls, generation)
+        return urls
+
+    async def export_file(self, data_storage: DataStorage, format_name: str, name: str, run_blocking: Callable = None) -> str:
+        """Returns the path of a file holding the whole store in the given format, written in the background if run_blocking is given
+
+        Args:
+            data_storage (DataStorage): The store to export
+            format_name (str): psql, csv or jsonl
+            name (str): The file name, without extension
+            run_blocking (Callable): Awaitable runner of blocking calls, see export_pastes
+        """
+
+        key = ('file', format_name)
+        path = self.get(data_storage, key)
+        if path is not None and os.path.isfile(path):
+            return path
+
+        # Listed on the event loop as in export_pastes
+        generation, properties = data_storage.generation, list(data_storage.iter_properties())
+        export_format = get_export_format(format_name)
+        path = os.path.join(self.directory, f'{name}.{export_format.extension}')
+        if run_blocking is not None:
+            await run_blocking(write_export, properties, export_format, path)
+        else:
+            write_export(properties, export_format, path)
+        self.put(data_storage, key, path, generation)
+        return path
@@ -0,0 +1,184 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Dict, Iterable, Tuple
+from urllib.parse import urlsplit
+
+from cache import ResponseCache
+from metrics import METRICS, Metrics
+from transport import CircuitOpenError, Transport, TransportError, shared_transport
+
+
+class FetchError(Exception):
+    """Raised when a page could not be fetched after all retries
+    """
+
+
+class RateLimiter:
+    """Spaces out requests to the same host by a minimum interval
+    """
+
+    def __init__(self, min_interval: float):
+        """Initialises the RateLimiter object
+
+        Args:
+            min_interval (float): The minimum number of seconds between two requests to the same host
+        """
+
+        self.min_interval = min_interval
+        self.next_slot: Dict[str, float] = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, host: str):
+        """Waits until a request to the given host is allowed
+
+        Args:
+            host (str): The host the request is going to
+        """
+
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.min_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class AsyncFetcher:
+    """Fetches pages concurrently over a shared Transport
+
+    The number of requests in flight is bounded by max_concurrency, requests to the same host are
+    spaced out by per_host_interval and failed requests are retried with exponential backoff.
+    Connections, timeouts, compression and circuit breaking are the transport's, so fetchers are cheap to make per scrape
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_concurrency: int = 8, per_host_interval: float = 0.25, max_retries: int = 3,
+                 backoff_base: float = 0.5, transport: Transport = None, headers: Dict[str, str] = None, response_cache: ResponseCache = None,
+                 metrics: Metrics = METRICS):
+        """Initialises the AsyncFetcher object
+
+        Args:
+            max_concurrency (int): The maximum number of requests in flight at once
+            per_host_interval (float): The minimum number of seconds between two requests to the same host
+            max_retries (int): The number of times a failed request is retried
+            backoff_base (float): The delay in seconds before the first retry, doubled on every retry after that
+            transport (Transport): The transport requests are sent over, the shared default transport if None
+            headers (Dict[str, str]): Extra headers sent with every request
+            response_cache (ResponseCache): If given, pages are fetched with conditional requests and kept in this cache
+            metrics (Metrics): The registry the latency, size and status of every fetch are recorded in
+        """
+
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.transport = transport or shared_transport()
+        self.headers = headers or {}
+        self.response_cache = response_cache
+        self.metrics = metrics
+        # The status, size and latency of the last fetch of each url, for per-page metrics
+        self.last_fetches: Dict[str, Tuple[int, int, float]] = {}
+
+        self.rate_limiter = RateLimiter(per_host_interval)
+        self.semaphore = None
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        # The connections belong to the transport and stay open for the next fetcher
+        pass
+
+    def backoff_delay(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+
+    async def fetch(self, url: str, conditional: bool = True) -> str:
+        """Fetches the given url and returns the response body as text
+
+        Args:
+            url (str): The url to fetch
+            conditional (bool): Whether to send the response cache's validators for the url, if there is a response cache
+
+        Raises:
+            FetchError: If the request still fails after max_retries retries, fails with a client error status,
+                or the host's circuit is open
+
+        Returns:
+            str: The response body
+        """
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        host = urlsplit(url).netloc
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with self.semaphore:
+                await self.rate_limiter.wait(host)
+                request_headers = dict(self.headers)
+                if self.response_cache is not None and conditional:
+                    request_headers.update(self.response_cache.conditional_headers(url))
+                start = time.perf_counter()
+                try:
+                    response = await self.transport.request('GET', url, headers=request_headers)
+                except CircuitOpenError as e:
+                    # Retrying would only fail again until the circuit closes
+                    self.metrics.inc('propertybot_fetch_responses_total', host=host, status='circuit_open')
+                    raise FetchError(f'Could not fetch {url}: {e}') from e
+                except TransportError as e:
+                    self.metrics.inc('propertybot_fetch_responses_total', host=host, status='error')
+                    last_error = str(e)
+                else:
+                    self.metrics.inc('propertybot_fetch_responses_total', host=host, status=response.status)
+                    if response.status not in AsyncFetcher.RETRY_STATUSES:
+                        if response.status >= 400:
+                            raise FetchError(f'Could not fetch {url}: HTTP {response.status}')
+                        body = response.body if response.status != 304 else b''
+                        elapsed = time.perf_counter() - start
+                        self.metrics.observe('propertybot_fetch_seconds', elapsed, host=host)
+                        self.metrics.inc('propertybot_fetch_bytes_total', len(body), host=host)
+                        self.last_fetches[url] = (response.status, len(body), elapsed)
+                        body = body.decode(response.charset or 'utf-8', errors='replace')
+                        if self.response_cache is not None:
+                            body = self.response_cache.resolve(url, response.status, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                        if body is not None:
+                            return body
+                        if not conditional:
+                            raise FetchError(f'Could not fetch {url}: HTTP 304 to a request without validators')
+                        # A 304 for a page evicted from the cache in the meantime, fetched again in full once out of the semaphore
+                        break
+                    retry_after = response.headers.get('Retry-After')
+                    last_error = f'HTTP {response.status}'
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff_delay(attempt, retry_after))
+        else:
+            raise FetchError(f'Could not fetch {url}: {last_error}')
+        return await self.fetch(url, conditional=False)
+
+    async def fetch_many(self, urls: Iterable[str]) -> AsyncIterator[Tuple[str, str]]:
+        """Fetches all the given urls concurrently, yielding each one as soon as it arrives
+
+        Args:
+            urls (Iterable[str]): The urls to fetch
+
+        Yields:
+            Tuple[str, str]: The url and the response body, in order of completion
+        """
+
+        async def fetch_one(url: str) -> Tuple[str, str]:
+            return url, await self.fetch(url)
+
+        tasks = [asyncio.ensure_future(fetch_one(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,159 @@
+import math
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from cache import content_hash
+
+# The site prefix of a propertyId and the pattern of the site's own listing id in its listing urls
+SITE_ID_PATTERNS = {
+    'RM': (re.compile(r'(?:^|\.)rightmove\.co\.uk$'), re.compile(r'/properties/(\d+)')),
+    'UH': (re.compile(r'(?:^|\.)unihomes\.co\.uk$'), re.compile(r'/(\d+)/?$')),
+    'ZP': (re.compile(r'(?:^|\.)zoopla\.co\.uk$'), re.compile(r'/details/(\d+)')),
+}
+
+# Two listings of the same address on different sites are the same flat if their monthly prices are this close, relatively
+PRICE_TOLERANCE = 0.05
+
+ADDRESS_ABBREVIATIONS = {
+    'RD': 'ROAD', 'ST': 'STREET', 'LN': 'LANE', 'AVE': 'AVENUE', 'AV': 'AVENUE', 'GR': 'GROVE', 'GRV': 'GROVE',
+    'PL': 'PLACE', 'SQ': 'SQUARE', 'CT': 'COURT', 'CRES': 'CRESCENT', 'DR': 'DRIVE', 'TER': 'TERRACE', 'GDNS': 'GARDENS',
+}
+# Words that do not tell two flats apart: the city, and unit words whose number is kept with the other numbers
+ADDRESS_NOISE = {'LONDON', 'FLAT', 'APARTMENT', 'APT', 'UNIT', 'ROOM'}
+HOUSE_NUMBER = re.compile(r'^\d+[A-Z]?$')
+POSTCODE_DISTRICT = re.compile(r'^[A-Z]{1,2}\d[A-Z\d]?$')
+
+
+def property_id_from_link(link: str) -> str:
+    """Returns the stable propertyId of a listing from its url: the site prefix and the site's own listing id, e.g. RM138400000
+
+    Listings on unknown sites, or whose url carries no listing id, get a hash of their url without query or fragment
+
+    Args:
+        link (str): The url of the listing
+    """
+
+    parts = urlsplit(link)
+    host = parts.netloc.lower().split(':')[0]
+    for site, (host_pattern, id_pattern) in SITE_ID_PATTERNS.items():
+        if host_pattern.search(host):
+            match = id_pattern.search(parts.path)
+            if match is not None:
+                return f'{site}{match.group(1)}'
+            break
+    return 'URL' + content_hash(f'{host}{parts.path.rstrip("/")}')[:16]
+
+
+def site_of(propertyId: str) -> str:
+    """Returns the site prefix of a propertyId, or None for ids not derived from a known site's listing id
+    """
+
+    site = propertyId[:2]
+    return site if site in SITE_ID_PATTERNS and propertyId[2:].isdigit() else None
+
+
+@lru_cache(maxsize=8192)
+def split_address(location: str) -> Tuple[str, str]:
+    """Returns the comparable street of an address and its house or flat numbers, e.g. "Flat 2, 167 Coldharbour Ln, London SE15"
+    becomes ("COLDHARBOUR LANE SE15", "2 167")
+
+    The street is upper case, without punctuation, numbers or the city and with street abbreviations spelt out.
+    The numbers are kept in the order they appear, separated by spaces, and are empty if the address has none
+    """
+
+    words, numbers = [], []
+    for word in re.sub(r'[^A-Z0-9]+', ' ', location.upper()).split():
+        if HOUSE_NUMBER.match(word) and not POSTCODE_DISTRICT.match(word):
+            numbers.append(word)
+        elif word not in ADDRESS_NOISE:
+            words.append(ADDRESS_ABBREVIATIONS.get(word, word))
+    return ' '.join(words), ' '.join(numbers)
+
+
+def normalize_address(location: str) -> str:
+    """Returns the comparable street of an address, see split_address
+    """
+    return split_address(location)[0]
+
+
+def house_numbers(location: str) -> str:
+    """Returns the house or flat numbers of an address, see split_address
+    """
+    return split_address(location)[1] if location else ''
+
+
+def price_bucket(pricepm: int) -> int:
+    # Buckets are PRICE_TOLERANCE wide, so a matching price is always in the same or a neighbouring bucket
+    return int(math.log(max(pricepm, 1)) / math.log(1 + PRICE_TOLERANCE))
+
+
+def fingerprint(location: str, pricepm: int) -> Tuple[str, int]:
+    """Returns the (normalized address, price bucket) fingerprint of a listing, or None if it has no address or price
+    """
+
+    if not location or pricepm is None:
+        return None
+    address = normalize_address(location)
+    if not address:
+        return None
+    return address, price_bucket(pricepm)
+
+
+def same_price(pricepm: int, other_pricepm: int) -> bool:
+    return abs(pricepm - other_pricepm) <= PRICE_TOLERANCE * max(pricepm, other_pricepm)
+
+
+def same_numbers(numbers: str, other_numbers: str) -> bool:
+    # Two numbered addresses on the same street are different flats unless their numbers agree,
+    # an address without a number can only be compared at the street level
+    return not numbers or not other_numbers or numbers == other_numbers
+
+
+class DuplicateIndex:
+    """Index of listing fingerprints, to recognise the same flat listed on another site in constant time
+
+    Fingerprints are never dropped, so a flat removed on one site stays removed when it turns up on another
+    """
+
+    def __init__(self):
+        # Listings are kept per site under each fingerprint, as (pricepm, propertyId, house numbers),
+        # so a lookup never scans the listings of its own site
+        self.by_fingerprint: Dict[Tuple[str, int], Dict[str, List[Tuple[int, str, str]]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(listings) for by_site in self.by_fingerprint.values() for listings in by_site.values())
+
+    def add(self, propertyId: str, location: str, pricepm: int):
+        key = fingerprint(location, pricepm)
+        if key is not None:
+            self.add_fingerprint(key, pricepm, propertyId, house_numbers(location))
+
+    def add_fingerprint(self, key: Tuple[str, int], pricepm: int, propertyId: str, numbers: str = ''):
+        self.by_fingerprint.setdefault(key, {}).setdefault(site_of(propertyId), []).append((pricepm, propertyId, numbers))
+
+    def find(self, propertyId: str, location: str, pricepm: int) -> str:
+        """Returns the propertyId of an indexed listing of the same flat on a different site, or None
+
+        Args:
+            propertyId (str): The propertyId of the listing to look up, whose site is excluded from the match
+            location (str): The address of the listing
+            pricepm (int): The total monthly price of the listing
+        """
+
+        key = fingerprint(location, pricepm)
+        if key is None:
+            return None
+        address, bucket = key
+        numbers = house_numbers(location)
+        site = site_of(propertyId)
+        for neighbour in (bucket - 1, bucket, bucket + 1):
+            for other_site, listings in self.by_fingerprint.get((address, neighbour), {}).items():
+                # Listings of unknown sites are compared with every other listing
+                if site is not None and other_site == site:
+                    continue
+                for other_pricepm, other_propertyId, other_numbers in listings:
+                    if other_propertyId != propertyId and same_price(pricepm, other_pricepm) and same_numbers(numbers, other_numbers):
+                        return other_propertyId
+        return None
@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    site TEXT NOT NULL,
+    search TEXT NOT NULL,
+    pages TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    leaseExpires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+'''
+
+# The states of a job: waiting for a worker, being worked on under a lease, finished with a result, or given up on
+JOB_STATES = ('queued', 'leased', 'done', 'failed')
+
+
+class JobFailedError(Exception):
+    """Raised when a scrape job failed on every attempt, or no worker finished it in time
+    """
+
+
+class Job:
+    """A scrape job: the pages of one site to fetch and parse for one search, as leased by a worker
+    """
+
+    def __init__(self, id: int, site: str, search: dict, pages: List[int], attempts: int):
+        """Initialises the Job object
+
+        Args:
+            id (int): The job's id in the queue
+            site (str): The SITE of the scraper to run, a key of SITE_SCRAPERS
+            search (dict): The keyword arguments the scraper is built with, see SiteScraper.parameters
+            pages (List[int]): The numbers of the results pages to fetch
+            attempts (int): The number of times the job has been leased, this lease included
+        """
+
+        self.id = id
+        self.site = site
+        self.search = search
+        self.pages = pages
+        self.attempts = attempts
+
+
+class JobQueue:
+    """Local queue of scrape jobs in an SQLite database, shared by the bot and any number of worker processes
+
+    The bot enqueues jobs and polls for their results, workers lease jobs one at a time. A lease lasts lease_seconds
+    and can be extended while the job runs; the job of a worker that dies or hangs goes back to the queue when its lease
+    expires, and is given up on once it has been leased max_attempts times. A worker only finishes a job it still holds,
+    so a late result from a worker whose lease expired is ignored.
+    The database runs in WAL mode, and leases are taken in IMMEDIATE transactions so two workers never get the same job
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """Initialises the JobQueue object, creating the database at the given path if needed
+
+        Args:
+            path (str): The path of the SQLite database file, the same for the bot and its workers
+            max_attempts (int): The number of leases after which a job that keeps failing or expiring is failed
+        """
+
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.RLock()
+        # Transactions are begun explicitly, and a write waits up to 30 seconds for another process's transaction
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def transaction(self, mode: str = 'IMMEDIATE'):
+        return Transaction(self.connection, mode)
+
+    def enqueue(self, site: str, search: dict, page_lists: Iterable[List[int]]) -> List[int]:
+        """Queues one job per list of pages, all for the same site and search, in one transaction
+
+        Returns:
+            List[int]: The ids of the jobs, in the order of page_lists
+        """
+
+        now = time.time()
+        search_json = json.dumps(search, sort_keys=True)
+        with self.lock, self.transaction():
+            return [self.connection.execute('INSERT INTO jobs (site, search, pages, created) VALUES (?, ?, ?, ?)',
+                                            (site, search_json, json.dumps(pages), now)).lastrowid
+                    for pages in page_lists]
+
+    def requeue_expired(self, now: float):
+        # Must be called inside a transaction: expired leases go back to the queue, or fail once out of attempts
+        self.connection.execute("UPDATE jobs SET state = 'failed', worker = NULL, error = 'lease expired' "
+                                "WHERE state = 'leased' AND leaseExpires < ? AND attempts >= ?", (now, self.max_attempts))
+        self.connection.execute("UPDATE jobs SET state = 'queued', worker = NULL "
+                                "WHERE state = 'leased' AND leaseExpires < ?", (now,))
+
+    def lease(self, worker: str, lease_seconds: float, sites: List[str] = None) -> Job:
+        """Leases the oldest queued job to the given worker, optionally only a job of one of the given sites
+
+        Returns:
+            Job: The leased job, or None if no job is waiting
+        """
+
+        now = time.time()
+        site_filter = f' AND site IN ({",".join("?" * len(sites))})' if sites else ''
+        with self.lock, self.transaction():
+            self.requeue_expired(now)
+            row = self.connection.execute(f"SELECT id, site, search, pages, attempts FROM jobs WHERE state = 'queued'{site_filter} ORDER BY id LIMIT 1",
+                                          list(sites or [])).fetchone()
+            if row is None:
+                return None
+            job_id, site, search, pages, attempts = row
+            self.connection.execute("UPDATE jobs SET state = 'leased', worker = ?, leaseExpires = ?, attempts = attempts + 1 WHERE id = ?",
+                                    (worker, now + lease_seconds, job_id))
+        return Job(job_id, site, json.loads(search), json.loads(pages), attempts + 1)
+
+    def extend(self, job_id: int, worker: str, lease_seconds: float) -> bool:
+        """Extends a lease the worker still holds by lease_seconds from now
+
+        Returns:
+            bool: Whether the worker still held the lease
+        """
+
+        with self.lock, self.transaction():
+            cursor = self.connection.execute("UPDATE jobs SET leaseExpires = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                                             (time.time() + lease_seconds, job_id, worker))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result: dict) -> bool:
+        """Stores the result of a job the worker still holds
+
+        Returns:
+            bool: Whether the result was stored, False if the lease was lost to another worker
+        """
+
+        with self.lock, self.transaction():
+            cursor = self.connection.execute("UPDATE jobs SET state = 'done', result = ?, worker = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                                             (json.dumps(result), job_id, worker))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str):
+        """Gives a job the worker still holds back to the queue for another worker, or fails it once out of attempts
+        """
+
+        with self.lock, self.transaction():
+            self.connection.execute("UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, worker = NULL, error = ? "
+                                    "WHERE id = ? AND worker = ? AND state = 'leased'", (self.max_attempts, error, job_id, worker))
+
+    def finished(self, job_ids: List[int]) -> Dict[int, Tuple[str, dict, str]]:
+        """Returns the state, result and error of each of the given jobs that is done or failed, by job id
+        """
+
+        if not job_ids:
+            return {}
+        with self.lock, self.transaction():
+            self.requeue_expired(time.time())
+            rows = self.connection.execute(
+                f"SELECT id, state, result, error FROM jobs WHERE id IN ({','.join('?' * len(job_ids))}) AND state IN ('done', 'failed')",
+                list(job_ids)
+            ).fetchall()
+        return {job_id: (state, json.loads(result) if result is not None else None, error) for job_id, state, result, error in rows}
+
+    def delete(self, job_ids: List[int]):
+        with self.lock, self.transaction():
+            self.connection.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in job_ids])
+
+    def counts(self) -> Dict[str, int]:
+        """Returns the number of jobs in each state
+        """
+
+        with self.lock:
+            counts = dict(self.connection.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+        return {state: counts.get(state, 0) for state in JOB_STATES}
+
+
+class Transaction:
+    """Context manager running its block in one SQLite transaction, committed on success and rolled back on an exception
+    """
+
+    def __init__(self, connection: sqlite3.Connection, mode: str):
+        self.connection = connection
+        self.mode = mode
+
+    def __enter__(self):
+        self.connection.execute(f'BEGIN {self.mode}')
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.connection.execute('ROLLBACK' if exc_type is not None else 'COMMIT')
+        return False
@@ -0,0 +1,202 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Tuple
+
+# Upper bounds in seconds of the histogram buckets, as in the Prometheus client's defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Every metric the bot records: its type and help text
+METRIC_TYPES = {
+    'propertybot_fetch_seconds': ('histogram', 'Latency of page fetches, by host'),
+    'propertybot_fetch_bytes_total': ('counter', 'Bytes of page bodies received, by host'),
+    'propertybot_fetch_responses_total': ('counter', 'Page fetch responses by host and HTTP status, "error" for failed requests and "circuit_open" for requests not sent'),
+    'propertybot_circuit_open': ('gauge', 'Whether the circuit breaker of each host is open, 1, or closed, 0'),
+    'propertybot_page_fetch_seconds': ('gauge', 'Fetch latency of each results page in the last scrape, by site and page'),
+    'propertybot_page_bytes': ('gauge', 'Size of each results page in the last scrape, by site and page'),
+    'propertybot_page_status': ('gauge', 'HTTP status of each results page in the last scrape, by site and page'),
+    'propertybot_parse_seconds': ('histogram', 'Time to parse one results page, by site'),
+    'propertybot_listings_parsed_total': ('counter', 'Listings parsed into properties, by site'),
+    'propertybot_listings_dropped_total': ('counter', 'Listings dropped because a field was missing or malformed, by site'),
+    'propertybot_field_failures_total': ('counter', 'Listings dropped because of one field, by site and the field that was missing or malformed'),
+    'propertybot_layout_errors_total': ('counter', 'Page elements the scrapers expected but could not find, by site and element'),
+    'propertybot_scrape_seconds': ('histogram', 'Duration of a whole scrape of one site, by site'),
+    'propertybot_scrape_errors_total': ('counter', 'Scrapes of one site that failed, by site'),
+    'propertybot_last_scrape_listings': ('gauge', 'Properties found by the last scrape of each site'),
+    'propertybot_last_scrape_pages': ('gauge', 'Results pages fetched by the last scrape of each site'),
+    'propertybot_last_scrape_timestamp_seconds': ('gauge', 'Unix time the last scrape of each site finished'),
+    'propertybot_storage_properties': ('gauge', 'Properties stored for each channel'),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_value(value: float) -> str:
+    # Full precision, e.g. for unix timestamps, and integral values without a decimal point
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def label_key(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        # Bucket counts are cumulative, as exposed
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+
+class Metrics:
+    """Thread-safe registry of labelled counters, gauges and histograms, rendered in the Prometheus text format
+
+    Values are recorded from the event loop and from the scrape executor's threads, parsing processes report
+    back to the executor, which records on their behalf
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values: Dict[str, Dict[Labels, object]] = {name: {} for name in METRIC_TYPES}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self.lock:
+            series = self.values[name]
+            key = label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.values[name][label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        with self.lock:
+            self.values[name].setdefault(label_key(labels), Histogram()).observe(value)
+
+    def clear(self, name: str, **labels):
+        """Drops every series of a metric whose labels include the given ones, e.g. the pages of a site's previous scrape
+        """
+
+        wanted = set(label_key(labels))
+        with self.lock:
+            series = self.values[name]
+            for key in [key for key in series if wanted <= set(key)]:
+                del series[key]
+
+    def get(self, name: str, **labels):
+        """Returns the value of one series: a number for counters and gauges, a (count, sum) pair for histograms, None if unset
+        """
+
+        with self.lock:
+            value = self.values[name].get(label_key(labels))
+            if isinstance(value, Histogram):
+                return value.count, value.sum
+            return value
+
+    def series(self, name: str) -> List[Tuple[Dict[str, str], object]]:
+        with self.lock:
+            return [(dict(key), (value.count, value.sum) if isinstance(value, Histogram) else value) for key, value in self.values[name].items()]
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        """Observes the time spent in the with block into the named histogram
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text exposition format
+        """
+
+        def format_labels(key: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = key + extra
+            if not pairs:
+                return ''
+            escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+            return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in METRIC_TYPES.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(self.values[name].items()):
+                    if isinstance(value, Histogram):
+                        for bound, count in zip(value.buckets, value.counts):
+                            lines.append(f'{name}_bucket{format_labels(key, (("le", f"{bound:g}"),))} {count}')
+                        lines.append(f'{name}_bucket{format_labels(key, (("le", "+Inf"),))} {value.count}')
+                        lines.append(f'{name}_sum{format_labels(key)} {format_value(value.sum)}')
+                        lines.append(f'{name}_count{format_labels(key)} {value.count}')
+                    else:
+                        lines.append(f'{name}{format_labels(key)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves a Metrics registry at /metrics over HTTP from a background thread, for Prometheus to scrape
+    """
+
+    def __init__(self, metrics: Metrics, port: int, host: str = '127.0.0.1'):
+        """Initialises the MetricsServer object
+
+        Args:
+            metrics (Metrics): The registry to serve
+            port (int): The port to listen on, 0 picks a free one
+            host (str): The address to listen on, only the local machine by default
+        """
+
+        self.metrics = metrics
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/metrics'
+
+    def make_handler(self):
+        metrics_server = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = metrics_server.metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return MetricsHandler
+
+    def start(self) -> 'MetricsServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# The registry everything records into
+METRICS = Metrics()
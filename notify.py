@@ -0,0 +1,198 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from scrapers import Property
+
+# Discord rejects messages longer than this many characters
+MESSAGE_LIMIT = 2000
+
+
+def split_table(title: str, table: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Splits a title and a text table into code-block messages of at most limit characters each
+
+    The table's two header lines are repeated at the top of every message, and a row too long
+    to fit in a message on its own is cut short
+
+    Args:
+        title (str): The text sent before the table in the first message
+        table (str): The table, one row per line, starting with a header line and a separator line
+        limit (int): The maximum length of a message
+
+    Returns:
+        List[str]: The messages to send, in order
+    """
+
+    lines = table.splitlines()
+    if not lines:
+        return [title] if title else []
+    header, rows = lines[:2], lines[2:]
+    header_text = '\n'.join(header)
+    # The opening and closing ``` and the newlines around the header
+    overhead = len('``````') + len(header_text) + 1
+
+    messages, chunk, chunk_length = [], [], 0
+    prefix = f'{title}\n' if title else ''
+
+    def flush():
+        messages.append(f'{prefix if not messages else ""}```{header_text}\n' + '\n'.join(chunk) + '```')
+
+    for row in rows:
+        room = limit - overhead - (len(prefix) if not messages else 0)
+        if len(row) > room:
+            row = row[:room - 1] + '…'
+        if chunk and chunk_length + len(row) + 1 > room:
+            flush()
+            chunk, chunk_length = [], 0
+        chunk.append(row)
+        chunk_length += len(row) + 1
+    if chunk or not messages:
+        flush()
+    return messages
+
+
+class TokenBucket:
+    """Allows up to capacity events per period, waiting for the oldest event to expire when the bucket is empty
+    """
+
+    def __init__(self, capacity: int, period: float):
+        """Initialises the TokenBucket object
+
+        Args:
+            capacity (int): The number of events allowed in any period
+            period (float): The length of a period in seconds
+        """
+
+        self.capacity = capacity
+        self.period = period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.period)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) * self.period / self.capacity)
+
+
+class NotificationDispatcher:
+    """Outbound queue of new-property notifications, delivered to Discord in the background
+
+    notify() only queues the properties and returns, so a scrape never waits on Discord. Properties queued for a channel
+    within coalesce_delay of each other, e.g. by back-to-back scrapes, are sent together as one table, split into
+    messages under Discord's length limit. Sends respect a per-channel and a global rate-limit bucket, mirroring Discord's.
+    Channels are any object with an id and an async send(content) method, so a fake channel can stand in for Discord
+    """
+
+    def __init__(self, render: Callable[[List[Property]], str], coalesce_delay: float = 2.0,
+                 channel_rate: Tuple[int, float] = (5, 5.0), global_rate: Tuple[int, float] = (50, 1.0), max_retries: int = 3):
+        """Initialises the NotificationDispatcher object
+
+        Args:
+            render (Callable[[List[Property]], str]): Formats properties as a text table with a header and a separator line
+            coalesce_delay (float): Seconds to wait after the first queued batch for more batches to the same channel
+            channel_rate (Tuple[int, float]): The number of messages allowed per number of seconds in one channel
+            global_rate (Tuple[int, float]): The number of messages allowed per number of seconds across all channels
+            max_retries (int): The number of times a failed send is retried
+        """
+
+        self.render = render
+        self.coalesce_delay = coalesce_delay
+        self.channel_rate = channel_rate
+        self.global_bucket = TokenBucket(*global_rate)
+        self.channel_buckets: Dict[int, TokenBucket] = {}
+        self.max_retries = max_retries
+
+        # Per channel id: the channel, the time its first batch was queued and the properties queued so far
+        self.pending: Dict[int, Tuple[object, datetime, List[Property]]] = {}
+        self.wake = None
+        self.worker = None
+        self.closing = False
+        self.messages_sent = 0
+        self.failed_sends = 0
+
+    def notify(self, channel, properties: List[Property]):
+        """Queues new properties for the given channel and returns straight away
+
+        Must be called from the event loop the dispatcher delivers on, the delivery task is started on first use
+        """
+
+        if not properties:
+            return
+        if channel.id in self.pending:
+            self.pending[channel.id][2].extend(properties)
+        else:
+            self.pending[channel.id] = (channel, datetime.now(), list(properties))
+        self.start()
+        self.wake.set()
+
+    def start(self):
+        if self.worker is None or self.worker.done():
+            self.wake = asyncio.Event()
+            self.worker = asyncio.ensure_future(self.deliver_forever())
+
+    async def deliver_forever(self):
+        while not self.closing:
+            await self.wake.wait()
+            if not self.closing:
+                await asyncio.sleep(self.coalesce_delay)
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Delivers everything queued so far
+        """
+
+        pending, self.pending = self.pending, {}
+        for channel, queued_at, properties in pending.values():
+            # The same property queued by two coalesced scrapes is only listed once
+            unique = list({prop.getPropertyId(): prop for prop in properties}.values())
+            await self.send_properties(channel, f'New properties found at {queued_at.strftime("%Y-%m-%d %H:%M:%S")}:', unique)
+
+    async def send_properties(self, channel, title: str, properties: List[Property]):
+        """Sends the title and the properties' table to the channel now, split into as many messages as needed
+        """
+        await self.send_table(channel, title, self.render(properties))
+
+    async def send_table(self, channel, title: str, table: str):
+        for message in split_table(title, table):
+            await self.send(channel, message)
+
+    async def send(self, channel, content: str) -> bool:
+        """Sends one message within the rate limits, retrying failed sends with backoff
+
+        Returns:
+            bool: Whether the message was sent
+        """
+
+        bucket = self.channel_buckets.setdefault(channel.id, TokenBucket(*self.channel_rate))
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            try:
+                await channel.send(content)
+                self.messages_sent += 1
+                return True
+            except Exception as e:
+                print(f"Could not send a notification to channel {channel.id}: {e!r}")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(2 ** attempt)
+        self.failed_sends += 1
+        return False
+
+    async def close(self):
+        """Stops the delivery task after sending whatever is still queued
+        """
+
+        self.closing = True
+        if self.worker is not None and not self.worker.done():
+            self.wake.set()
+            await self.worker
+        await self.flush()
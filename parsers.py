@@ -0,0 +1,209 @@
+import json
+import re
+from typing import Callable, Dict, List, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# A step of a field path: the tag name and class of the element to find, None for any class
+Step = Tuple[str, str]
+
+
+class FieldSpec:
+    """Where one field of a listing is found: a path of (tag, class) steps from the listing element,
+    then either the text of the element found or one of its attributes
+    """
+
+    def __init__(self, name: str, path: List[Step], attribute: str = None):
+        self.name = name
+        self.path = path
+        self.attribute = attribute
+
+
+class ListingSpec:
+    """Describes the listings of a results page: the element holding each listing and the fields inside it
+
+    json_model optionally extracts the same fields from a JSON model embedded in the page, for JSONModelParser
+    """
+
+    def __init__(self, container: Step, fields: List[FieldSpec], json_model: Callable[[str], List[Dict[str, str]]] = None):
+        self.container = container
+        self.fields = fields
+        self.json_model = json_model
+
+
+class Parser:
+    """Base class for the parser backends, which all extract the same raw field strings from a results page
+    """
+    name = None
+
+    def extract(self, html: str, spec: ListingSpec) -> List[Dict[str, str]]:
+        """Returns one dict of raw field strings per listing on the page, with None for any field not found
+        """
+        raise NotImplementedError("Subclasses should implement this!")
+
+
+class SoupParser(Parser):
+    """Builds the full BeautifulSoup tree of the page, the reference backend
+    """
+    name = 'soup'
+
+    def listings(self, html: str, spec: ListingSpec) -> list:
+        tag, class_ = spec.container
+        return BeautifulSoup(html, 'html.parser').find_all(tag, class_=class_)
+
+    def extract(self, html: str, spec: ListingSpec) -> List[Dict[str, str]]:
+        return [self.extract_fields(listing, spec) for listing in self.listings(html, spec)]
+
+    def extract_fields(self, listing, spec: ListingSpec) -> Dict[str, str]:
+        fields = {}
+        for field in spec.fields:
+            element = listing
+            for tag, class_ in field.path:
+                element = element.find(tag, class_=class_) if class_ else element.find(tag)
+                if element is None:
+                    break
+            if element is None:
+                fields[field.name] = None
+            elif field.attribute:
+                fields[field.name] = element.get(field.attribute)
+            else:
+                fields[field.name] = element.text
+        return fields
+
+
+class StrainerParser(SoupParser):
+    """Only builds the listing subtrees of the page, using a SoupStrainer on the listing container
+    """
+    name = 'strainer'
+
+    def listings(self, html: str, spec: ListingSpec) -> list:
+        tag, class_ = spec.container
+        strainer = SoupStrainer(tag, class_=has_class(class_))
+        return BeautifulSoup(html, 'html.parser', parse_only=strainer).find_all(tag, class_=class_)
+
+
+def has_class(class_: str) -> Callable[[str], bool]:
+    """Returns a SoupStrainer class matcher, since the class attribute is still one unsplit string while parsing
+    """
+
+    def matches(value) -> bool:
+        if value is None:
+            return False
+        return class_ in (value.split() if isinstance(value, str) else value)
+    return matches
+
+
+class LxmlParser(Parser):
+    """Parses the page with lxml and extracts the fields with XPath expressions compiled once per spec
+
+    Requires the optional lxml package
+    """
+    name = 'lxml'
+
+    def __init__(self):
+        # Raises ImportError straight away if lxml is not installed
+        import lxml.html  # noqa: F401
+        self.compiled = {}
+
+    def __getstate__(self) -> dict:
+        # Compiled XPaths cannot be pickled, they are rebuilt in the parsing process
+        return {'compiled': {}}
+
+    @staticmethod
+    def class_test(class_: str) -> str:
+        return f'[contains(concat(" ", normalize-space(@class), " "), " {class_} ")]' if class_ else ''
+
+    def compile(self, spec: ListingSpec):
+        from lxml import etree
+
+        if id(spec) not in self.compiled:
+            tag, class_ = spec.container
+            container = etree.XPath(f'//{tag}{LxmlParser.class_test(class_)}')
+            fields = []
+            for field in spec.fields:
+                path = '/'.join(f'descendant::{tag}{LxmlParser.class_test(class_)}[1]' for tag, class_ in field.path)
+                fields.append((field, etree.XPath(path)))
+            self.compiled[id(spec)] = (spec, container, fields)
+        return self.compiled[id(spec)]
+
+    def extract(self, html: str, spec: ListingSpec) -> List[Dict[str, str]]:
+        import lxml.html
+
+        _, container, fields = self.compile(spec)
+        rows = []
+        for listing in container(lxml.html.fromstring(html)):
+            row = {}
+            for field, xpath in fields:
+                found = xpath(listing)
+                if not found:
+                    row[field.name] = None
+                elif field.attribute:
+                    row[field.name] = found[0].get(field.attribute)
+                else:
+                    row[field.name] = found[0].text_content()
+            rows.append(row)
+        return rows
+
+
+class JSONModelParser(StrainerParser):
+    """Reads the listings from a JSON model embedded in the page when the spec knows how to,
+    falling back to StrainerParser for pages without one
+    """
+    name = 'json'
+
+    def extract(self, html: str, spec: ListingSpec) -> List[Dict[str, str]]:
+        if spec.json_model is not None:
+            rows = spec.json_model(html)
+            if rows is not None:
+                return rows
+        return super().extract(html, spec)
+
+
+def find_json_model(html: str, variable: str) -> dict:
+    """Returns the JSON object assigned to the given javascript variable in the page, or None
+    """
+
+    match = re.search(re.escape(variable) + r'\s*=\s*', html)
+    if match is None:
+        return None
+    try:
+        model, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        return None
+    return model
+
+
+PARSERS = {parser.name: parser for parser in (SoupParser, StrainerParser, LxmlParser, JSONModelParser)}
+
+
+def get_parser(name: str = None) -> Parser:
+    """Returns a new parser backend by name: soup, strainer, lxml or json, the default_parser if None
+
+    Raises:
+        KeyError: If there is no parser with the given name
+        ImportError: If the parser needs a package that is not installed
+    """
+    return PARSERS[name or default_parser()]()
+
+
+def default_parser() -> str:
+    """Returns the name of the default parser backend: lxml, ten times faster than the BeautifulSoup backends on the
+    recorded pages, or strainer where the lxml package is not installed
+    """
+
+    try:
+        import lxml.html  # noqa: F401
+    except ImportError:
+        return 'strainer'
+    return 'lxml'
+
+
+def available_parsers() -> List[str]:
+    names = []
+    for name in PARSERS:
+        try:
+            get_parser(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
@@ -0,0 +1,105 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Maps the path prefix of each site's search url to its fixture folder,
+# the query parameter used for paging and that parameter's value on the first page
+ROUTES = {
+    '/property-to-rent': ('rightmove', 'index', '0'),
+    '/student-accommodation': ('unihomes', 'page', '1'),
+    '/to-rent': ('zoopla', 'pn', '1'),
+}
+
+
+class FixtureServer:
+    """Local HTTP stand-in that serves recorded result pages in place of the real sites
+
+    Point a scraper's base_url at FixtureServer.url to scrape the saved HTML in fixtures/ instead of the live site.
+    A request for e.g. /property-to-rent/find.html?...&index=24 is answered with fixtures/rightmove/index_24.html
+    """
+
+    def __init__(self, fixtures_dir: str = FIXTURES_DIR, host: str = '127.0.0.1', port: int = 0):
+        """Initialises the FixtureServer object
+
+        Args:
+            fixtures_dir (str): The folder containing one sub-folder of recorded pages per site
+            host (str): The address to listen on
+            port (int): The port to listen on, 0 picks a free one
+        """
+
+        self.fixtures_dir = fixtures_dir
+        self.requests_served = 0
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def resolve(self, path: str) -> str:
+        """Returns the fixture file answering the given request path, or None if there is none
+
+        Args:
+            path (str): The request path, including the query string
+        """
+
+        parts = urlsplit(path)
+        query = parse_qs(parts.query)
+        for prefix, (site, page_param, first_page) in ROUTES.items():
+            if parts.path.startswith(prefix):
+                page = query.get(page_param, [first_page])[0]
+                file_path = os.path.join(self.fixtures_dir, site, f'{page_param}_{page}.html')
+                if os.path.isfile(file_path):
+                    return file_path
+        return None
+
+    def make_handler(self):
+        fixture_server = self
+
+        class FixtureHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                file_path = fixture_server.resolve(self.path)
+                if file_path is None:
+                    self.send_error(404)
+                    return
+                with open(file_path, 'rb') as f:
+                    body = f.read()
+                fixture_server.requests_served += 1
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return FixtureHandler
+
+    def start(self) -> 'FixtureServer':
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> 'FixtureServer':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,132 @@
+import random
+import time
+from typing import Dict
+
+
+class SiteSchedule:
+    """The scraping state of one site: its new-listing arrival rate, current interval and recent requests
+    """
+
+    def __init__(self, site: str, interval: float):
+        self.site = site
+        self.interval = interval
+        # Exponentially weighted moving average of new listings per hour
+        self.arrival_rate = 0.0
+        self.last_scrape = None
+        self.pages_per_scrape = 1
+        self.quiet_scrapes = 0
+
+
+class AdaptiveSchedule:
+    """Decides how long to wait before scraping each site again, from the rate new listings arrive at on that site
+
+    A site is polled often enough to expect about target_new_per_scrape new listings per scrape while listings
+    are arriving, and backs off by backoff_factor after every scrape finding nothing, between min_interval and max_interval.
+    The pages a site fetches per hour are held under its budget, the pages all sites fetch per hour under the ceiling,
+    and every interval is jittered so scrapes do not land on the same second every time
+    """
+
+    def __init__(self, base_interval: float = 3600, min_interval: float = 300, max_interval: float = 7200,
+                 target_new_per_scrape: float = 2, backoff_factor: float = 1.5, smoothing: float = 0.3, jitter: float = 0.1,
+                 site_budgets: Dict[str, int] = None, default_budget: int = 120, request_ceiling: int = 300):
+        """Initialises the AdaptiveSchedule object
+
+        Args:
+            base_interval (float): The seconds between scrapes of a site before anything is known about it
+            min_interval (float): The shortest wait in seconds between two scrapes of a site
+            max_interval (float): The longest wait in seconds between two scrapes of a site
+            target_new_per_scrape (float): The number of new listings a scrape should find on average
+            backoff_factor (float): The factor the interval grows by after a scrape finding no new listing
+            smoothing (float): The weight of the latest scrape in the arrival rate average, between 0 and 1
+            jitter (float): The maximum random change of an interval, as a fraction of it
+            site_budgets (Dict[str, int]): The maximum results pages fetched per hour from each site
+            default_budget (int): The budget of sites missing from site_budgets
+            request_ceiling (int): The maximum results pages fetched per hour from all sites together
+        """
+
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_new_per_scrape = target_new_per_scrape
+        self.backoff_factor = backoff_factor
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.site_budgets = site_budgets or {}
+        self.default_budget = default_budget
+        self.request_ceiling = request_ceiling
+        self.sites: Dict[str, SiteSchedule] = {}
+
+    def site(self, site: str) -> SiteSchedule:
+        if site not in self.sites:
+            self.sites[site] = SiteSchedule(site, self.base_interval)
+        return self.sites[site]
+
+    def state(self) -> Dict[str, dict]:
+        """Returns the state of every site as plain values, with the last scrape as a unix time so it outlives the process
+        """
+
+        now, wall_now = time.monotonic(), time.time()
+        return {site: {
+            'interval': schedule.interval,
+            'arrival_rate': schedule.arrival_rate,
+            'last_scrape': None if schedule.last_scrape is None else wall_now - (now - schedule.last_scrape),
+            'pages_per_scrape': schedule.pages_per_scrape,
+            'quiet_scrapes': schedule.quiet_scrapes,
+        } for site, schedule in self.sites.items()}
+
+    def restore(self, state: Dict[str, dict]):
+        """Restores the sites' state returned by state(), e.g. by a previous run of the bot
+        """
+
+        now, wall_now = time.monotonic(), time.time()
+        for site, values in state.items():
+            schedule = self.site(site)
+            schedule.interval = values['interval']
+            schedule.arrival_rate = values['arrival_rate']
+            schedule.last_scrape = None if values['last_scrape'] is None else now - (wall_now - values['last_scrape'])
+            schedule.pages_per_scrape = values['pages_per_scrape']
+            schedule.quiet_scrapes = values['quiet_scrapes']
+
+    def budget(self, site: str) -> int:
+        return self.site_budgets.get(site, self.default_budget)
+
+    def requests_per_hour(self, exclude: str = None) -> float:
+        return sum(schedule.pages_per_scrape * 3600 / schedule.interval for schedule in self.sites.values() if schedule.site != exclude)
+
+    def record_scrape(self, site: str, new_listings: int, pages: int, now: float = None) -> float:
+        """Updates a site's arrival rate with the result of a scrape and returns the seconds to wait before scraping it again
+
+        The first scrape of a site only starts the clock, since every listing is new to it
+
+        Args:
+            site (str): The site scraped
+            new_listings (int): The number of listings the scrape found that had not been seen before
+            pages (int): The number of results pages the scrape fetched
+            now (float): The time the scrape finished, time.monotonic() by default
+        """
+
+        now = time.monotonic() if now is None else now
+        schedule = self.site(site)
+        schedule.pages_per_scrape = max(pages, 1)
+
+        if schedule.last_scrape is not None:
+            hours = max(now - schedule.last_scrape, 1) / 3600
+            schedule.arrival_rate = self.smoothing * (new_listings / hours) + (1 - self.smoothing) * schedule.arrival_rate
+            schedule.quiet_scrapes = 0 if new_listings > 0 else schedule.quiet_scrapes + 1
+
+            if schedule.quiet_scrapes > 0:
+                interval = schedule.interval * self.backoff_factor
+            elif schedule.arrival_rate > 0:
+                interval = self.target_new_per_scrape / schedule.arrival_rate * 3600
+            else:
+                interval = self.base_interval
+            schedule.interval = min(max(interval, self.min_interval), self.max_interval)
+        schedule.last_scrape = now
+
+        # Budgets win over min_interval: the site's own, then its share of what the other sites leave under the ceiling
+        budget_interval = schedule.pages_per_scrape * 3600 / self.budget(site)
+        spare_requests = self.request_ceiling - self.requests_per_hour(exclude=site)
+        ceiling_interval = schedule.pages_per_scrape * 3600 / spare_requests if spare_requests > 0 else self.max_interval
+        schedule.interval = max(schedule.interval, budget_interval, ceiling_interval)
+
+        return schedule.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
@@ -1,101 +1,433 @@
 from __future__ import annotations
+import asyncio
+import bisect
+import heapq
 import math
-from bs4 import BeautifulSoup
-import requests
-from typing import List
-from datetime import datetime, timedelta
+import sys
+import time
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Tuple
+from datetime import datetime
+
+from cache import ResponseCache, content_hash
+from fetcher import AsyncFetcher
+from transport import Transport, shared_transport
+from identity import DuplicateIndex, property_id_from_link
+from metrics import METRICS
+from parsers import Parser, get_parser
+from sites import RIGHTMOVE, UNIHOMES, ZOOPLA, SiteSpec
+
+
+@lru_cache(maxsize=4096)
+def date_string_to_ordinal(date_added: str) -> int:
+    # Cached, so every listing added on the same day shares one int object
+    return datetime.strptime(date_added, '%d/%m/%Y').toordinal()
+
+
+@lru_cache(maxsize=4096)
+def ordinal_to_date_string(date_ordinal: int) -> str:
+    return datetime.fromordinal(date_ordinal).strftime('%d/%m/%Y')
+
+
+def is_storable(property: Property) -> bool:
+    return property.getPricePM() is not None and property.getDateOrdinal() is not None
 
 
 class DataStorage:
     """Class to store the properties found by the bot
+
+    Properties are indexed by propertyId for constant-time lookups, removed propertyIds are kept as
+    tombstones so they are never added again, the fingerprints of all properties ever stored are indexed to
+    recognise the same flat listed on another site, and the order of the properties by date added
+    (newest first) is kept sorted incrementally as properties are added and removed.
+    generation is bumped on every change, so views built from the stored properties know when they are stale
     """
     
     def __init__(self):
         """Initialises the DataStorage object
         """
-        self.properties = []
-        self.removed_properties = []
+        self.properties_by_id = {}
+        self.removed_property_ids = set()
+        self.duplicates = DuplicateIndex()
+        # Sorted (-date ordinal, insertion number, propertyId) keys, newest first
+        self.date_order = []
+        self.sort_keys = {}
+        self.insertions = 0
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self.properties_by_id)
+
+    def __contains__(self, propertyId: str) -> bool:
+        return propertyId in self.properties_by_id
+
+    def index_property(self, property: Property) -> tuple:
+        """Adds the given property to the properties index and returns its date order key, without inserting it in the date order
+        """
+
+        propertyId = property.getPropertyId()
+        self.properties_by_id[propertyId] = property
+        self.duplicates.add(propertyId, property.getLocation(), property.getPricePM())
+
+        sort_key = (-property.getDateOrdinal(), self.insertions, propertyId)
+        self.insertions += 1
+        self.sort_keys[propertyId] = sort_key
+        self.generation += 1
+        return sort_key
 
     def add_property(self, property: Property):
-        """Adds the given property to the properties list
+        """Adds the given property to the properties index and date order
 
         Args:
             property (Property): The property to be added to the properties list
         """
 
-        propertyId = property.getPropertyId()
-        dateAdded = property.getDateAdded()
-        pricepm = int(property.getPricePM())
-        priceppw = int(property.getPricePW())
-        location = property.getLocation()
-        link = property.getLink()
-
-        self.properties.append({
-            'propertyId': propertyId,
-            'dateAdded': datetime.strptime(dateAdded, '%d/%m/%Y'),
-            'ppm': pricepm,
-            'pppw': priceppw,
-            'location': location,
-            'link': link
-        })
+        bisect.insort(self.date_order, self.index_property(property))
 
     def remove_property(self, propertyID: str):
-        removed_property = [prop for prop in self.properties if prop['propertyId'] == propertyID]
-        self.removed_properties.append(removed_property)
-        self.properties = [prop for prop in self.properties if prop['propertyId'] != propertyID]
-        self.properties = sorted(self.properties, key=lambda k: k['dateAdded'], reverse=True)
+        """Removes the property with the given propertyId and stops it from being added again
+
+        Args:
+            propertyID (str): The propertyId of the property to remove
+
+        Raises:
+            KeyError: If no property with the given propertyId is stored
+        """
+
+        if propertyID not in self.properties_by_id:
+            raise KeyError(propertyID)
+
+        del self.properties_by_id[propertyID]
+        sort_key = self.sort_keys.pop(propertyID)
+        del self.date_order[bisect.bisect_left(self.date_order, sort_key)]
+        self.removed_property_ids.add(propertyID)
+        self.generation += 1
 
     def remove_all_properties(self):
-        self.removed_properties.append(self.properties)
-        self.properties = []
+        self.removed_property_ids.update(self.properties_by_id)
+        self.properties_by_id = {}
+        self.date_order = []
+        self.sort_keys = {}
+        self.generation += 1
+
+    def is_known(self, propertyId: str) -> bool:
+        """Returns whether the given propertyId is stored or has been removed
+        """
+        return propertyId in self.properties_by_id or propertyId in self.removed_property_ids
 
     def add_properties(self, properties: List[Property]) -> None:
+        new_keys = []
         for property in properties:
-            if (property.getPricePM() != "") and (property.getPropertyId() not in [prop['propertyId'] for prop in self.properties]) and (property.getPropertyId() not in [prop['propertyId'] for prop in self.removed_properties]):
-                self.add_property(property)
-        self.properties = sorted(self.properties, key=lambda k: k['dateAdded'], reverse=True)
+            if is_storable(property) and not self.is_known(property.getPropertyId()):
+                new_keys.append(self.index_property(property))
+
+        # A large batch is merged into the date order in one pass rather than inserted key by key
+        new_keys.sort()
+        if len(new_keys) < 64:
+            for sort_key in new_keys:
+                bisect.insort(self.date_order, sort_key)
+        else:
+            self.date_order = list(heapq.merge(self.date_order, new_keys))
+
+    def duplicate_of(self, property: Property) -> str:
+        """Returns the propertyId of a stored or removed listing of the same flat on another site, or None
+        """
+        return self.duplicates.find(property.getPropertyId(), property.getLocation(), property.getPricePM())
 
     def check_new_properties(self, new_properties: List[Property]) -> List[Property]:
-        existing_property_ids = [prop['propertyId'] for prop in self.properties]
-        new_properties = [prop for prop in new_properties if prop.getPropertyId() not in existing_property_ids]
-        return new_properties
+        """Returns the given properties that are neither stored nor removed, without duplicates
+
+        A property is also left out if the same flat is already stored, or was removed, from another site,
+        or appears earlier in new_properties from another site
+
+        Args:
+            new_properties (List[Property]): The properties found by a scrape
+
+        Returns:
+            List[Property]: The properties not seen before
+        """
+
+        seen_property_ids = set()
+        seen_duplicates = DuplicateIndex()
+        unseen_properties = []
+        for prop in new_properties:
+            propertyId = prop.getPropertyId()
+            if self.is_known(propertyId) or propertyId in seen_property_ids:
+                continue
+            if self.duplicate_of(prop) is not None or seen_duplicates.find(propertyId, prop.getLocation(), prop.getPricePM()) is not None:
+                continue
+            seen_property_ids.add(propertyId)
+            seen_duplicates.add(propertyId, prop.getLocation(), prop.getPricePM())
+            unseen_properties.append(prop)
+        return unseen_properties
+
+    def get_latest_properties(self, num_properties: int) -> List[Property]:
+        """Returns the num_properties most recently added properties, newest first
+        """
+        return [self.properties_by_id[propertyId] for _, _, propertyId in self.date_order[:num_properties]]
     
-    def get_properties(self) -> List[dict]:
-        return self.properties
+    def iter_properties(self) -> Iterator[Property]:
+        """Yields all stored properties, newest first
+        """
+        for _, _, propertyId in self.date_order:
+            yield self.properties_by_id[propertyId]
+
+    def get_properties(self) -> List[Property]:
+        """Returns all stored properties, newest first
+        """
+        return [self.properties_by_id[propertyId] for _, _, propertyId in self.date_order]
 
 
 # Base scraper class
 class Scraper:
+    # Where the listings and their fields are found on a results page, see parsers.ListingSpec
+    LISTING_SPEC = None
+    # The site label of the scraper's metrics
+    SITE = None
 
-    def __init__(self):
+    def __init__(self, response_cache: ResponseCache = None, parser: Parser = None, transport: Transport = None):
+        """Initialises the Scraper object
+
+        Args:
+            response_cache (ResponseCache): If given, pages are fetched with conditional requests and unchanged pages are not parsed again
+            parser (Parser): The parser backend extracting listings from results pages, the default_parser by default
+            transport (Transport): The pooled HTTP client pages are fetched over, the shared default transport if None
+        """
+        self.response_cache = response_cache
+        self.parser = parser or get_parser()
+        self.transport = transport or shared_transport()
+        # The number of results pages fetched by the last scrape
+        self.pages_fetched = 0
+        # Without a response cache, the parses of the current scrape's pages made while fetching, by content hash,
+        # so a page parsed by the stale check of an incremental scrape is not parsed a second time
+        self.page_parses: Dict[str, List[Property]] = {}
+
+    def __getstate__(self) -> dict:
+        # Scrapers are pickled into the parsing process pool, which only needs the parsing parameters
+        state = self.__dict__.copy()
+        state['soup'] = None
+        state['is_known_property'] = None
+        state['response_cache'] = None
+        state['transport'] = None
+        state['page_parses'] = {}
+        return state
+
+    def new_fetcher(self) -> AsyncFetcher:
+        return AsyncFetcher(transport=self.transport, response_cache=self.response_cache)
+
+    def scrape(self) -> List[Property]:
+        """Scrapes the site with a temporary AsyncFetcher, for callers outside of an event loop
+        """
+        async def scrape_with_fetcher():
+            async with self.new_fetcher() as fetcher:
+                return await self.scrape_async(fetcher)
+
+        return asyncio.run(scrape_with_fetcher())
+
+    async def scrape_async(self, fetcher: AsyncFetcher) -> List[Property]:
+        """Scrapes every results page, parsing each page as soon as it arrives
+
+        Args:
+            fetcher (AsyncFetcher): The fetcher used for all page requests
+
+        Returns:
+            List[Property]: The properties found, in the order of the results pages
+        """
+
+        start = time.perf_counter()
+        properties_by_page = {}
+        try:
+            async for page, html in self.iter_pages(fetcher):
+                properties_by_page[page] = self.parse_recorded(html)
+        except Exception:
+            METRICS.inc('propertybot_scrape_errors_total', site=self.SITE)
+            raise
+        properties_found = [prop for page in sorted(properties_by_page) for prop in properties_by_page[page]]
+        self.after_scrape(properties_found)
+        self.record_pages(fetcher, sorted(properties_by_page))
+        self.record_scrape(time.perf_counter() - start, len(properties_found), len(properties_by_page))
+        return properties_found
+
+    def after_scrape(self, properties_found: List[Property]):
+        """Called with the properties found once a scrape has been fully parsed
+        """
         pass
 
-    def scrape(self):
+    def fetch_pages(self) -> List[str]:
+        """Fetches the html of every results page with a temporary AsyncFetcher, without parsing any listings
+
+        Blocking, meant to be run in a worker thread so the pages can then be parsed elsewhere
+
+        Returns:
+            List[str]: The html of each results page, in page order
+        """
+        async def fetch_with_fetcher():
+            async with self.new_fetcher() as fetcher:
+                html_by_page = {}
+                async for page, html in self.iter_pages(fetcher):
+                    html_by_page[page] = html
+                self.record_pages(fetcher, sorted(html_by_page))
+                return [html_by_page[page] for page in sorted(html_by_page)]
+
+        return asyncio.run(fetch_with_fetcher())
+
+    def fetch_page_numbers(self, pages: List[int]) -> Dict[int, str]:
+        """Fetches the html of the given results pages concurrently with a temporary AsyncFetcher, e.g. the page range of a worker's job
+
+        Returns:
+            Dict[int, str]: The html of each page, by page number
+        """
+        async def fetch_with_fetcher():
+            async with self.new_fetcher() as fetcher:
+                page_urls = {self.page_url(page): page for page in pages}
+                html_by_page = {page_urls[page_url]: html async for page_url, html in fetcher.fetch_many(page_urls)}
+                self.record_pages(fetcher, sorted(html_by_page))
+                return html_by_page
+
+        return asyncio.run(fetch_with_fetcher())
+
+    def iter_pages(self, fetcher: AsyncFetcher) -> AsyncIterator[Tuple[int, str]]:
+        """Yields the page number and html of every results page, in order of arrival
+        """
         raise NotImplementedError("Subclasses should implement this!")
-    
-    def get_page_soup(self, url: str) -> BeautifulSoup:
-        response = requests.get(url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        return soup
-    
-    
+
+    def page_url(self, page: int) -> str:
+        raise NotImplementedError("Subclasses should implement this!")
+
+    def parameters(self) -> dict:
+        raise NotImplementedError("Subclasses should implement this!")
+
+    def record_pages(self, fetcher: AsyncFetcher, pages: List[int]):
+        """Records the status, size and fetch latency of each page of the last scrape, replacing the previous scrape's
+        """
+
+        for name in ('propertybot_page_fetch_seconds', 'propertybot_page_bytes', 'propertybot_page_status'):
+            METRICS.clear(name, site=self.SITE)
+        for page in pages:
+            fetched = fetcher.last_fetches.get(self.page_url(page))
+            if fetched is None:
+                continue
+            status, size, seconds = fetched
+            METRICS.set('propertybot_page_status', status, site=self.SITE, page=page)
+            METRICS.set('propertybot_page_bytes', size, site=self.SITE, page=page)
+            METRICS.set('propertybot_page_fetch_seconds', seconds, site=self.SITE, page=page)
+
+    def record_parse(self, seconds: float, parsed: int, failures: Dict[str, int]):
+        METRICS.observe('propertybot_parse_seconds', seconds, site=self.SITE)
+        METRICS.inc('propertybot_listings_parsed_total', parsed, site=self.SITE)
+        METRICS.inc('propertybot_listings_dropped_total', sum(failures.values()), site=self.SITE)
+        for field, dropped in failures.items():
+            METRICS.inc('propertybot_field_failures_total', dropped, site=self.SITE, field=field)
+
+    def record_scrape(self, seconds: float, listings: int, pages: int):
+        self.pages_fetched = pages
+        METRICS.observe('propertybot_scrape_seconds', seconds, site=self.SITE)
+        METRICS.set('propertybot_last_scrape_listings', listings, site=self.SITE)
+        METRICS.set('propertybot_last_scrape_pages', pages, site=self.SITE)
+        METRICS.set('propertybot_last_scrape_timestamp_seconds', time.time(), site=self.SITE)
+
+    def parse_page(self, html: str) -> Tuple[List[Property], Dict[str, int]]:
+        """Parses a results page into properties, dropping listings with a missing or malformed field instead of failing the page
+
+        Returns:
+            Tuple[List[Property], Dict[str, int]]: The storable properties found and the number of listings dropped for each field
+        """
+        return self.build_properties(self.parser.extract(html, self.LISTING_SPEC))
+
+    def parse_html(self, html: str) -> List[Property]:
+        return self.parse_page(html)[0]
+
+    def parse_recorded(self, html: str) -> List[Property]:
+        """Like parse_html_cached, recording the parse time and listings parsed and dropped when the page is actually parsed
+        """
+
+        properties = self.cached_parse(html)
+        if properties is None:
+            start = time.perf_counter()
+            properties, failures = self.parse_page(html)
+            self.record_parse(time.perf_counter() - start, len(properties), failures)
+            self.remember_parse(html, properties)
+        return properties
+
+    def parse_key(self, html: str) -> tuple:
+        # Relative dates such as "Added today" depend on the day the page is parsed, and the properties built depend on
+        # the search, e.g. a monthly price worked out from a weekly one for its number of people
+        return (type(self).__name__, self.parser.name, tuple(sorted(self.parameters().items())), content_hash(html), datetime.now().date())
+
+    def cached_parse(self, html: str) -> List[Property]:
+        """Returns the memoised parse of a page with the same content, from the response cache or else from the current scrape's
+        page_parses, or None if there is no match
+        """
+        if self.response_cache is None:
+            return self.page_parses.get(content_hash(html)) if self.page_parses else None
+        return self.response_cache.get_parsed(self.parse_key(html))
+
+    def remember_parse(self, html: str, properties: List[Property]):
+        if self.response_cache is not None:
+            self.response_cache.put_parsed(self.parse_key(html), properties)
+
+    def parse_html_cached(self, html: str) -> List[Property]:
+        properties = self.cached_parse(html)
+        if properties is None:
+            properties = self.parse_html(html)
+            if self.response_cache is None:
+                self.page_parses[content_hash(html)] = properties
+            self.remember_parse(html, properties)
+        return properties
+
+    def build_properties(self, rows: List[Dict[str, str]]) -> Tuple[List[Property], Dict[str, int]]:
+        """Builds the properties of a page from the raw field strings a parser extracted for each listing
+
+        Returns:
+            Tuple[List[Property], Dict[str, int]]: The storable properties and the number of listings dropped for each field
+        """
+        raise NotImplementedError("Subclasses should implement this!")
+
+
 # Property class
 class Property:
+    """A single listing, used both for scraped results and as the record kept by DataStorage
+
+    Slotted to keep retained history small: the date is stored as a date ordinal and locations are interned
+    """
+    __slots__ = ('propertyId', 'date_ordinal', 'num_people', 'pricepm', 'pricepw', 'location', 'link')
+
     # The number of weeks in a month
     weeks_per_month = 4.43524
 
     def __init__(self, num_people: int):
-        self.date_added = None
+        self.propertyId = None
+        self.date_ordinal = None
         self.num_people = num_people
         self.pricepm = None
         self.pricepw = None
-        pass
+        self.location = None
+        self.link = None
+
+    @classmethod
+    def from_fields(cls, propertyId: str, date_ordinal: int, pricepm: int, pricepw: int, location: str, link: str, num_people: int = None) -> Property:
+        """Builds a property straight from stored fields, e.g. a database row
+        """
+        prop = cls(num_people)
+        prop.propertyId = propertyId
+        prop.date_ordinal = date_ordinal
+        prop.pricepm = pricepm
+        prop.pricepw = pricepw
+        prop.location = sys.intern(location)
+        prop.link = link
+        return prop
 
     def __str__(self):
         return f'Property {self.propertyId} in {self.location}'
     
     def addDateAdded(self, date_added: str):
-        self.date_added = date_added
+        try:
+            self.date_ordinal = date_string_to_ordinal(date_added)
+        except ValueError:
+            self.date_ordinal = None
+
+    def addDateOrdinal(self, date_ordinal: int):
+        self.date_ordinal = date_ordinal
 
     def addPricePM(self, pricepm: str):
         self.pricepm = int(pricepm)
@@ -106,25 +438,28 @@ class Property:
             self.pricepm = int(self.pricepw * Property.weeks_per_month * self.num_people)
 
     def addLocation(self, location: str):
-        self.location = location
+        self.location = sys.intern(location)
 
     def addLink(self, link: str):
         self.link = link
 
-    def addPropertyId(self, date: str = None, pricepm: int = None, location: str = None):
-        if date is None:
-            date = self.date_added
-        if pricepm is None:
-            pricepm = self.pricepm
-        if location is None:
-            location = self.location
-        self.propertyId = f'{date[:2]}{str(pricepm)[:2]}{location.replace(" ", "")[:2].upper()}'
+    def addPropertyId(self, propertyId: str = None):
+        """Sets the propertyId, by default derived from the listing's link so it stays the same when the price or date changes
+        """
+        if propertyId is None:
+            propertyId = property_id_from_link(self.link)
+        self.propertyId = propertyId
 
     def getPropertyId(self) -> str:
         return self.propertyId
 
     def getDateAdded(self) -> str:
-        return self.date_added
+        if self.date_ordinal is None:
+            return None
+        return ordinal_to_date_string(self.date_ordinal)
+
+    def getDateOrdinal(self) -> int:
+        return self.date_ordinal
     
     def getPricePM(self) -> int:
         return self.pricepm
@@ -138,127 +473,180 @@ class Property:
     def getLink(self) -> str:
         return self.link
 
+    def to_row(self) -> tuple:
+        """Returns the property's fields in the order of from_fields, without num_people
+        """
+        return (self.propertyId, self.date_ordinal, self.pricepm, self.pricepw, self.location, self.link)
 
-class RightMoveScraper(Scraper):
-
-    def __init__(self, min_price_per_month: int, max_price_per_month: int, num_bedrooms: int, num_people: int):
-        super().__init__()
-        self.min_price = min_price_per_month
-        self.max_price = max_price_per_month
-        self.num_bedrooms = num_bedrooms
-        self.num_people = num_people
-        
-        self.url = f'https://www.rightmove.co.uk/property-to-rent/find.html?locationIdentifier=STATION%5E9662&sortType=6&savedSearchId=46395805&maxBedrooms={self.num_bedrooms}&minBedrooms={self.num_bedrooms}&maxPrice={self.max_price}&minPrice={self.min_price}&radius=5&includeLetAgreed=false&letType=student&furnishTypes=furnished'
-        self.soup = self.get_page_soup(self.url)
-
-        self.today = datetime.now()
-        self.yesterday = self.today - timedelta(days=1)
-        
-
-    def reset_scraper(self):
-        self.url = f'https://www.rightmove.co.uk/property-to-rent/find.html?locationIdentifier=STATION%5E9662&sortType=6&savedSearchId=46395805&maxBedrooms={self.num_bedrooms}&minBedrooms={self.num_bedrooms}&maxPrice={self.max_price}&minPrice={self.min_price}&radius=5&includeLetAgreed=false&letType=student&furnishTypes=furnished'
-        self.soup = self.get_page_soup(self.url)
+    def to_dict(self) -> dict:
+        """Returns the property as a dict, for rendering with tabulate
+        """
+        return {
+            'propertyId': self.propertyId,
+            'dateAdded': datetime.fromordinal(self.date_ordinal),
+            'ppm': self.pricepm,
+            'pppw': self.pricepw,
+            'location': self.location,
+            'link': self.link
+        }
+
+
+class SiteScraper(Scraper):
+    """Scraper of any site described by a SiteSpec: the spec gives the urls, paging, listing fields and their normalizers
+
+    In incremental mode a scrape stops paging at the first page that only holds propertyIds already known
+    (per is_known_property) or listings older than the newest date seen by the previous scrape.
+    Every full_sweep_every scrapes, and whenever there is no previous scrape to compare against, all pages are fetched
+    """
+    SPEC: SiteSpec = None
+    # Whether scrapes of the site are incremental unless told otherwise
+    INCREMENTAL = False
 
-    def num_of_pages(self) -> int:
-        num_of_results = self.soup.find('span', {'class': 'searchHeader-resultCount'}).text
-        num_of_pages = int(num_of_results) // 24 + 1
-        return num_of_pages
-    
-    def parse_date(self, date_string: str) -> str:
-        if 'yesterday' in date_string:
-            return self.yesterday.strftime('%d/%m/%Y')
-        elif 'today' in date_string:
-            return self.today.strftime('%d/%m/%Y')
-        else:
-            return date_string
+    def __init__(self, min_price: int, max_price: int, num_bedrooms: int, num_people: int, base_url: str = None,
+                 is_known_property: Callable[[str], bool] = None, incremental: bool = None, full_sweep_every: int = 24, incremental_window: int = 2,
+                 response_cache: ResponseCache = None, parser: Parser = None, transport: Transport = None):
+        """Initialises the SiteScraper object, no page is fetched until the first scrape
 
-    def scrape(self) -> List[Property]:
-        properties_found = []
-        num_of_pages = self.num_of_pages()
-        
-        for page in range(0, num_of_pages):
-            page_url = f'https://www.rightmove.co.uk/property-to-rent/find.html?locationIdentifier=STATION%5E9662&sortType=6&savedSearchId=46395805&maxBedrooms={self.num_bedrooms}&minBedrooms={self.num_bedrooms}&maxPrice={self.max_price}&minPrice={self.min_price}&radius=5&includeLetAgreed=false&letType=student&furnishTypes=furnished&index={24 * page}'
-            page_soup = self.get_page_soup(page_url)
-
-            property_listings = page_soup.find_all('div', class_='l-searchResult')
-            for listing in property_listings:
-                foundProperty = Property(self.num_people)
-                
-                pricepm = listing.find('span', class_='propertyCard-priceValue').text.replace("£", "").replace(",", "").replace("pcm", "").strip()
-                if pricepm != '':
-                    foundProperty.addPricePM(pricepm)
-                
-                pricepw = listing.find('span', class_='propertyCard-secondaryPriceValue').text.replace("£", "").replace(",", "").replace("pw", "").strip()
-                if pricepw != '':
-                    foundProperty.addPricePW(pricepw)
-                
-                link = "https://rightmove.co.uk" + listing.find('a', class_='propertyCard-link')['href']
-                foundProperty.addLink(link)
-                
-                location = listing.find('address', class_='propertyCard-address').text.replace("\n", "")
-                foundProperty.addLocation(location)
-                
-                property_date = self.parse_date(listing.find('span', class_='propertyCard-branchSummary-addedOrReduced').text.replace("\n", "").replace("Added on ", "").replace("Reduced on ", "").strip())
-                foundProperty.addDateAdded(property_date)
-
-                foundProperty.addPropertyId(property_date, pricepm, location)
-
-                properties_found.append(foundProperty)
-        
-        return properties_found
-        
-
-class UniHomesScraper(Scraper):
+        Args:
+            min_price (int): The minimum price, per month or per person per week as the spec's price_filter says
+            max_price (int): The maximum price, in the same unit
+            num_bedrooms (int): The number of bedrooms
+            num_people (int): The number of people
+            base_url (str): The site's base url, e.g. to scrape a local FixtureServer instead
+            is_known_property (Callable[[str], bool]): Returns whether a propertyId is already stored, e.g. DataStorage.is_known
+            incremental (bool): Whether to stop paging once pages only hold already seen listings, the class's INCREMENTAL by default
+            full_sweep_every (int): The number of scrapes between two full sweeps in incremental mode
+            incremental_window (int): The number of pages fetched concurrently in incremental mode
+            response_cache (ResponseCache): The cache used for conditional requests, see Scraper
+            parser (Parser): The parser backend, see Scraper
+            transport (Transport): The pooled HTTP client, see Scraper
+        """
 
-    def __init__(self, min_price: int, max_price: int, num_bedrooms: int, num_people: int):
-        super().__init__()
+        super().__init__(response_cache, parser, transport)
         self.min_price = min_price
-        self.max_pppw = max_price
+        self.max_price = max_price
         self.num_bedrooms = num_bedrooms
         self.num_people = num_people
-        
-        self.url = f'https://www.unihomes.co.uk/student-accommodation/london/near-kings-college-london?bedrooms={self.num_bedrooms}&max-price={self.max_pppw}'
-        self.soup = self.get_page_soup(self.url)
-
+        self.base_url = base_url or self.SPEC.base_url
+
+        self.is_known_property = is_known_property
+        self.incremental = self.INCREMENTAL if incremental is None else incremental
+        self.full_sweep_every = full_sweep_every
+        self.incremental_window = incremental_window
+        self.scrapes_since_full_sweep = 0
+        self.high_water_mark = None
+
+        self.url = self.page_url(self.SPEC.pagination.first_page)
+        # The pagination element of the last fetched first page, see iter_pages
+        self.soup = None
         self.today = datetime.now()
 
-    def reset_scraper(self):
-        self.url = f'https://www.rightmove.co.uk/property-to-rent/find.html?locationIdentifier=STATION%5E9662&sortType=6&savedSearchId=46395805&maxBedrooms={self.num_bedrooms}&minBedrooms={self.num_bedrooms}&maxPrice={self.max_price}&minPrice={self.min_price}&radius=5&includeLetAgreed=false&letType=student&furnishTypes=furnished'
-        self.soup = self.get_page_soup(self.url)
+    def parameters(self) -> dict:
+        """Returns the keyword arguments that build the same search's scraper in another process, e.g. a scrape worker
+        """
+        return {'min_price': self.min_price, 'max_price': self.max_price, 'num_bedrooms': self.num_bedrooms,
+                'num_people': self.num_people, 'base_url': self.base_url}
 
-    def scrape(self) -> List[Property]:
-        properties_found = []
-        property_listings = self.soup.find_all('div', class_='property-listing-column')
-        for listing in property_listings:
-            foundProperty = Property(self.num_people)
-            
-            pricepw = listing.find('div', class_='property_details').find('span', class_="font-weight-700").text.replace("£", "").strip()
-            foundProperty.addPricePW(pricepw)
+    def page_url(self, page: int) -> str:
+        return self.SPEC.page_url(self.base_url, page, min_price=self.min_price, max_price=self.max_price, num_bedrooms=self.num_bedrooms)
 
-            link = listing.find('a')['href']
-            foundProperty.addLink(link)
+    def num_of_pages(self) -> int:
+        num_of_pages = self.SPEC.pagination.num_of_pages(self.soup)
+        if num_of_pages is None:
+            if self.SPEC.pagination.required:
+                # The page layout changed or the page is not a results page, so only the first page is scraped
+                METRICS.inc('propertybot_layout_errors_total', site=self.SITE, element=self.SPEC.pagination.element[1])
+            return 1
+        return num_of_pages
 
-            location = listing.find('div', class_="property_rooms_address").find('p', class_="font-size-14px").text
-            foundProperty.addLocation(location)
+    def full_sweep_due(self) -> bool:
+        return not self.incremental or self.high_water_mark is None or self.scrapes_since_full_sweep >= self.full_sweep_every
 
-            date_added = self.today.strftime('%d/%m/%Y')
-            foundProperty.addDateAdded(date_added)
+    def is_page_stale(self, html: str) -> bool:
+        """Returns whether a results page only holds already known listings or listings older than the high-water mark
+        """
 
-            foundProperty.addPropertyId(date_added, None, location)
+        page_properties = self.parse_html_cached(html)
+        if all(prop.getDateOrdinal() is not None and prop.getDateOrdinal() < self.high_water_mark for prop in page_properties):
+            return True
+        return self.is_known_property is not None and all(self.is_known_property(prop.getPropertyId()) for prop in page_properties)
 
-            properties_found.append(foundProperty)
+    async def iter_pages(self, fetcher: AsyncFetcher) -> AsyncIterator[Tuple[int, str]]:
+        """Yields the results pages, fetching all pages after the first concurrently on a full sweep
 
-        return properties_found
+        The first page is fetched on its own since it tells how many pages there are.
+        In incremental mode the following pages are fetched incremental_window at a time, newest first,
+        until a window holds a stale page
 
-def test():
-    RMdata_storage = DataStorage()
-    scraper = RightMoveScraper(0, 9000, 1)
-    RMdata_storage.add_properties(scraper.scrape())
+        Args:
+            fetcher (AsyncFetcher): The fetcher used for all page requests
 
-    UHdata_storage = DataStorage()
-    scraper = UniHomesScraper(0, 9000, 1)
-    UHdata_storage.add_properties(scraper.scrape())
-    
-    return
+        Yields:
+            Tuple[int, str]: The page number and html of each page, in order of arrival
+        """
 
-# test()
\ No newline at end of file
+        self.today = datetime.now()
+        self.page_parses.clear()
+        first = self.SPEC.pagination.first_page
+
+        first_page = await fetcher.fetch(self.page_url(first))
+        # Only the element counting the pages is needed from the soup, so only that element is built
+        self.soup = self.SPEC.pagination.soup(first_page)
+        yield first, first_page
+
+        last = first + self.num_of_pages()
+        if self.full_sweep_due():
+            self.scrapes_since_full_sweep = 0
+            page_urls = {self.page_url(page): page for page in range(first + 1, last)}
+            async for page_url, html in fetcher.fetch_many(page_urls):
+                yield page_urls[page_url], html
+            return
+
+        self.scrapes_since_full_sweep += 1
+        if self.is_page_stale(first_page):
+            return
+
+        for window_start in range(first + 1, last, self.incremental_window):
+            window_end = min(window_start + self.incremental_window, last)
+            page_urls = {self.page_url(page): page for page in range(window_start, window_end)}
+            window_pages = {}
+            async for page_url, html in fetcher.fetch_many(page_urls):
+                window_pages[page_urls[page_url]] = html
+                yield page_urls[page_url], html
+            if any(self.is_page_stale(html) for html in window_pages.values()):
+                return
+
+    def after_scrape(self, properties_found: List[Property]):
+        self.page_parses.clear()
+        # The newest listing date seen becomes the high-water mark for the next incremental scrape
+        date_ordinals = [prop.getDateOrdinal() for prop in properties_found if prop.getDateOrdinal() is not None]
+        if date_ordinals:
+            self.high_water_mark = max(date_ordinals + [self.high_water_mark or 0])
+
+    def build_properties(self, rows: List[Dict[str, str]]) -> Tuple[List[Property], Dict[str, int]]:
+        # The whole page is normalized in one pass into records, each turned into a Property without going through its setters
+        records, failures = self.SPEC.normalize_page(rows, self.today, Property.weeks_per_month * self.num_people)
+        return [Property.from_fields(*record, num_people=self.num_people) for record in records], failures
+
+
+class RightMoveScraper(SiteScraper):
+    SPEC = RIGHTMOVE
+    SITE = RIGHTMOVE.site
+    LISTING_SPEC = RIGHTMOVE.listing
+    INCREMENTAL = True
+
+
+class UniHomesScraper(SiteScraper):
+    SPEC = UNIHOMES
+    SITE = UNIHOMES.site
+    LISTING_SPEC = UNIHOMES.listing
+
+
+class ZooplaScraper(SiteScraper):
+    SPEC = ZOOPLA
+    SITE = ZOOPLA.site
+    LISTING_SPEC = ZOOPLA.listing
+    INCREMENTAL = True
+
+
+SITE_SCRAPERS = {scraper.SITE: scraper for scraper in (RightMoveScraper, UniHomesScraper, ZooplaScraper)}
@@ -1,12 +1,13 @@
-from scrapers import DataStorage, Scraper, Property, RightMoveScraper, UniHomesScraper
+from scrapers import DataStorage, Scraper, Property
 from bot import PropertyBot
+from columns import PRICE_COLUMNS
+from export import EXPORT_FORMATS
 
 import os
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
-from datetime import datetime, timedelta, timezone
 import math
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -22,70 +23,158 @@ PASTEBIN_API_KEY = os.getenv('PASTEBIN_API_KEY')
 PASTEBIN_USERNAME = os.getenv('PASTEBIN_USERNAME')
 PASTEBIN_PASSWORD = os.getenv('PASTEBIN_PASSWORD')
 
+DATABASE_PATH = os.getenv('DATABASE_PATH')
+CACHE_DIR = os.getenv('CACHE_DIR')
+PARSER = os.getenv('PARSER')
+METRICS_PORT = os.getenv('METRICS_PORT')
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH')
+HTTP2 = os.getenv('HTTP2')
+HTTP_TIMEOUT = os.getenv('HTTP_TIMEOUT')
+SITES = os.getenv('SITES')
+WORKER_QUEUE = os.getenv('WORKER_QUEUE')
 
-bot = PropertyBot(command_prefix='!', intents=discord.Intents.all(), BOT_TOKEN=BOT_TOKEN, COMMAND_CHANNEL_ID=COMMAND_CHANNEL_ID, UPDATE_CHANNEL_ID=UPDATE_CHANNEL_ID, PASTEBIN_API_KEY=PASTEBIN_API_KEY, PASTEBIN_USERNAME=PASTEBIN_USERNAME, PASTEBIN_PASSWORD=PASTEBIN_PASSWORD)
 
-@bot.command(name='initialise', help="Initialises the bot with the given parameters: [max price per week] [number of bedrooms] [number of people]")
+bot = PropertyBot(command_prefix='!', intents=discord.Intents.all(), BOT_TOKEN=BOT_TOKEN, COMMAND_CHANNEL_ID=COMMAND_CHANNEL_ID, UPDATE_CHANNEL_ID=UPDATE_CHANNEL_ID, PASTEBIN_API_KEY=PASTEBIN_API_KEY, PASTEBIN_USERNAME=PASTEBIN_USERNAME, PASTEBIN_PASSWORD=PASTEBIN_PASSWORD, DATABASE_PATH=DATABASE_PATH, CACHE_DIR=CACHE_DIR, PARSER=PARSER, METRICS_PORT=METRICS_PORT, SNAPSHOT_PATH=SNAPSHOT_PATH, HTTP2=HTTP2, HTTP_TIMEOUT=HTTP_TIMEOUT, SITES=SITES, WORKER_QUEUE=WORKER_QUEUE)
+
+@bot.command(name='initialise', help="Registers this channel's search with the given parameters: [max price per week] [number of bedrooms] [number of people]")
 async def initialise(ctx, *args):
     # try:
         max_price_per_week = int(args[0])
         num_bedrooms = int(args[1])
         num_ppl = int(args[2])
-        bot.add_parameters(max_ppw=max_price_per_week, num_bedrooms=num_bedrooms, num_ppl=num_ppl)
+        bot.add_parameters(max_ppw=max_price_per_week, num_bedrooms=num_bedrooms, num_ppl=num_ppl, channel_id=ctx.channel.id)
 
         await ctx.send(f'Initialised with parameters: £{max_price_per_week} per person per week, {num_bedrooms} bedrooms, £{str(int(max_price_per_week * 4 * 4.34524))} per person per month.')
 
-        bot.initialise_scrapers()
-        bot.generate_pastebin_user_key()
+        await bot.initialise_scrapers()
+        await bot.generate_pastebin_user_key()
 
     # except Exception as e:
     #     print(e)
     #     await ctx.send("Incorrect arguments. Please try again.")
     #     return
 
-@bot.command(name='countdown', help="Displays countdown to next scrape")
+@bot.command(name='countdown', help="Displays countdown to the next scrape of each site")
 async def countdownTo(ctx) -> str:
-    # Get the next run time for all jobs in the scheduler
-    next_run_time = bot.scheduler.get_job('auto_rescrape').next_run_time
-    if next_run_time:
-        # Calculate the time remaining until the next scheduled run
-        now = datetime.now(timezone.utc)
-        time_remaining = next_run_time - now
-
-        # Convert the time remaining to hours, minutes, and seconds
-        hours, remainder = divmod(time_remaining.seconds, 3600)
-        minutes, seconds = divmod(remainder, 60)
-
-        # Format the time remaining as a string
-        time_remaining_str = f'Time remaining until next auto_rescrape: {hours} hours, {minutes} minutes, {seconds} seconds'
-
-        await ctx.send(time_remaining_str)
+    # Each site has its own auto_rescrape job, moved after every scrape of the site
+    table = bot.countdown_to_table()
+    if table:
+        await bot.notifier.send_table(ctx.channel, "Time remaining until the next scrape of each site:", table)
     else:
-        await ctx.send("The auto_rescrape job has not been added to the scheduler yet.")
+        await ctx.send("No auto_rescrape jobs have been added to the scheduler yet.")
 
 @bot.command(name='nuke',  help='Deletes all messages in the channel (use with caution!)')
 async def nuke(ctx):
     await ctx.channel.purge()
 
-@bot.command(name='latest', help='Displays the latest properties found')
+# The most properties listed in one Discord message
+MAX_LISTED = 20
+# The reply to a query in a channel the bot has no search for
+NO_SEARCH = "No search is registered for this channel yet, use !initialise first."
+
+@bot.command(name='latest', help='Displays the latest properties found: [number of properties, up to 20]')
 async def latest(ctx, arg1 = None):
-    acceptable_values = list(range(1, 21))
-    if arg1 in acceptable_values:
-        num_properties = int(arg1)
-        retrieved_properties = bot.get_properties(num_properties)
-        await ctx.send(f'Latest {num_properties} properties found:\n{bot.properties_to_string(retrieved_properties)}')
-    else: 
-        latest(ctx, 21)
-
-@bot.command(name="allProperties", help="Generates a pastebin for all properties found")
-async def allProperties(ctx):
-    pastebin_url = bot.generate_pastebin_paste(bot.properties_to_string(bot.get_all_properties(), for_Discord=False)) 
-    await ctx.send(f'All properties found:\n{pastebin_url}')
+    num_properties = int(arg1) if arg1 is not None and arg1.isdigit() else MAX_LISTED
+    num_properties = min(max(num_properties, 1), MAX_LISTED)
+    try:
+        table = bot.latest_table(num_properties, channel_id=ctx.channel.id)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await bot.notifier.send_table(ctx.channel, f'Latest {num_properties} properties found:', table)
+
+async def send_properties(ctx, title: str, properties):
+    if len(properties) > MAX_LISTED:
+        title += f' (showing {MAX_LISTED} of {len(properties)})'
+    await bot.notifier.send_properties(ctx.channel, f'{title}:', properties[:MAX_LISTED])
+
+@bot.command(name='cheapest', help='Displays the cheapest properties found: [number of properties, up to 20] [pppw or ppm]')
+async def cheapest(ctx, arg1 = '10', column = 'pppw'):
+    if not arg1.isdigit() or column not in PRICE_COLUMNS:
+        await ctx.send("Incorrect arguments. Please try again.")
+        return
+    num_properties = min(max(int(arg1), 1), MAX_LISTED)
+    try:
+        properties = bot.get_cheapest_properties(num_properties, channel_id=ctx.channel.id, column=column)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await send_properties(ctx, f'Cheapest {num_properties} properties by {column}', properties)
+
+@bot.command(name='priceBand', help='Displays the properties found within a price range: [min price] [max price] [pppw or ppm]')
+async def priceBand(ctx, min_price, max_price, column = 'pppw'):
+    if not min_price.isdigit() or not max_price.isdigit() or column not in PRICE_COLUMNS:
+        await ctx.send("Incorrect arguments. Please try again.")
+        return
+    try:
+        properties = bot.get_properties_in_price_band(int(min_price), int(max_price), channel_id=ctx.channel.id, column=column)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await send_properties(ctx, f'Properties between £{min_price} and £{max_price} {column}', properties)
+
+@bot.command(name='addedBetween', help='Displays the properties added between two dates: [first date dd/mm/yyyy] [last date dd/mm/yyyy]')
+async def addedBetween(ctx, first_date, last_date):
+    try:
+        properties = bot.get_properties_added_between(first_date, last_date, channel_id=ctx.channel.id)
+    except ValueError:
+        await ctx.send("Dates must be formatted as dd/mm/yyyy. Please try again.")
+        return
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await send_properties(ctx, f'Properties added between {first_date} and {last_date}', properties)
+
+@bot.command(name='area', help='Displays the properties found in an area: [start of the location or postcode, e.g. SE1]')
+async def area(ctx, prefix):
+    try:
+        properties = bot.get_properties_in_area(prefix, channel_id=ctx.channel.id)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await send_properties(ctx, f'Properties in {prefix}', properties)
+
+@bot.command(name='areaStats', help='Displays the median and quartile prices of each area: [pppw or ppm]')
+async def areaStats(ctx, column = 'pppw'):
+    if column not in PRICE_COLUMNS:
+        await ctx.send("Incorrect arguments. Please try again.")
+        return
+    try:
+        table = bot.area_stats_to_table(channel_id=ctx.channel.id, column=column)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    await bot.notifier.send_table(ctx.channel, f'Prices ({column}) per area:', table)
+
+@bot.command(name='stats', help='Displays scrape statistics per site and the number of properties stored for this channel')
+async def stats(ctx):
+    try:
+        stored = len(bot.searches.get(ctx.channel.id).data_storage)
+    except KeyError:
+        stored = 0
+    await bot.notifier.send_table(ctx.channel, f'Scrape statistics ({stored} properties stored for this channel):', bot.stats_to_table())
+
+@bot.command(name="allProperties", help="Exports all properties found to pastebin or a file: [psql, csv or jsonl] [paste or file]")
+async def allProperties(ctx, format_name = 'psql', destination = 'paste'):
+    if format_name not in EXPORT_FORMATS or destination not in ('paste', 'file'):
+        await ctx.send("Incorrect arguments. Please try again.")
+        return
+    try:
+        export = await bot.export_properties(ctx.channel.id, format_name, destination)
+    except KeyError:
+        await ctx.send(NO_SEARCH)
+        return
+    if destination == 'file':
+        await ctx.send('All properties found:', file=discord.File(export))
+    elif export:
+        await ctx.send('All properties found:\n' + '\n'.join(export))
+    else:
+        await ctx.send('No properties found yet.')
 
 @bot.command(name="removeProperty", help="Removes a property from the list of properties found using ID")
 async def removeProperty(ctx, arg1):
     try:
-        bot.remove_property(property_id=arg1)
+        bot.remove_property(property_id=arg1, channel_id=ctx.channel.id)
         await ctx.send(f'Removed property with ID {arg1}')
     except:
         await ctx.send(f'Could not remove property with ID {arg1}')
@@ -0,0 +1,193 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Tuple
+
+from scrapers import DataStorage, Property, RightMoveScraper, SiteScraper, UniHomesScraper
+
+
+class Search:
+    """One registered search: its parameters, the channel it was registered from and its own DataStorage
+    """
+
+    def __init__(self, channel_id: int, max_price_per_week: int, max_price_per_month: int, num_bedrooms: int, num_people: int, data_storage: DataStorage):
+        """Initialises the Search object
+
+        Args:
+            channel_id (int): The id of the Discord channel (or DM channel) the search was registered from
+            max_price_per_week (int): The maximum price per person per week
+            max_price_per_month (int): The maximum total price per month
+            num_bedrooms (int): The number of bedrooms
+            num_people (int): The number of people
+            data_storage (DataStorage): The store of the properties found for this search
+        """
+
+        self.channel_id = channel_id
+        self.min_price_per_week, self.max_price_per_week = 0, max_price_per_week
+        self.min_price_per_month, self.max_price_per_month = 0, max_price_per_month
+        self.num_bedrooms = num_bedrooms
+        self.num_people = num_people
+        self.data_storage = data_storage
+
+    def __str__(self):
+        return f'£{self.max_price_per_week} per person per week, {self.num_bedrooms} bedrooms, {self.num_people} people'
+
+    @property
+    def group_key(self) -> Tuple[int, int]:
+        # Searches differing only in price can share one fetch at the highest price of the group
+        return (self.num_bedrooms, self.num_people)
+
+    def max_price(self, price_filter: str) -> int:
+        return self.max_price_per_week if price_filter == 'pppw' else self.max_price_per_month
+
+    def accepts(self, scraper: SiteScraper, prop: Property) -> bool:
+        """Returns whether a property found by a group's scraper is within this search's price limit
+
+        Prices are compared in the unit the scraper's site filters on: per person per week for UniHomes, per month for the others
+        """
+
+        if scraper.SPEC.price_filter == 'pppw':
+            return prop.getPricePW() is not None and self.min_price_per_week <= prop.getPricePW() <= self.max_price_per_week
+        return prop.getPricePM() is not None and self.min_price_per_month <= prop.getPricePM() <= self.max_price_per_month
+
+
+class SearchGroup:
+    """Searches sharing one scraper per site, fetched at the widest price range of the group
+    """
+
+    def __init__(self, key: Tuple[int, int]):
+        self.key = key
+        self.searches: List[Search] = []
+        self.scrapers_by_site: Dict[str, SiteScraper] = {}
+
+    @property
+    def num_bedrooms(self) -> int:
+        return self.key[0]
+
+    @property
+    def num_people(self) -> int:
+        return self.key[1]
+
+    @property
+    def max_price_per_week(self) -> int:
+        return max(search.max_price_per_week for search in self.searches)
+
+    @property
+    def max_price_per_month(self) -> int:
+        return max(search.max_price_per_month for search in self.searches)
+
+    def max_price(self, price_filter: str) -> int:
+        return self.max_price_per_week if price_filter == 'pppw' else self.max_price_per_month
+
+    @property
+    def scrapers(self) -> List[SiteScraper]:
+        return list(self.scrapers_by_site.values())
+
+    @property
+    def RMscraper(self) -> RightMoveScraper:
+        return self.scrapers_by_site.get(RightMoveScraper.SITE)
+
+    @RMscraper.setter
+    def RMscraper(self, scraper: RightMoveScraper):
+        self.set_scraper(RightMoveScraper.SITE, scraper)
+
+    @property
+    def UHscraper(self) -> UniHomesScraper:
+        return self.scrapers_by_site.get(UniHomesScraper.SITE)
+
+    @UHscraper.setter
+    def UHscraper(self, scraper: UniHomesScraper):
+        self.set_scraper(UniHomesScraper.SITE, scraper)
+
+    def set_scraper(self, site: str, scraper: SiteScraper):
+        if scraper is None:
+            self.scrapers_by_site.pop(site, None)
+        else:
+            self.scrapers_by_site[site] = scraper
+
+    def is_known(self, propertyId: str) -> bool:
+        """Returns whether every search of the group already knows the given propertyId, for incremental scraping
+        """
+        return all(search.data_storage.is_known(propertyId) for search in self.searches)
+
+    def update_scrapers(self):
+        """Widens or narrows the group's scrapers to the current price range of its searches
+        """
+
+        for scraper in self.scrapers_by_site.values():
+            scraper.max_price = self.max_price(scraper.SPEC.price_filter)
+            scraper.url = scraper.page_url(scraper.SPEC.pagination.first_page)
+
+    def fan_out(self, scraper: SiteScraper, properties: List[Property]) -> Dict[Search, List[Property]]:
+        """Filters the properties found by one of the group's scrapers for each search of the group
+
+        Returns:
+            Dict[Search, List[Property]]: The properties each search accepts
+        """
+        return {search: [prop for prop in properties if search.accepts(scraper, prop)] for search in self.searches}
+
+
+class SearchRegistry:
+    """Registry of the searches of every channel, grouped so that overlapping searches share their fetches
+    """
+
+    def __init__(self, storage_factory: Callable[[int], DataStorage] = None):
+        """Initialises the SearchRegistry object
+
+        Args:
+            storage_factory (Callable[[int], DataStorage]): Builds the DataStorage of a new search from its channel id,
+                an in-memory DataStorage by default
+        """
+
+        self.storage_factory = storage_factory or (lambda channel_id: DataStorage())
+        self.searches: Dict[int, Search] = {}
+        self.groups: Dict[Tuple[int, int], SearchGroup] = {}
+
+    def __len__(self) -> int:
+        return len(self.searches)
+
+    def __contains__(self, channel_id: int) -> bool:
+        return channel_id in self.searches
+
+    def get(self, channel_id: int) -> Search:
+        """Returns the search registered from the given channel
+
+        Raises:
+            KeyError: If no search is registered from the channel
+        """
+        return self.searches[channel_id]
+
+    def register(self, channel_id: int, max_price_per_week: int, max_price_per_month: int, num_bedrooms: int, num_people: int,
+                 data_storage: DataStorage = None) -> Search:
+        """Registers a search for the given channel, replacing its previous search but keeping its stored properties
+
+        Args:
+            data_storage (DataStorage): The store of the search, e.g. one restored from a snapshot. By default the
+                previous search's store is kept, or a new one is made with storage_factory
+
+        Returns:
+            Search: The registered search, whose group may still need scrapers built
+        """
+
+        previous = self.searches.get(channel_id)
+        if data_storage is None:
+            data_storage = previous.data_storage if previous is not None else self.storage_factory(channel_id)
+        if previous is not None:
+            self.unregister(channel_id)
+
+        search = Search(channel_id, max_price_per_week, max_price_per_month, num_bedrooms, num_people, data_storage)
+        self.searches[channel_id] = search
+        group = self.groups.setdefault(search.group_key, SearchGroup(search.group_key))
+        group.searches.append(search)
+        group.update_scrapers()
+        return search
+
+    def unregister(self, channel_id: int):
+        search = self.searches.pop(channel_id)
+        group = self.groups[search.group_key]
+        group.searches.remove(search)
+        if group.searches:
+            group.update_scrapers()
+        else:
+            del self.groups[search.group_key]
+
+    def group_of(self, search: Search) -> SearchGroup:
+        return self.groups[search.group_key]
@@ -0,0 +1,329 @@
+import math
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from identity import property_id_from_link
+from parsers import FieldSpec, ListingSpec, Step, find_json_model, has_class
+
+# Normalizers turn the raw string a parser extracted for a field into the value stored, None if an optional field is empty.
+# They raise ValueError for a field that is malformed, or missing but required, which drops the listing
+Normalizer = Callable[[Optional[str], datetime], object]
+
+PRICE_NUMBER = re.compile(r'\d[\d,]*(?:\.\d+)?')
+DATE_PREFIX = re.compile(r'^(?:added|reduced|listed|available)(?: on)?\s*', re.IGNORECASE)
+DATE_SUFFIX = re.compile(r'\s+by\s.*$', re.IGNORECASE)
+ORDINAL_SUFFIX = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)\b')
+DATE_FORMATS = ('%d/%m/%Y', '%d %b %Y', '%d %B %Y')
+
+
+def normalize_price(value: Optional[str], today: datetime) -> Optional[float]:
+    """Returns the first number in a price, without its thousands separators, e.g. "£2,400 pcm (£554 pw)" gives 2400.0
+    """
+
+    if value is None:
+        return None
+    match = PRICE_NUMBER.search(value)
+    return float(match.group(0).replace(',', '')) if match is not None else None
+
+
+def normalize_text(value: Optional[str], today: datetime) -> str:
+    # Page text is split over lines and indented, the words are joined back with single spaces
+    if value is None:
+        raise ValueError('missing text')
+    return ' '.join(value.split())
+
+
+@lru_cache(maxsize=4096)
+def parse_listing_date(value: str, today_ordinal: int) -> Optional[int]:
+    """Returns the date ordinal of a listing date such as "Added on 09/10/2026", "Reduced yesterday" or
+    "Listed on 3rd Oct 2026 by Example Estates", or None if the date cannot be read
+
+    Cached per day, since every listing added on the same day has the same date string
+    """
+
+    text = DATE_SUFFIX.sub('', DATE_PREFIX.sub('', ' '.join(value.split())))
+    lowered = text.lower()
+    if 'today' in lowered:
+        return today_ordinal
+    if 'yesterday' in lowered:
+        return today_ordinal - 1
+    text = ORDINAL_SUFFIX.sub(r'\1', text)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).toordinal()
+        except ValueError:
+            continue
+    return None
+
+
+def normalize_date(value: Optional[str], today: datetime) -> int:
+    if value is None:
+        raise ValueError('missing date')
+    date_ordinal = parse_listing_date(value, today.toordinal())
+    if date_ordinal is None:
+        raise ValueError(f'unreadable date {value!r}')
+    return date_ordinal
+
+
+def absolute_link(prefix: str) -> Normalizer:
+    """Returns a normalizer making relative listing links absolute by prepending prefix
+    """
+
+    def normalize_link(value: Optional[str], today: datetime) -> str:
+        if not value:
+            raise ValueError('missing link')
+        return value if value.startswith(('http://', 'https://')) else prefix + value
+    return normalize_link
+
+
+class Pagination:
+    """How a site numbers its results pages and how many pages a search has
+
+    Page numbers start at first_page, and every page after the first is requested with param set to the page number times step
+    """
+
+    def __init__(self, param: str, first_page: int, step: int, element: Step, required: bool):
+        """Initialises the Pagination object
+
+        Args:
+            param (str): The query parameter selecting a page
+            first_page (int): The number of the first page, requested without param
+            step (int): The factor from a page number to its param value, e.g. the results per page for an offset
+            element (Step): The (tag, class) of the element of the first page the number of pages is read from
+            required (bool): Whether a first page without that element means the layout changed, rather than a single page of results
+        """
+
+        self.param = param
+        self.first_page = first_page
+        self.step = step
+        self.element = element
+        self.required = required
+        tag, class_ = element
+        # Built once, only the element counting the pages is parsed out of a first page
+        self.strainer = SoupStrainer(tag, class_=has_class(class_))
+
+    def page_query(self, page: int) -> str:
+        return '' if page == self.first_page else f'&{self.param}={page * self.step}'
+
+    def soup(self, html: str) -> BeautifulSoup:
+        return BeautifulSoup(html, 'html.parser', parse_only=self.strainer)
+
+    def num_of_pages(self, soup: BeautifulSoup) -> Optional[int]:
+        """Returns the number of pages read from the first page's soup, or None if the element is not there
+        """
+        raise NotImplementedError("Subclasses should implement this!")
+
+
+class ResultCountPagination(Pagination):
+    """The number of pages follows from a total result count shown on the first page, e.g. RightMove's
+    """
+
+    def __init__(self, param: str, first_page: int, per_page: int, element: Step):
+        super().__init__(param, first_page, per_page, element, required=True)
+        self.per_page = per_page
+
+    def num_of_pages(self, soup: BeautifulSoup) -> Optional[int]:
+        tag, class_ = self.element
+        result_count = soup.find(tag, class_=class_) if soup is not None else None
+        if result_count is None:
+            return None
+        return int(result_count.text.replace(',', '').strip()) // self.per_page + 1
+
+
+class LinkPagination(Pagination):
+    """The number of pages is the highest page linked from the first page's pagination, e.g. UniHomes'
+    """
+
+    def __init__(self, param: str, first_page: int, element: Step):
+        super().__init__(param, first_page, 1, element, required=False)
+        self.pattern = re.compile(rf'[?&]{re.escape(param)}=(\d+)')
+
+    def num_of_pages(self, soup: BeautifulSoup) -> Optional[int]:
+        tag, class_ = self.element
+        pagination = soup.find(tag, class_=class_) if soup is not None else None
+        if pagination is None:
+            return None
+        page_numbers = [int(number) for link in pagination.find_all('a', href=True) for number in self.pattern.findall(link['href'])]
+        return max(page_numbers + [self.first_page]) - self.first_page + 1
+
+
+class SiteSpec:
+    """Declarative description of a property site: where its searches are, how they are paged, where the listings
+    are on a results page and how each field is normalized
+
+    A scraper built on a spec needs no site-specific code, see SiteScraper
+    """
+
+    def __init__(self, site: str, base_url: str, search_path: str, pagination: Pagination, listing: ListingSpec,
+                 normalizers: Dict[str, Normalizer], price_filter: str):
+        """Initialises the SiteSpec object
+
+        Args:
+            site (str): The site name, used as the SITE of its scrapers
+            base_url (str): The site's base url
+            search_path (str): The path and query of the first results page, formatted with the scraper's
+                min_price, max_price and num_bedrooms
+            pagination (Pagination): How the results pages are numbered and counted
+            listing (ListingSpec): Where the listings and their raw fields are on a results page
+            normalizers (Dict[str, Normalizer]): The normalizer of each field: pricepm, pricepw, link, location and optionally date.
+                Listings of a site without a date field are dated the day they are scraped
+            price_filter (str): Which price the site's searches filter on, ppm (total per month) or pppw (per person per week)
+        """
+
+        self.site = site
+        self.base_url = base_url
+        self.search_path = search_path
+        self.pagination = pagination
+        self.listing = listing
+        self.normalizers = normalizers
+        self.price_filter = price_filter
+        # The fields the parser extracts, each paired with its normalizer once rather than looked up per listing
+        self.fields: List[Tuple[str, Normalizer]] = [(field.name, normalizers.get(field.name, normalize_text)) for field in listing.fields]
+
+    def page_url(self, base_url: str, page: int, **search) -> str:
+        return base_url + self.search_path.format(**search) + self.pagination.page_query(page)
+
+    def normalize_page(self, rows: List[Dict[str, Optional[str]]], today: datetime, monthly_factor: float) -> Tuple[List[tuple], Dict[str, int]]:
+        """Normalizes the raw fields of every listing on a results page, in one pass, into storage-ready records
+
+        Records are (propertyId, date_ordinal, pricepm, pricepw, location, link) tuples, see Property.from_fields.
+        Monthly prices are derived from weekly ones where a listing has none, and listings of a site without a date
+        field are dated today. A listing with a missing or malformed field is left out and counted against that field,
+        the rest of the page is still normalized
+
+        Args:
+            rows (List[Dict[str, Optional[str]]]): The raw fields of each listing, as extracted by a Parser
+            today (datetime): The day relative dates such as "Added today" are read against
+            monthly_factor (float): The factor from a weekly price per person to a monthly price for the whole property,
+                the weeks per month times the number of people
+
+        Returns:
+            Tuple[List[tuple], Dict[str, int]]: The records, in page order, and the number of listings dropped for each field
+        """
+
+        records, failures = [], {}
+        fields = self.fields
+        has_date = 'date' in self.normalizers
+        today_ordinal = today.toordinal()
+        for raw_fields in rows:
+            values = {}
+            try:
+                for name, normalize in fields:
+                    failed = name
+                    values[name] = normalize(raw_fields.get(name), today)
+                failed = 'pricepm'
+                pricepw = values.get('pricepw')
+                pricepw = math.ceil(pricepw) if pricepw is not None else None
+                pricepm = values.get('pricepm')
+                if pricepm is not None:
+                    pricepm = int(pricepm)
+                elif pricepw is not None:
+                    pricepm = int(pricepw * monthly_factor)
+                else:
+                    raise ValueError('missing price')
+            except (TypeError, ValueError):
+                failures[failed] = failures.get(failed, 0) + 1
+                continue
+            link = values['link']
+            records.append((property_id_from_link(link), values['date'] if has_date else today_ordinal, pricepm, pricepw, values['location'], link))
+        return records, failures
+
+
+def rightmove_json_model(html: str) -> List[Dict[str, str]]:
+    """Extracts the RightMove listing fields from the window.jsonModel object embedded in results pages
+    """
+
+    model = find_json_model(html, 'window.jsonModel')
+    if model is None or 'properties' not in model:
+        return None
+
+    rows = []
+    for listing in model['properties']:
+        display_prices = [price['displayPrice'] for price in listing.get('price', {}).get('displayPrices', [])]
+        rows.append({
+            'pricepm': display_prices[0] if len(display_prices) > 0 else None,
+            'pricepw': display_prices[1] if len(display_prices) > 1 else None,
+            'link': listing.get('propertyUrl'),
+            'location': listing.get('displayAddress'),
+            'date': listing.get('addedOrReduced'),
+        })
+    return rows
+
+
+RIGHTMOVE = SiteSpec(
+    site='rightmove',
+    base_url='https://www.rightmove.co.uk',
+    search_path='/property-to-rent/find.html?locationIdentifier=STATION%5E9662&sortType=6&savedSearchId=46395805&maxBedrooms={num_bedrooms}&minBedrooms={num_bedrooms}&maxPrice={max_price}&minPrice={min_price}&radius=5&includeLetAgreed=false&letType=student&furnishTypes=furnished',
+    pagination=ResultCountPagination('index', first_page=0, per_page=24, element=('span', 'searchHeader-resultCount')),
+    listing=ListingSpec(
+        container=('div', 'l-searchResult'),
+        fields=[
+            FieldSpec('pricepm', [('span', 'propertyCard-priceValue')]),
+            FieldSpec('pricepw', [('span', 'propertyCard-secondaryPriceValue')]),
+            FieldSpec('link', [('a', 'propertyCard-link')], attribute='href'),
+            FieldSpec('location', [('address', 'propertyCard-address')]),
+            FieldSpec('date', [('span', 'propertyCard-branchSummary-addedOrReduced')]),
+        ],
+        json_model=rightmove_json_model
+    ),
+    normalizers={
+        'pricepm': normalize_price,
+        'pricepw': normalize_price,
+        'link': absolute_link('https://rightmove.co.uk'),
+        'location': normalize_text,
+        'date': normalize_date,
+    },
+    price_filter='ppm'
+)
+
+UNIHOMES = SiteSpec(
+    site='unihomes',
+    base_url='https://www.unihomes.co.uk',
+    search_path='/student-accommodation/london/near-kings-college-london?bedrooms={num_bedrooms}&max-price={max_price}',
+    pagination=LinkPagination('page', first_page=1, element=('ul', 'pagination')),
+    listing=ListingSpec(
+        container=('div', 'property-listing-column'),
+        fields=[
+            FieldSpec('pricepw', [('div', 'property_details'), ('span', 'font-weight-700')]),
+            FieldSpec('link', [('a', None)], attribute='href'),
+            FieldSpec('location', [('div', 'property_rooms_address'), ('p', 'font-size-14px')]),
+        ]
+    ),
+    normalizers={
+        'pricepw': normalize_price,
+        'link': absolute_link('https://www.unihomes.co.uk'),
+        'location': normalize_text,
+    },
+    price_filter='pppw'
+)
+
+ZOOPLA = SiteSpec(
+    site='zoopla',
+    base_url='https://www.zoopla.co.uk',
+    search_path='/to-rent/property/london/?beds_min={num_bedrooms}&beds_max={num_bedrooms}&price_frequency=per_month&price_min={min_price}&price_max={max_price}&results_sort=newest_listings&search_source=to-rent',
+    pagination=LinkPagination('pn', first_page=1, element=('div', 'paginate')),
+    listing=ListingSpec(
+        container=('li', 'srp'),
+        fields=[
+            FieldSpec('pricepm', [('a', 'listing-results-price')]),
+            FieldSpec('pricepw', [('a', 'listing-results-price'), ('span', 'price-modifier')]),
+            FieldSpec('link', [('a', 'listing-results-price')], attribute='href'),
+            FieldSpec('location', [('a', 'listing-results-address')]),
+            FieldSpec('date', [('p', 'listing-results-marketed'), ('small', None)]),
+        ]
+    ),
+    normalizers={
+        'pricepm': normalize_price,
+        'pricepw': normalize_price,
+        'link': absolute_link('https://www.zoopla.co.uk'),
+        'location': normalize_text,
+        'date': normalize_date,
+    },
+    price_filter='ppm'
+)
+
+SITE_SPECS = {spec.site: spec for spec in (RIGHTMOVE, UNIHOMES, ZOOPLA)}
@@ -0,0 +1,218 @@
+import json
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+from scrapers import DataStorage, Property
+
+# A snapshot file: the magic and version, the header length and a CRC32 of everything after this prefix,
+# then the JSON header describing the searches, schedule and stores, then the stores' columns as raw little-endian blobs
+SNAPSHOT_MAGIC = b'PBSNAP'
+SNAPSHOT_VERSION = 1
+PREFIX = struct.Struct('<6sHII')
+# Seconds between two periodic snapshots
+SNAPSHOT_INTERVAL = 5 * 60
+
+# Integer columns hold -1 where a property has no value
+MISSING = -1
+STRING_COLUMNS = ('propertyId', 'location', 'link', 'removed', 'fingerprint_address', 'fingerprint_site', 'fingerprint_propertyId',
+                  'fingerprint_numbers')
+INTEGER_COLUMNS = ('date_ordinal', 'ppm', 'pppw', 'fingerprint_bucket', 'fingerprint_ppm')
+
+
+class Snapshot:
+    """Everything needed to bring the bot back up where it stopped: its searches, the contents of its
+    in-memory stores, the state of its AdaptiveSchedule, the next run of each site's scrape and where each
+    scraper's incremental scrapes stopped
+
+    Stores backed by SQLite are durable already, so only the searches using them are recorded, not their contents
+    """
+
+    def __init__(self, searches: List[dict] = None, stores: Dict[int, DataStorage] = None, schedule: Dict[str, dict] = None,
+                 next_runs: Dict[str, float] = None, created: float = None, scrapers: List[dict] = None):
+        """Initialises the Snapshot object
+
+        Args:
+            searches (List[dict]): The parameters of each registered search, keyed as the arguments of SearchRegistry.register
+            stores (Dict[int, DataStorage]): The in-memory store of each search, by channel id
+            schedule (Dict[str, dict]): The AdaptiveSchedule state of each site, see AdaptiveSchedule.state
+            next_runs (Dict[str, float]): The unix time each site's next scrape was due at
+            created (float): The unix time the snapshot was taken
+            scrapers (List[dict]): The incremental state of each search group's scraper of each site: the group's num_bedrooms and
+                num_people, the site, its high_water_mark and scrapes_since_full_sweep
+        """
+
+        self.searches = searches or []
+        self.stores = stores or {}
+        self.schedule = schedule or {}
+        self.next_runs = next_runs or {}
+        self.created = time.time() if created is None else created
+        self.scrapers = scrapers or []
+
+
+def store_columns(data_storage: DataStorage) -> Dict[str, list]:
+    """Returns the columns of an in-memory store, its properties newest first, removed propertyIds and fingerprints
+    """
+
+    properties = data_storage.get_properties()
+    fingerprints = [(address, bucket, site, pricepm, propertyId, numbers)
+                    for (address, bucket), by_site in data_storage.duplicates.by_fingerprint.items()
+                    for site, listings in by_site.items() for pricepm, propertyId, numbers in listings]
+    return {
+        'propertyId': [prop.getPropertyId() for prop in properties],
+        'date_ordinal': [prop.getDateOrdinal() for prop in properties],
+        'ppm': [prop.getPricePM() for prop in properties],
+        'pppw': [MISSING if prop.getPricePW() is None else prop.getPricePW() for prop in properties],
+        'location': [prop.getLocation() or '' for prop in properties],
+        'link': [prop.getLink() or '' for prop in properties],
+        'removed': sorted(data_storage.removed_property_ids),
+        'fingerprint_address': [row[0] for row in fingerprints],
+        'fingerprint_bucket': [row[1] for row in fingerprints],
+        'fingerprint_site': [row[2] or '' for row in fingerprints],
+        'fingerprint_ppm': [row[3] for row in fingerprints],
+        'fingerprint_propertyId': [row[4] for row in fingerprints],
+        'fingerprint_numbers': [row[5] for row in fingerprints],
+    }
+
+
+def restore_store(columns: Dict[str, list]) -> DataStorage:
+    """Rebuilds an in-memory store from its columns, without re-deriving the fingerprints or re-sorting the properties
+    """
+
+    data_storage = DataStorage()
+    pppws = [None if pppw == MISSING else pppw for pppw in columns['pppw']]
+    rows = zip(columns['propertyId'], columns['date_ordinal'], columns['ppm'], pppws, columns['location'], columns['link'])
+    for insertion, row in enumerate(rows):
+        prop = Property.from_fields(*row)
+        propertyId = row[0]
+        data_storage.properties_by_id[propertyId] = prop
+        # The properties were written newest first, so numbering them in that order keeps the date order sorted
+        sort_key = (-row[1], insertion, propertyId)
+        data_storage.sort_keys[propertyId] = sort_key
+        data_storage.date_order.append(sort_key)
+    data_storage.insertions = len(data_storage.date_order)
+    data_storage.removed_property_ids = set(columns['removed'])
+
+    # Filled in directly with the saved sites, the empty string standing for listings of unknown sites
+    by_fingerprint = data_storage.duplicates.by_fingerprint
+    # Snapshots taken before house numbers were kept have no numbers column, their listings match at the street level
+    numbers_column = columns.get('fingerprint_numbers') or [''] * len(columns['fingerprint_propertyId'])
+    for address, bucket, site, pricepm, propertyId, numbers in zip(columns['fingerprint_address'], columns['fingerprint_bucket'],
+                                                                   columns['fingerprint_site'], columns['fingerprint_ppm'],
+                                                                   columns['fingerprint_propertyId'], numbers_column):
+        by_fingerprint.setdefault((address, bucket), {}).setdefault(site or None, []).append((pricepm, propertyId, numbers))
+    return data_storage
+
+
+def encode_column(name: str, values: list) -> bytes:
+    if name in STRING_COLUMNS:
+        # No url, address or propertyId contains a NUL, so it separates the strings of a column
+        return '\0'.join(values).encode('utf-8')
+    return np.asarray(values, dtype='<i8').tobytes()
+
+
+def decode_column(buffer: mmap.mmap, name: str, offset: int, length: int, count: int) -> list:
+    if name in STRING_COLUMNS:
+        return buffer[offset:offset + length].decode('utf-8').split('\0') if count else []
+    # Read straight out of the mapped file, without copying the blob first
+    return np.frombuffer(buffer, dtype='<i8', count=count, offset=offset).tolist()
+
+
+def write_snapshot(path: str, snapshot: Snapshot, store_columns_by_channel: Dict[int, Dict[str, list]] = None) -> int:
+    """Writes a snapshot to path atomically: to a temporary file next to it, flushed to disk, then renamed over it,
+    so a crash mid-write leaves the previous snapshot in place
+
+    Args:
+        path (str): The path of the snapshot file
+        snapshot (Snapshot): The snapshot, whose stores are read with store_columns unless their columns are given
+        store_columns_by_channel (Dict[int, Dict[str, list]]): The columns of each store, if already taken on the event loop
+
+    Returns:
+        int: The size of the file written, in bytes
+    """
+
+    if store_columns_by_channel is None:
+        store_columns_by_channel = {channel_id: store_columns(data_storage) for channel_id, data_storage in snapshot.stores.items()}
+
+    blobs, offset, stores = [], 0, {}
+    for channel_id, columns in store_columns_by_channel.items():
+        layout = {}
+        for name in STRING_COLUMNS + INTEGER_COLUMNS:
+            blob = encode_column(name, columns[name])
+            layout[name] = (offset, len(blob), len(columns[name]))
+            blobs.append(blob)
+            offset += len(blob)
+            # Integer blobs start 8-byte aligned relative to the data section
+            padding = -offset % 8
+            blobs.append(b'\0' * padding)
+            offset += padding
+        stores[str(channel_id)] = layout
+
+    header = json.dumps({
+        'created': snapshot.created,
+        'searches': snapshot.searches,
+        'schedule': snapshot.schedule,
+        'next_runs': snapshot.next_runs,
+        'scrapers': snapshot.scrapers,
+        'stores': stores,
+    }).encode('utf-8')
+    header += b' ' * (-(PREFIX.size + len(header)) % 8)
+
+    crc = zlib.crc32(header)
+    for blob in blobs:
+        crc = zlib.crc32(blob, crc)
+
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header), crc))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+    return PREFIX.size + len(header) + offset
+
+
+def read_snapshot(path: str) -> Snapshot:
+    """Memory-maps and reads the snapshot at path
+
+    Returns:
+        Snapshot: The snapshot, or None if there is none or it is truncated, corrupt or from another version
+    """
+
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode_snapshot(buffer)
+    except (OSError, ValueError) as e:
+        # An empty file cannot be mapped and raises ValueError too
+        if not isinstance(e, FileNotFoundError):
+            print(f"Could not read the snapshot at {path}: {e!r}")
+        return None
+
+
+def decode_snapshot(buffer: mmap.mmap) -> Snapshot:
+    if len(buffer) < PREFIX.size:
+        raise ValueError('snapshot is truncated')
+    magic, version, header_length, crc = PREFIX.unpack_from(buffer)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError(f'not a version {SNAPSHOT_VERSION} snapshot')
+    # The views are released before the map is closed, which fails while any are left
+    with memoryview(buffer) as view, view[PREFIX.size:] as payload:
+        matches = zlib.crc32(payload) == crc
+    if not matches:
+        raise ValueError('snapshot checksum does not match')
+
+    header = json.loads(buffer[PREFIX.size:PREFIX.size + header_length])
+    data_start = PREFIX.size + header_length
+    stores = {}
+    for channel_id, layout in header['stores'].items():
+        columns = {name: decode_column(buffer, name, data_start + offset, length, count) for name, (offset, length, count) in layout.items()}
+        stores[int(channel_id)] = restore_store(columns)
+    # Snapshots taken before the scrapers' state was kept have none, their scrapers start with a full sweep
+    return Snapshot(header['searches'], stores, header['schedule'], header['next_runs'], header['created'], header.get('scrapers'))
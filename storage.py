@@ -0,0 +1,254 @@
+from __future__ import annotations
+import sqlite3
+import threading
+from typing import Iterable, Iterator, List
+
+from identity import DuplicateIndex, fingerprint, house_numbers, normalize_address
+from scrapers import DataStorage, Property, is_storable
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS properties (
+    propertyId TEXT PRIMARY KEY,
+    dateAdded INTEGER NOT NULL,
+    ppm INTEGER NOT NULL,
+    pppw INTEGER,
+    location TEXT,
+    link TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_properties_dateAdded ON properties (dateAdded DESC);
+CREATE INDEX IF NOT EXISTS idx_properties_ppm ON properties (ppm);
+CREATE INDEX IF NOT EXISTS idx_properties_pppw ON properties (pppw);
+CREATE TABLE IF NOT EXISTS removed_properties (
+    propertyId TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS fingerprints (
+    address TEXT NOT NULL,
+    priceBucket INTEGER NOT NULL,
+    ppm INTEGER NOT NULL,
+    propertyId TEXT NOT NULL,
+    houseNumbers TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_fingerprints_address ON fingerprints (address, priceBucket);
+'''
+
+COLUMNS = 'propertyId, dateAdded, ppm, pppw, location, link'
+
+# SQLite limits the number of bound parameters in one statement
+MAX_QUERY_PARAMS = 500
+
+
+class SQLiteDataStorage(DataStorage):
+    """DataStorage backed by an SQLite database, so stored and removed properties survive a restart
+
+    The database runs in WAL mode and nothing is loaded into memory at startup, every query reads the rows it needs.
+    Each call to add_properties writes its whole batch in a single transaction.
+    The connection is shared behind a lock, since scrapers check propertyIds from the executor's threads
+    """
+
+    def __init__(self, path: str):
+        """Initialises the SQLiteDataStorage object, creating the database at the given path if needed
+
+        Args:
+            path (str): The path of the SQLite database file
+        """
+
+        self.path = path
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.allow_missing_pppw()
+        self.add_house_numbers()
+        self.backfill_fingerprints()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute('SELECT COUNT(*) FROM properties').fetchone()[0]
+
+    def __contains__(self, propertyId: str) -> bool:
+        with self.lock:
+            return self.connection.execute('SELECT 1 FROM properties WHERE propertyId = ?', (propertyId,)).fetchone() is not None
+
+    @staticmethod
+    def property_to_row(prop: Property) -> tuple:
+        return (prop.getPropertyId(), prop.getDateOrdinal(), prop.getPricePM(), prop.getPricePW(), prop.getLocation(), prop.getLink())
+
+    @staticmethod
+    def row_to_property(row: tuple) -> Property:
+        return Property.from_fields(*row)
+
+    def known_property_ids(self, propertyIds: Iterable[str]) -> set:
+        """Returns the given propertyIds that are stored or have been removed, querying in chunks
+        """
+
+        propertyIds = list(set(propertyIds))
+        known = set()
+        for start in range(0, len(propertyIds), MAX_QUERY_PARAMS):
+            chunk = propertyIds[start:start + MAX_QUERY_PARAMS]
+            placeholders = ','.join('?' * len(chunk))
+            with self.lock:
+                rows = self.connection.execute(
+                    f'SELECT propertyId FROM properties WHERE propertyId IN ({placeholders}) '
+                    f'UNION SELECT propertyId FROM removed_properties WHERE propertyId IN ({placeholders})',
+                    chunk + chunk
+                ).fetchall()
+            known.update(row[0] for row in rows)
+        return known
+
+    def is_known(self, propertyId: str) -> bool:
+        return bool(self.known_property_ids([propertyId]))
+
+    @staticmethod
+    def fingerprint_rows(properties: Iterable[Property]) -> List[tuple]:
+        rows = []
+        for prop in properties:
+            key = fingerprint(prop.getLocation(), prop.getPricePM())
+            if key is not None:
+                rows.append((*key, prop.getPricePM(), prop.getPropertyId(), house_numbers(prop.getLocation())))
+        return rows
+
+    def allow_missing_pppw(self):
+        """Drops the NOT NULL constraint on pppw from a database created before listings without a weekly price were stored
+
+        SQLite cannot alter a column's constraints, so the table is copied into one created from SCHEMA
+        """
+
+        with self.lock:
+            columns = {row[1]: row[3] for row in self.connection.execute('PRAGMA table_info(properties)')}
+            if not columns.get('pppw'):
+                return
+            with self.connection:
+                # Python's sqlite3 only opens a transaction by itself before DML, the copy must not be left half done
+                self.connection.execute('BEGIN')
+                self.connection.execute('ALTER TABLE properties RENAME TO properties_old')
+                self.connection.execute('DROP INDEX IF EXISTS idx_properties_dateAdded')
+                self.connection.execute('DROP INDEX IF EXISTS idx_properties_ppm')
+                self.connection.execute('DROP INDEX IF EXISTS idx_properties_pppw')
+                for statement in SCHEMA.split(';'):
+                    if 'properties (' in statement or 'ON properties' in statement:
+                        self.connection.execute(statement)
+                self.connection.execute(f'INSERT INTO properties ({COLUMNS}) SELECT {COLUMNS} FROM properties_old ORDER BY rowid')
+                self.connection.execute('DROP TABLE properties_old')
+
+    def add_house_numbers(self):
+        """Adds the house numbers to the fingerprints of a database created before they were stored, from the addresses of
+        the properties still stored; the fingerprints of removed properties keep matching at the street level
+        """
+
+        with self.lock:
+            columns = [row[1] for row in self.connection.execute('PRAGMA table_info(fingerprints)')]
+            if 'houseNumbers' in columns:
+                return
+            with self.connection:
+                self.connection.execute("ALTER TABLE fingerprints ADD COLUMN houseNumbers TEXT NOT NULL DEFAULT ''")
+                rows = self.connection.execute('SELECT propertyId, location FROM properties WHERE location IS NOT NULL').fetchall()
+                self.connection.executemany('UPDATE fingerprints SET houseNumbers = ? WHERE propertyId = ?',
+                                            [(house_numbers(location), propertyId) for propertyId, location in rows])
+
+    def backfill_fingerprints(self):
+        """Fingerprints the properties of a database created before fingerprints were stored
+        """
+
+        with self.lock:
+            if self.connection.execute('SELECT 1 FROM fingerprints LIMIT 1').fetchone() is not None:
+                return
+            rows = SQLiteDataStorage.fingerprint_rows(self.iter_properties())
+            with self.connection:
+                self.connection.executemany('INSERT INTO fingerprints (address, priceBucket, ppm, propertyId, houseNumbers) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def duplicate_index(self, properties: Iterable[Property]) -> DuplicateIndex:
+        """Returns a DuplicateIndex of the stored fingerprints sharing an address with any of the given properties, querying in chunks
+        """
+
+        addresses = list({normalize_address(prop.getLocation()) for prop in properties if prop.getLocation()})
+        duplicates = DuplicateIndex()
+        for start in range(0, len(addresses), MAX_QUERY_PARAMS):
+            chunk = addresses[start:start + MAX_QUERY_PARAMS]
+            with self.lock:
+                rows = self.connection.execute(
+                    f'SELECT address, priceBucket, ppm, propertyId, houseNumbers FROM fingerprints WHERE address IN ({",".join("?" * len(chunk))})', chunk
+                ).fetchall()
+            for address, bucket, pricepm, propertyId, numbers in rows:
+                duplicates.add_fingerprint((address, bucket), pricepm, propertyId, numbers)
+        return duplicates
+
+    def duplicate_of(self, property: Property) -> str:
+        return self.duplicate_index([property]).find(property.getPropertyId(), property.getLocation(), property.getPricePM())
+
+    def add_property(self, property: Property):
+        self.add_properties([property])
+
+    def add_properties(self, properties: List[Property]) -> None:
+        properties = [prop for prop in properties if is_storable(prop)]
+        known = self.known_property_ids(prop.getPropertyId() for prop in properties)
+        properties = [prop for prop in properties if prop.getPropertyId() not in known]
+
+        with self.lock, self.connection:
+            inserted = []
+            for prop in properties:
+                # Only a propertyId repeated within the batch is skipped, any other constraint failure raises and rolls the batch back
+                cursor = self.connection.execute(f'INSERT INTO properties ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?) '
+                                                 'ON CONFLICT (propertyId) DO NOTHING', SQLiteDataStorage.property_to_row(prop))
+                if cursor.rowcount == 1:
+                    inserted.append(prop)
+            # Fingerprints are written in the same transaction, and only for the rows stored
+            self.connection.executemany('INSERT INTO fingerprints (address, priceBucket, ppm, propertyId, houseNumbers) VALUES (?, ?, ?, ?, ?)',
+                                        SQLiteDataStorage.fingerprint_rows(inserted))
+            if inserted:
+                self.generation += 1
+
+    def remove_property(self, propertyID: str):
+        with self.lock, self.connection:
+            deleted = self.connection.execute('DELETE FROM properties WHERE propertyId = ?', (propertyID,)).rowcount
+            if deleted == 0:
+                raise KeyError(propertyID)
+            self.connection.execute('INSERT OR IGNORE INTO removed_properties (propertyId) VALUES (?)', (propertyID,))
+            self.generation += 1
+
+    def remove_all_properties(self):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO removed_properties (propertyId) SELECT propertyId FROM properties')
+            self.connection.execute('DELETE FROM properties')
+            self.generation += 1
+
+    def check_new_properties(self, new_properties: List[Property]) -> List[Property]:
+        known = self.known_property_ids(prop.getPropertyId() for prop in new_properties)
+        # Holds the stored listings at the same addresses, then the unseen properties as they are accepted
+        duplicates = self.duplicate_index(prop for prop in new_properties if prop.getPropertyId() not in known)
+        unseen_properties = []
+        for prop in new_properties:
+            propertyId = prop.getPropertyId()
+            if propertyId in known or duplicates.find(propertyId, prop.getLocation(), prop.getPricePM()) is not None:
+                continue
+            known.add(propertyId)
+            duplicates.add(propertyId, prop.getLocation(), prop.getPricePM())
+            unseen_properties.append(prop)
+        return unseen_properties
+
+    def iter_properties(self) -> Iterator[Property]:
+        """Yields all stored properties, newest first, without loading the whole table at once
+        """
+
+        with self.lock:
+            cursor = self.connection.execute(f'SELECT {COLUMNS} FROM properties ORDER BY dateAdded DESC, rowid')
+        while True:
+            with self.lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for row in rows:
+                yield SQLiteDataStorage.row_to_property(row)
+
+    def get_latest_properties(self, num_properties: int) -> List[Property]:
+        with self.lock:
+            rows = self.connection.execute(f'SELECT {COLUMNS} FROM properties ORDER BY dateAdded DESC, rowid LIMIT ?', (num_properties,)).fetchall()
+        return [SQLiteDataStorage.row_to_property(row) for row in rows]
+
+    def get_properties(self) -> List[Property]:
+        return list(self.iter_properties())
@@ -0,0 +1,85 @@
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from typing import List
+
+from tabulate import tabulate
+
+from scrapers import DataStorage, Property
+
+# The columns of a property table, in the order of Property.to_dict
+PROPERTY_HEADERS = ('propertyId', 'dateAdded', 'ppm', 'pppw', 'location', 'link')
+
+
+def property_row(prop: Property) -> tuple:
+    """Returns the cells of a property's table row, the values of Property.to_dict without building the dict
+    """
+    return (prop.getPropertyId(), datetime.fromordinal(prop.getDateOrdinal()), prop.getPricePM(), prop.getPricePW(),
+            prop.getLocation(), prop.getLink())
+
+
+class TableCache:
+    """Rendered property tables for the query commands, so a burst of the same command costs a dictionary lookup
+
+    Each listing's row is built once and kept for any table it appears in, keyed by its propertyId, date and prices,
+    since the same listing is stored with different prices by searches for different numbers of people.
+    The latest-N tables of a store are kept whole, keyed by N and table format, along with the store generation
+    they were rendered at: any change to the store makes them stale and they are rendered again on the next request
+    """
+
+    def __init__(self, max_rows: int = 10000, max_tables: int = 32):
+        """Initialises the TableCache object
+
+        Args:
+            max_rows (int): The number of listing rows kept, the least recently used are dropped first
+            max_tables (int): The number of latest-N tables kept per store and generation
+        """
+
+        self.max_rows = max_rows
+        self.max_tables = max_tables
+        self.rows: OrderedDict = OrderedDict()
+        # Per store: the generation the tables were rendered at and the tables by (N, table format)
+        self.latest_tables = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def row_of(self, prop: Property) -> tuple:
+        key = (prop.getPropertyId(), prop.getDateOrdinal(), prop.getPricePM(), prop.getPricePW())
+        row = self.rows.get(key)
+        if row is None:
+            row = property_row(prop)
+            self.rows[key] = row
+            if len(self.rows) > self.max_rows:
+                self.rows.popitem(last=False)
+        else:
+            self.rows.move_to_end(key)
+        return row
+
+    def render(self, properties: List[Property], tablefmt: str) -> str:
+        """Formats properties as a text table with the tabulate library, in the given tabulate format, from their kept rows
+        """
+
+        rows = [self.row_of(prop) for prop in properties]
+        return tabulate(rows, headers=PROPERTY_HEADERS, tablefmt=tablefmt, numalign="left", stralign="center")
+
+    def latest_table(self, data_storage: DataStorage, num_properties: int, tablefmt: str = 'pipe') -> str:
+        """Returns the table of a store's num_properties most recently added properties, rendered again only if the store changed
+        """
+
+        generation, tables = self.latest_tables.get(data_storage, (None, None))
+        if generation != data_storage.generation:
+            generation, tables = data_storage.generation, {}
+            self.latest_tables[data_storage] = (generation, tables)
+
+        key = (num_properties, tablefmt)
+        table = tables.get(key)
+        if table is not None:
+            self.hits += 1
+            return table
+
+        self.misses += 1
+        table = self.render(data_storage.get_latest_properties(num_properties), tablefmt)
+        if len(tables) >= self.max_tables:
+            tables.pop(next(iter(tables)))
+        tables[key] = table
+        return table
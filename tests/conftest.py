@@ -0,0 +1,90 @@
+import glob
+import os
+import sys
+import time
+from typing import List
+
+import pytest
+
+# The bot's modules live at the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from notify import MESSAGE_LIMIT  # noqa: E402
+from replay import FIXTURES_DIR, FixtureServer  # noqa: E402
+from scrapers import SITE_SCRAPERS  # noqa: E402
+
+# Every site has a folder of recorded pages named after its SITE
+SITES = sorted(SITE_SCRAPERS)
+
+
+def fixture_pages(site: str) -> list:
+    """Returns the recorded result pages of a site, in page order
+    """
+
+    paths = glob.glob(os.path.join(FIXTURES_DIR, site, '*.html'))
+    paths.sort(key=lambda path: int(os.path.splitext(path)[0].rsplit('_', 1)[1]))
+    pages = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def make_scraper(site: str, num_people: int = 4, **kwargs):
+    # A search wide enough that no listing of the fixtures is priced out
+    return SITE_SCRAPERS[site](0, 100000, 4, num_people, incremental=False, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def fixture_properties() -> dict:
+    """The properties of every recorded page, by site
+    """
+
+    properties = {}
+    for site in SITES:
+        scraper = make_scraper(site)
+        properties[site] = [prop for html in fixture_pages(site) for prop in scraper.parse_page(html)[0]]
+    return properties
+
+
+@pytest.fixture(scope='session')
+def fixture_server():
+    """A FixtureServer serving the recorded pages for the whole test session
+    """
+
+    with FixtureServer(FIXTURES_DIR) as server:
+        yield server
+
+
+def make_bot(snapshot_path: str = None):
+    """Builds a PropertyBot without connecting to Discord, skipping the test if discord.py is not installed
+    """
+
+    discord = pytest.importorskip('discord')
+    from bot import PropertyBot
+
+    return PropertyBot(command_prefix='!', intents=discord.Intents.none(), BOT_TOKEN='', COMMAND_CHANNEL_ID=0, UPDATE_CHANNEL_ID=0,
+                       PASTEBIN_API_KEY='', PASTEBIN_USERNAME='', PASTEBIN_PASSWORD='', SNAPSHOT_PATH=snapshot_path)
+
+
+class RecordingChannel:
+    """Stand-in for a Discord channel that records the messages sent to it, for exercising the NotificationDispatcher without Discord
+
+    Rejects messages over Discord's length limit like Discord does, and fails the first fail_first sends
+    """
+
+    def __init__(self, id: int = 0, fail_first: int = 0):
+        self.id = id
+        self.fail_first = fail_first
+        self.messages: List[str] = []
+        self.sent_at: List[float] = []
+
+    async def send(self, content: str):
+        if self.fail_first > 0:
+            self.fail_first -= 1
+            raise ConnectionError('send failed')
+        if len(content) > MESSAGE_LIMIT:
+            raise ValueError(f'Message of {len(content)} characters is over the {MESSAGE_LIMIT} character limit')
+        self.messages.append(content)
+        self.sent_at.append(time.monotonic())
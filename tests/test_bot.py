@@ -0,0 +1,26 @@
+import asyncio
+
+from conftest import make_bot, make_scraper
+
+
+def test_a_failing_site_leaves_the_others_scraped(fixture_server):
+    async def run():
+        bot = make_bot()
+        try:
+            search = bot.add_parameters(max_ppw=250, num_bedrooms=4, num_ppl=4)
+            group = bot.searches.group_of(search)
+            for site in ('rightmove', 'unihomes'):
+                group.set_scraper(site, make_scraper(site, base_url=fixture_server.url, transport=bot.transport))
+            # No page is recorded under this path, so every fetch of the site fails with a 404
+            group.set_scraper('zoopla', make_scraper('zoopla', base_url=f'{fixture_server.url}/missing', transport=bot.transport))
+            new_properties = await bot.scrape()
+            return search, new_properties, dict(bot.scrape_schedule.state())
+        finally:
+            bot.scrape_executor.shutdown()
+            bot.transport.close()
+
+    search, new_properties, schedule = asyncio.run(run())
+    sites = {prop.getPropertyId()[:2] for prop in new_properties[search]}
+    assert sites == {'RM', 'UH'}
+    assert len(search.data_storage) == len(new_properties[search])
+    assert 'zoopla' not in schedule
@@ -0,0 +1,72 @@
+import asyncio
+import os
+
+from cache import ResponseCache
+from conftest import make_scraper
+from fetcher import AsyncFetcher
+from transport import Transport
+
+
+class EvictingCache(ResponseCache):
+    """Response cache whose entries are evicted right after their validators are read, as a concurrent eviction would
+    """
+
+    def conditional_headers(self, url):
+        headers = super().conditional_headers(url)
+        if os.path.exists(self.path_for(url)):
+            os.remove(self.path_for(url))
+            del self.file_sizes[self.path_for(url)]
+        return headers
+
+
+def test_304_without_an_entry_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+
+    assert cache.resolve('http://example.com/', 304, '', etag='"abc"') is None
+    assert cache.load('http://example.com/') is None
+    assert cache.stats['stale_validators'] == 1
+
+
+def test_304_answers_from_the_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.resolve('http://example.com/', 200, '<html>page</html>', etag='"abc"')
+
+    assert cache.conditional_headers('http://example.com/') == {'If-None-Match': '"abc"'}
+    assert cache.resolve('http://example.com/', 304, '') == '<html>page</html>'
+
+
+def test_evicted_page_is_fetched_again_in_full(tmp_path, fixture_server):
+    url = f'{fixture_server.url}/student-accommodation/search?page=1'
+    cache = EvictingCache(str(tmp_path))
+    transport = Transport()
+
+    async def fetch_twice():
+        async with AsyncFetcher(transport=transport, response_cache=cache, per_host_interval=0) as fetcher:
+            return await fetcher.fetch(url), await fetcher.fetch(url)
+
+    try:
+        first, second = asyncio.run(fetch_twice())
+    finally:
+        transport.close()
+
+    assert first == second and len(second) > 1000
+    assert cache.stats['stale_validators'] == 1
+    assert cache.load(url)['body'] == second
+
+
+def test_searches_sharing_a_cache_get_their_own_properties(tmp_path, fixture_server):
+    cache = ResponseCache(str(tmp_path))
+    transport = Transport()
+    try:
+        properties = {}
+        for num_people in (4, 2):
+            scraper = make_scraper('unihomes', num_people, base_url=fixture_server.url, transport=transport, response_cache=cache)
+            properties[num_people] = scraper.scrape()
+    finally:
+        transport.close()
+
+    four, two = properties[4], properties[2]
+    assert [prop.getPropertyId() for prop in four] == [prop.getPropertyId() for prop in two]
+    # UniHomes lists prices per person, so the monthly price of the whole property halves with half the people
+    assert all(abs(prop_four.getPricePM() - 2 * prop_two.getPricePM()) <= 1 for prop_four, prop_two in zip(four, two))
+    assert {prop.num_people for prop in two} == {2}
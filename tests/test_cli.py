@@ -0,0 +1,68 @@
+import asyncio
+import re
+import sys
+
+import pytest
+
+import cli
+from transport import Transport
+
+
+def run_cli(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['cli.py', *args])
+    cli.main()
+
+
+def test_unknown_sites_are_rejected(monkeypatch, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        run_cli(monkeypatch, 'rightmove', 'openrent')
+
+    assert exit_info.value.code == 2
+    assert 'unknown sites openrent' in capsys.readouterr().err
+
+
+def test_scrapers_are_priced_as_initialise_prices_them():
+    transport = Transport()
+    try:
+        rightmove, unihomes = cli.build_scrapers(['rightmove', 'unihomes'], 200, 3, 3, None, 'strainer', transport)
+    finally:
+        transport.close()
+
+    assert (rightmove.max_price, rightmove.num_bedrooms, rightmove.num_people) == (int(200 * cli.WEEKS_PER_MONTH * 3), 3, 3)
+    assert unihomes.max_price == 200
+    assert rightmove.parser.name == 'strainer' and not rightmove.incremental
+    assert rightmove.url.startswith('https://www.rightmove.co.uk/')
+
+
+def test_scrape_all_against_the_fixture_server(fixture_server, fixture_properties):
+    transport = Transport()
+    try:
+        scrapers = cli.build_scrapers(['unihomes', 'zoopla'], 10000, 4, 4, fixture_server.url, 'strainer', transport)
+        results = asyncio.run(cli.scrape_all(scrapers, 4, 0))
+    finally:
+        transport.close()
+
+    assert set(results) == {'unihomes', 'zoopla'}
+    for site, result in results.items():
+        assert len(result['properties']) == len(fixture_properties[site])
+        assert result['pages'] >= 1 and result['seconds'] > 0
+
+
+def test_fixtures_run_prints_each_site_report(monkeypatch, capsys, fixture_properties):
+    run_cli(monkeypatch, 'unihomes', 'rightmove', '--fixtures', '--max-ppw', '10000', '--repeat', '2', '--show', '3')
+    output = capsys.readouterr().out
+
+    for site in ('unihomes', 'rightmove'):
+        assert re.search(rf'^{site}: {len(fixture_properties[site])} listings from \d+ pages$', output, re.MULTILINE)
+    # Three listings shown per site, then one timing row per site over both runs
+    assert len(re.findall(r'^\|\s+RM\d+\s+\|', output, re.MULTILINE)) == 3
+    assert re.search(r'^\|\s+unihomes\s+\|\s+\d+\s+\|\s+\d+\s+\|\s+2\s+\|', output, re.MULTILINE)
+    assert 'zoopla' not in output
+
+
+def test_cprofile_stats_are_written_to_the_output_file(monkeypatch, capsys, tmp_path):
+    stats = tmp_path / 'scrape.prof'
+    run_cli(monkeypatch, 'unihomes', '--fixtures', '--show', '0', '--profile', 'cprofile', '--profile-output', str(stats))
+
+    assert stats.stat().st_size > 0
+    assert f'cProfile stats written to {stats}' in capsys.readouterr().out
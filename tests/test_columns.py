@@ -0,0 +1,24 @@
+import numpy as np
+
+from columns import PropertyColumns
+
+
+def test_pppw_is_per_person_on_every_site(fixture_properties):
+    unihomes, rightmove = fixture_properties['unihomes'], fixture_properties['rightmove']
+    columns = PropertyColumns(unihomes + rightmove, num_people=4)
+    pppw = columns.price('pppw')
+
+    # UniHomes lists the price per person, RightMove the whole property's weekly price
+    assert pppw[:len(unihomes)].tolist() == [prop.getPricePW() for prop in unihomes]
+    listed = np.array([prop.getPricePW() for prop in rightmove], dtype=np.float64)
+    assert np.allclose(pppw[len(unihomes):], listed / 4, rtol=0.03)
+
+
+def test_cheapest_ranks_sites_together(fixture_properties):
+    properties = fixture_properties['unihomes'] + fixture_properties['rightmove']
+    columns = PropertyColumns(properties, num_people=4)
+
+    cheapest = columns.cheapest(len(properties), 'pppw')
+    prices = [prop.getPricePM() for prop in cheapest]
+    # The weekly prices are rounded up to the pound, so the monthly prices are in order to within a pound a week
+    assert all(later >= earlier - 4 * 4.5 for earlier, later in zip(prices, prices[1:]))
@@ -0,0 +1,59 @@
+import asyncio
+
+from conftest import make_scraper
+from executor import QueueScrapeExecutor, ScrapeExecutor
+from jobqueue import JobQueue
+from transport import Transport
+
+
+def test_queue_executor_starts_no_parsing_processes(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    executor = QueueScrapeExecutor(queue)
+    try:
+        assert executor.process_pool is None
+    finally:
+        executor.shutdown()
+        queue.close()
+
+
+def test_process_pool_is_started_by_the_first_parse(fixture_server):
+    executor = ScrapeExecutor(parse_workers=1)
+    transport = Transport()
+    scraper = make_scraper('unihomes', base_url=fixture_server.url, transport=transport)
+    try:
+        assert executor.process_pool is None
+        properties = asyncio.run(executor.run([scraper]))[0]
+        assert executor.process_pool is not None
+        # The finished scrape is not kept
+        assert executor.running == {}
+    finally:
+        executor.shutdown()
+        transport.close()
+
+    assert len(properties) == 30
+
+
+def test_concurrent_runs_share_a_scrape_and_forget_it(fixture_server):
+    executor = ScrapeExecutor(parse_workers=1)
+    transport = Transport()
+    scraper = make_scraper('unihomes', base_url=fixture_server.url, transport=transport)
+    failing = make_scraper('zoopla', base_url=f'{fixture_server.url}/missing', transport=transport)
+
+    async def run():
+        first = asyncio.ensure_future(executor.run([scraper, failing]))
+        await asyncio.sleep(0)
+        assert executor.is_running(scraper) and executor.is_running(failing)
+        future = executor.running[scraper]
+        second = await executor.run([scraper])
+        assert executor.running.get(scraper) is not future
+        return await first, second
+
+    try:
+        (properties, error), (joined,) = asyncio.run(run())
+    finally:
+        executor.shutdown()
+        transport.close()
+
+    assert joined is properties
+    assert isinstance(error, Exception)
+    assert executor.running == {}
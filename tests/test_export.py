@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+from export import ExportCache, get_export_format, iter_export_parts
+from scrapers import DataStorage, Property
+
+
+def make_property(number: int) -> Property:
+    return Property.from_fields(f'RM{number}', 738000 + number, 1000 + number, 230, f'{number} Coldharbour Lane, London SE15',
+                                f'https://www.rightmove.co.uk/properties/{number}')
+
+
+def test_parts_stay_under_max_bytes():
+    properties = [make_property(number) for number in range(200)]
+    parts = list(iter_export_parts(properties, get_export_format('csv'), max_bytes=2000))
+
+    assert len(parts) > 1
+    assert all(len(part.encode('utf-8')) <= 2000 and part.startswith('propertyId,') for part in parts)
+    assert sum(part.count('\n') - 1 for part in parts) == 200
+
+
+def test_export_renders_the_store_as_listed_on_the_loop(tmp_path):
+    data_storage = DataStorage()
+    data_storage.add_properties([make_property(number) for number in range(10)])
+
+    async def run_blocking(func, *args):
+        # The store changes while the export is rendered in another thread
+        data_storage.add_properties([make_property(number) for number in range(10, 20)])
+        return func(*args)
+
+    path = asyncio.run(ExportCache(str(tmp_path)).export_file(data_storage, 'csv', 'properties', run_blocking))
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    assert len(lines) == 11
+    assert lines[1].startswith('RM9,')
+
+
+def test_close_removes_the_temporary_export_folder(tmp_path):
+    data_storage = DataStorage()
+    data_storage.add_properties([make_property(number) for number in range(10)])
+    export_cache = ExportCache()
+    path = asyncio.run(export_cache.export_file(data_storage, 'csv', 'properties'))
+    assert os.path.dirname(path) == export_cache.directory
+
+    export_cache.close()
+    assert not os.path.exists(export_cache.directory)
+    assert export_cache.get(data_storage, ('file', 'csv')) is None
+
+    # A folder given by the caller is left in place
+    export_cache = ExportCache(str(tmp_path))
+    asyncio.run(export_cache.export_file(data_storage, 'csv', 'properties'))
+    export_cache.close()
+    assert os.listdir(tmp_path) == ['properties.csv']
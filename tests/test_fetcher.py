@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+from multidict import CIMultiDict
+
+from conftest import SITES, make_scraper
+from fetcher import AsyncFetcher, FetchError
+from transport import Transport, TransportError, TransportResponse
+
+# The listings and results pages recorded for each site
+FIXTURE_SCRAPES = {'rightmove': (60, 3), 'unihomes': (30, 2), 'zoopla': (38, 2)}
+
+
+class RecordingTransport(Transport):
+    """Transport recording when each request was sent, failing the first attempts at every url if asked to
+    """
+
+    def __init__(self, failures: list = ()):
+        super().__init__()
+        # What each url's first attempts end with: an HTTP status, or 'error' for a request failing without a response
+        self.failures = list(failures)
+        self.sent = []
+
+    async def request(self, method, url, headers=None, data=None):
+        attempt = sum(1 for _, sent_url in self.sent if sent_url == url)
+        self.sent.append((time.monotonic(), url))
+        if attempt < len(self.failures):
+            if self.failures[attempt] == 'error':
+                raise TransportError(f'Connection reset requesting {url}')
+            return TransportResponse(self.failures[attempt], CIMultiDict(), b'', None)
+        return await super().request(method, url, headers, data)
+
+
+def scrape(site: str, transport: Transport, base_url: str, **fetcher_options):
+    scraper = make_scraper(site, base_url=base_url, transport=transport)
+
+    async def run():
+        async with AsyncFetcher(transport=transport, **fetcher_options) as fetcher:
+            return await scraper.scrape_async(fetcher)
+
+    return scraper, asyncio.run(run())
+
+
+@pytest.fixture
+def transport():
+    transport = RecordingTransport()
+    yield transport
+    transport.close()
+
+
+@pytest.mark.parametrize('site', SITES)
+def test_scrape_async_fetches_every_page(site, transport, fixture_server):
+    scraper, properties = scrape(site, transport, fixture_server.url, per_host_interval=0)
+
+    assert (len(properties), scraper.pages_fetched) == FIXTURE_SCRAPES[site]
+    assert len(transport.sent) == FIXTURE_SCRAPES[site][1]
+
+
+def test_failed_requests_are_retried(fixture_server):
+    transport = RecordingTransport(failures=[503, 'error'])
+    try:
+        scraper, properties = scrape('rightmove', transport, fixture_server.url, per_host_interval=0, backoff_base=0.01)
+    finally:
+        transport.close()
+
+    assert (len(properties), scraper.pages_fetched) == FIXTURE_SCRAPES['rightmove']
+    # Every page failed twice before it was fetched
+    assert len(transport.sent) == 3 * FIXTURE_SCRAPES['rightmove'][1]
+
+
+def test_fetch_gives_up_after_max_retries(fixture_server):
+    transport = RecordingTransport(failures=[503] * 3)
+    try:
+        with pytest.raises(FetchError):
+            scrape('unihomes', transport, fixture_server.url, per_host_interval=0, max_retries=2, backoff_base=0.01)
+    finally:
+        transport.close()
+
+    assert len(transport.sent) == 3
+
+
+def test_requests_to_a_host_are_spaced_out(transport, fixture_server):
+    interval = 0.05
+    scraper, properties = scrape('rightmove', transport, fixture_server.url, per_host_interval=interval, max_concurrency=8)
+
+    sent = sorted(sent_at for sent_at, _ in transport.sent)
+    assert len(sent) == FIXTURE_SCRAPES['rightmove'][1]
+    # A little slack for the clock, the pages after the first are fetched concurrently yet still one interval apart
+    assert all(later - earlier >= interval * 0.9 for earlier, later in zip(sent, sent[1:]))
@@ -0,0 +1,44 @@
+from identity import DuplicateIndex, house_numbers, normalize_address
+
+
+def index_of(properties) -> DuplicateIndex:
+    duplicates = DuplicateIndex()
+    for prop in properties:
+        duplicates.add(prop.getPropertyId(), prop.getLocation(), prop.getPricePM())
+    return duplicates
+
+
+def duplicates_found(duplicates: DuplicateIndex, properties) -> dict:
+    found = {}
+    for prop in properties:
+        duplicate = duplicates.find(prop.getPropertyId(), prop.getLocation(), prop.getPricePM())
+        if duplicate is not None:
+            found[prop.getPropertyId()] = duplicate
+    return found
+
+
+def test_split_address():
+    assert normalize_address('Flat 2, 167 Coldharbour Ln, London SE15') == 'COLDHARBOUR LANE SE15'
+    assert house_numbers('Flat 2, 167 Coldharbour Ln, London SE15') == '2 167'
+    assert house_numbers('Borough High Street, London SE1') == ''
+    assert house_numbers(None) == ''
+
+
+def test_numbered_flats_on_the_same_street_are_different(fixture_properties):
+    # Zoopla's 167 Coldharbour Lane at 3425 is within 5% of Rightmove's 108 Coldharbour Lane at 3475
+    duplicates = index_of(fixture_properties['zoopla'])
+    found = duplicates_found(duplicates, fixture_properties['rightmove'])
+
+    assert found == {'RM138400000': 'ZP60310001', 'RM138400137': 'ZP60310002'}
+
+
+def test_addresses_without_a_number_match_at_the_street_level(fixture_properties):
+    duplicates = index_of(fixture_properties['rightmove'])
+    found = duplicates_found(duplicates, fixture_properties['unihomes'] + fixture_properties['zoopla'])
+
+    assert found == {
+        'UH90342': 'RM138404795',
+        'UH90507': 'RM138402466',
+        'ZP60310001': 'RM138400000',
+        'ZP60310002': 'RM138400137',
+    }
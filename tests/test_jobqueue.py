@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+from jobqueue import JobQueue
+
+# Short enough for a test to wait out a lease
+LEASE_SECONDS = 0.05
+
+SEARCH = {'min_price': 0, 'max_price': 4000, 'num_bedrooms': 4, 'num_people': 4, 'base_url': None}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def wait_out_lease():
+    time.sleep(LEASE_SECONDS * 2)
+
+
+def test_jobs_are_leased_oldest_first_and_once(queue):
+    first, second = queue.enqueue('rightmove', SEARCH, [[1, 2], [3]])
+    rightmove = queue.lease('a', LEASE_SECONDS)
+    assert (rightmove.id, rightmove.site, rightmove.search, rightmove.pages, rightmove.attempts) == (first, 'rightmove', SEARCH, [1, 2], 1)
+    assert queue.lease('b', LEASE_SECONDS).id == second
+    assert queue.lease('c', LEASE_SECONDS) is None
+    assert queue.counts() == {'queued': 0, 'leased': 2, 'done': 0, 'failed': 0}
+
+
+def test_lease_filters_by_site(queue):
+    queue.enqueue('rightmove', SEARCH, [[1]])
+    (zoopla,) = queue.enqueue('zoopla', SEARCH, [[1]])
+    assert queue.lease('a', LEASE_SECONDS, sites=['zoopla']).id == zoopla
+    assert queue.lease('a', LEASE_SECONDS, sites=['zoopla']) is None
+
+
+def test_expired_lease_goes_back_to_the_queue(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    queue.lease('a', LEASE_SECONDS)
+    wait_out_lease()
+
+    job = queue.lease('b', LEASE_SECONDS)
+    assert (job.id, job.attempts) == (job_id, 2)
+
+
+def test_extended_lease_is_kept(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    queue.lease('a', LEASE_SECONDS)
+    assert queue.extend(job_id, 'a', 60)
+    assert not queue.extend(job_id, 'b', 60)
+    wait_out_lease()
+
+    assert queue.lease('b', LEASE_SECONDS) is None
+    assert queue.complete(job_id, 'a', {'properties': []})
+
+
+def test_requeue_expired_fails_a_job_out_of_attempts(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    for _ in range(queue.max_attempts):
+        queue.lease('a', LEASE_SECONDS)
+        wait_out_lease()
+
+    with queue.transaction():
+        queue.requeue_expired(time.time())
+    assert queue.counts()['failed'] == 1
+    assert queue.finished([job_id]) == {job_id: ('failed', None, 'lease expired')}
+
+
+def test_failed_job_is_retried_until_max_attempts(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    queue.lease('a', LEASE_SECONDS)
+    queue.fail(job_id, 'a', 'FetchError')
+    assert queue.counts()['queued'] == 1
+    assert queue.finished([job_id]) == {}
+
+    job = queue.lease('b', LEASE_SECONDS)
+    assert job.attempts == queue.max_attempts
+    queue.fail(job_id, 'b', 'FetchError')
+    assert queue.finished([job_id]) == {job_id: ('failed', None, 'FetchError')}
+    assert queue.lease('c', LEASE_SECONDS) is None
+
+
+def test_fail_is_ignored_from_a_worker_without_the_lease(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    queue.lease('a', LEASE_SECONDS)
+    queue.fail(job_id, 'b', 'FetchError')
+    assert queue.counts()['leased'] == 1
+
+
+def test_complete_is_ignored_after_the_lease_was_lost(queue):
+    (job_id,) = queue.enqueue('rightmove', SEARCH, [[1]])
+    queue.lease('a', LEASE_SECONDS)
+    wait_out_lease()
+    queue.lease('b', LEASE_SECONDS)
+
+    assert not queue.complete(job_id, 'a', {'properties': ['late']})
+    assert not queue.extend(job_id, 'a', 60)
+    assert queue.complete(job_id, 'b', {'properties': []})
+    assert queue.finished([job_id]) == {job_id: ('done', {'properties': []}, None)}
+
+    queue.delete([job_id])
+    assert queue.counts() == {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
@@ -0,0 +1,96 @@
+import asyncio
+import re
+import time
+
+from conftest import RecordingChannel
+from notify import MESSAGE_LIMIT, NotificationDispatcher, split_table
+from scrapers import Property
+from tables import TableCache
+
+
+def make_property(number: int) -> Property:
+    return Property.from_fields(f'RM{number}', 738000, 1000 + number, 230, f'{number} Coldharbour Lane, London SE15',
+                                f'https://www.rightmove.co.uk/properties/{number}')
+
+
+def listed(messages) -> list:
+    """Returns the propertyIds of the table rows in the messages, in order
+    """
+    return [propertyId for message in messages for propertyId in re.findall(r'^\|\s+(RM\d+)\s+\|', message, re.MULTILINE)]
+
+
+def make_dispatcher(**options) -> NotificationDispatcher:
+    table_cache = TableCache()
+    return NotificationDispatcher(lambda properties: table_cache.render(properties, 'pipe'), **options)
+
+
+def test_bursts_are_coalesced_into_one_message():
+    channel = RecordingChannel(id=1)
+
+    async def run():
+        dispatcher = make_dispatcher(coalesce_delay=0.1)
+        dispatcher.notify(channel, [make_property(1), make_property(2)])
+        await asyncio.sleep(0.02)
+        dispatcher.notify(channel, [make_property(2), make_property(3)])
+        await asyncio.sleep(0.3)
+        await dispatcher.close()
+
+    asyncio.run(run())
+    assert len(channel.messages) == 1
+    # The property queued by both bursts is listed once
+    assert listed(channel.messages) == ['RM1', 'RM2', 'RM3']
+
+
+def test_sends_respect_the_channel_rate_limit():
+    channel = RecordingChannel(id=1)
+    capacity, period = 2, 0.2
+
+    async def run():
+        dispatcher = make_dispatcher(channel_rate=(capacity, period))
+        for number in range(6):
+            await dispatcher.send(channel, f'message {number}')
+
+    asyncio.run(run())
+    assert len(channel.messages) == 6
+    # The bucket lets a burst of capacity messages through, then one message every period / capacity seconds
+    gaps = [later - earlier for earlier, later in zip(channel.sent_at[capacity - 1:], channel.sent_at[capacity:])]
+    assert all(gap >= period / capacity * 0.9 for gap in gaps)
+
+
+def test_long_tables_are_split_under_the_message_limit():
+    properties = [make_property(number) for number in range(100)]
+    table = TableCache().render(properties, 'pipe')
+    header = '\n'.join(table.splitlines()[:2])
+    messages = split_table('New properties:', table)
+
+    assert len(messages) > 1
+    assert all(len(message) <= MESSAGE_LIMIT for message in messages)
+    assert all(header in message for message in messages)
+    assert listed(messages) == [f'RM{number}' for number in range(100)]
+
+
+def test_close_flushes_queued_notifications():
+    channel = RecordingChannel(id=1)
+
+    async def run():
+        dispatcher = make_dispatcher(coalesce_delay=30, channel_rate=(100, 1.0))
+        dispatcher.notify(channel, [make_property(number) for number in range(100)])
+        start = time.monotonic()
+        await dispatcher.close()
+        return time.monotonic() - start
+
+    # Sent straight away instead of after the coalesce delay
+    assert asyncio.run(run()) < 5
+    assert len(channel.messages) > 1
+    assert listed(channel.messages) == [f'RM{number}' for number in range(100)]
+
+
+def test_failed_sends_are_retried():
+    channel = RecordingChannel(id=1, fail_first=1)
+
+    async def run():
+        dispatcher = make_dispatcher()
+        return await dispatcher.send(channel, 'hello')
+
+    assert asyncio.run(run())
+    assert channel.messages == ['hello']
@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import SITES, fixture_pages, make_scraper
+from parsers import PARSERS, available_parsers, default_parser, get_parser
+
+# The number of listings on the recorded pages of each site
+FIXTURE_LISTINGS = {'rightmove': 60, 'unihomes': 30, 'zoopla': 38}
+
+
+def parsed_rows(site: str, parser_name: str) -> list:
+    scraper = make_scraper(site, parser=get_parser(parser_name))
+    return [prop.to_row() for html in fixture_pages(site) for prop in scraper.parse_html(html)]
+
+
+@pytest.mark.parametrize('site', SITES)
+@pytest.mark.parametrize('parser_name', [name for name in PARSERS if name != 'soup'])
+def test_backend_matches_soup(site, parser_name):
+    if parser_name not in available_parsers():
+        pytest.skip(f'{parser_name} needs a package that is not installed')
+    reference = parsed_rows(site, 'soup')
+
+    assert len(reference) == FIXTURE_LISTINGS[site]
+    assert parsed_rows(site, parser_name) == reference
+
+
+def test_default_parser_is_the_fastest_installed():
+    assert default_parser() == ('lxml' if 'lxml' in available_parsers() else 'strainer')
+    assert get_parser().name == default_parser()
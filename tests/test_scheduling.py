@@ -0,0 +1,74 @@
+from scheduling import AdaptiveSchedule
+
+
+def make_schedule(**options) -> AdaptiveSchedule:
+    options.setdefault('jitter', 0)
+    return AdaptiveSchedule(base_interval=3600, min_interval=300, max_interval=7200, **options)
+
+
+def test_first_scrape_keeps_the_base_interval():
+    schedule = make_schedule()
+    assert schedule.record_scrape('rightmove', 50, 1, now=0) == 3600
+    assert schedule.site('rightmove').arrival_rate == 0
+
+
+def test_quiet_site_backs_off_up_to_max_interval():
+    schedule = make_schedule()
+    now = 0
+    delays = [schedule.record_scrape('rightmove', 0, 1, now=now)]
+    for _ in range(4):
+        now += delays[-1]
+        delays.append(schedule.record_scrape('rightmove', 0, 1, now=now))
+
+    assert delays == [3600, 5400, 7200, 7200, 7200]
+    assert schedule.site('rightmove').quiet_scrapes == 4
+
+
+def test_busy_site_is_scraped_more_often_down_to_min_interval():
+    schedule = make_schedule(smoothing=1)
+    schedule.record_scrape('rightmove', 0, 1, now=0)
+
+    # 4 new listings an hour: 2 per scrape every half hour
+    assert schedule.record_scrape('rightmove', 4, 1, now=3600) == 1800
+    assert schedule.site('rightmove').quiet_scrapes == 0
+    # 200 new listings an hour would be a scrape every 36 seconds
+    assert schedule.record_scrape('rightmove', 100, 1, now=5400) == 300
+
+
+def test_site_budget_wins_over_min_interval():
+    schedule = make_schedule(smoothing=1, site_budgets={'zoopla': 60})
+    schedule.record_scrape('zoopla', 0, 10, now=0)
+
+    # 10 pages a scrape under 60 pages an hour is a scrape every 10 minutes at most
+    assert schedule.record_scrape('zoopla', 100, 10, now=3600) == 600
+
+
+def test_request_ceiling_is_shared_between_sites():
+    schedule = make_schedule(smoothing=1, request_ceiling=30)
+    # The first site takes 20 pages an hour of the 30
+    schedule.record_scrape('rightmove', 0, 20, now=0)
+    assert schedule.requests_per_hour() == 20
+
+    # The second leaves the first its share: 5 pages a scrape in the 10 left is a scrape every half hour at most
+    schedule.record_scrape('unihomes', 0, 5, now=0)
+    assert schedule.record_scrape('unihomes', 100, 5, now=3600) == 1800
+
+
+def test_delay_is_jittered_within_bounds():
+    schedule = make_schedule(jitter=0.1)
+    delays = [schedule.record_scrape(f'site{number}', 0, 1, now=0) for number in range(50)]
+
+    assert all(3240 <= delay <= 3960 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_state_is_restored():
+    schedule = make_schedule()
+    schedule.record_scrape('rightmove', 0, 3)
+    schedule.record_scrape('rightmove', 0, 3)
+
+    restored = make_schedule()
+    restored.restore(schedule.state())
+    site = restored.site('rightmove')
+    assert (site.interval, site.pages_per_scrape, site.quiet_scrapes) == (5400, 3, 1)
+    assert abs(site.last_scrape - schedule.site('rightmove').last_scrape) < 1
@@ -0,0 +1,24 @@
+import pickle
+
+from conftest import make_scraper
+from transport import Transport
+
+
+def test_stale_check_parse_is_reused(fixture_server):
+    transport = Transport()
+    try:
+        scraper = make_scraper('rightmove', base_url=fixture_server.url, transport=transport)
+        scraper.incremental = True
+        # A previous scrape saw listings newer than any recorded one, so the first page is stale
+        scraper.high_water_mark = 10 ** 6
+
+        pages = scraper.fetch_pages()
+    finally:
+        transport.close()
+
+    assert len(pages) == 1
+    assert len(scraper.cached_parse(pages[0])) == 24
+    # The parses stay in this process, they are not shipped to the parsing processes with the scraper
+    assert pickle.loads(pickle.dumps(scraper)).page_parses == {}
+    scraper.after_scrape(scraper.cached_parse(pages[0]))
+    assert scraper.cached_parse(pages[0]) is None
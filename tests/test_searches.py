@@ -0,0 +1,114 @@
+import pytest
+
+from scrapers import DataStorage, Property, RightMoveScraper, UniHomesScraper
+from searches import SearchRegistry
+
+
+def make_property(propertyId: str, pricepm: int, pricepw: int) -> Property:
+    return Property.from_fields(propertyId, 738000, pricepm, pricepw, 'Long Lane, London SE1', f'https://example.com/{propertyId}', num_people=4)
+
+
+def test_register_and_unregister():
+    registry = SearchRegistry()
+    search = registry.register(1, 200, 3500, 4, 4)
+
+    assert 1 in registry and len(registry) == 1
+    assert registry.get(1) is search
+    assert registry.group_of(search).searches == [search]
+
+    registry.unregister(1)
+    assert 1 not in registry and len(registry) == 0
+    assert registry.groups == {}
+    with pytest.raises(KeyError):
+        registry.get(1)
+
+
+def test_registering_again_replaces_the_search_and_keeps_its_store():
+    registry = SearchRegistry()
+    first = registry.register(1, 200, 3500, 4, 4)
+    first.data_storage.add_properties([make_property('RM1', 3000, 170)])
+
+    second = registry.register(1, 250, 4000, 3, 3)
+    assert registry.get(1) is second
+    assert second.data_storage is first.data_storage
+    assert list(registry.groups) == [(3, 3)]
+
+
+def test_storage_factory_builds_each_new_search_store():
+    channel_ids = []
+
+    def storage_factory(channel_id: int) -> DataStorage:
+        channel_ids.append(channel_id)
+        return DataStorage()
+
+    registry = SearchRegistry(storage_factory)
+    registry.register(1, 200, 3500, 4, 4)
+    registry.register(2, 200, 3500, 4, 4)
+    registry.register(1, 250, 4000, 4, 4)
+    assert channel_ids == [1, 2]
+
+
+def test_searches_share_a_group_by_bedrooms_and_people():
+    registry = SearchRegistry()
+    cheap = registry.register(1, 150, 2500, 4, 4)
+    dear = registry.register(2, 250, 4000, 4, 4)
+    other = registry.register(3, 250, 4000, 4, 3)
+
+    group = registry.group_of(cheap)
+    assert registry.group_of(dear) is group
+    assert registry.group_of(other) is not group
+    assert set(registry.groups) == {(4, 4), (4, 3)}
+    assert (group.max_price_per_week, group.max_price_per_month) == (250, 4000)
+
+    registry.unregister(2)
+    assert (group.max_price_per_week, group.max_price_per_month) == (150, 2500)
+    assert registry.groups[(4, 4)] is group
+
+
+def test_group_scrapers_follow_the_widest_price_of_the_group():
+    registry = SearchRegistry()
+    search = registry.register(1, 150, 2500, 4, 4)
+    group = registry.group_of(search)
+    group.RMscraper = RightMoveScraper(0, group.max_price_per_month, 4, 4)
+    group.UHscraper = UniHomesScraper(0, group.max_price_per_week, 4, 4)
+
+    registry.register(2, 250, 4000, 4, 4)
+    assert group.RMscraper.max_price == 4000 and 'maxPrice=4000' in group.RMscraper.url
+    assert group.UHscraper.max_price == 250
+
+    registry.unregister(2)
+    assert group.RMscraper.max_price == 2500 and 'maxPrice=2500' in group.RMscraper.url
+    assert group.UHscraper.max_price == 150
+
+    group.set_scraper(UniHomesScraper.SITE, None)
+    assert group.scrapers == [group.RMscraper]
+
+
+def test_fan_out_gives_each_search_its_own_results():
+    registry = SearchRegistry()
+    cheap = registry.register(1, 150, 2500, 4, 4)
+    dear = registry.register(2, 250, 4000, 4, 4)
+    group = registry.group_of(cheap)
+    low, high = make_property('RM1', 2400, 135), make_property('RM2', 3600, 200)
+    rightmove, unihomes = RightMoveScraper(0, 4000, 4, 4), UniHomesScraper(0, 250, 4, 4)
+
+    assert group.fan_out(rightmove, [low, high]) == {cheap: [low], dear: [low, high]}
+    assert group.fan_out(unihomes, [low, high]) == {cheap: [low], dear: [low, high]}
+
+    # Each site is filtered on its own price: a listing cheap per week but dear per month only passes on UniHomes
+    mixed = make_property('UH1', 3600, 140)
+    assert not cheap.accepts(rightmove, mixed)
+    assert cheap.accepts(unihomes, mixed)
+    assert not cheap.accepts(rightmove, make_property('RM3', None, 100))
+
+
+def test_group_knows_a_listing_only_once_every_search_does():
+    registry = SearchRegistry()
+    first = registry.register(1, 250, 4000, 4, 4)
+    second = registry.register(2, 250, 4000, 4, 4)
+    group = registry.group_of(first)
+
+    first.data_storage.add_properties([make_property('RM1', 3000, 170)])
+    assert not group.is_known('RM1')
+    second.data_storage.add_properties([make_property('RM1', 3000, 170)])
+    assert group.is_known('RM1')
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from sites import RIGHTMOVE, UNIHOMES
+
+TODAY = datetime(2026, 10, 9)
+
+
+def rightmove_row(**fields) -> dict:
+    row = {'pricepm': '£2,400 pcm', 'pricepw': '£554 pw', 'link': '/properties/138400000#/',
+           'location': '  Coldharbour Lane,\n   London SE15 ', 'date': 'Added on 08/10/2026'}
+    row.update(fields)
+    return row
+
+
+def test_valid_rows_are_normalized():
+    records, failures = RIGHTMOVE.normalize_page([rightmove_row(), rightmove_row(date='Reduced today')], TODAY, 17.7)
+
+    assert failures == {}
+    assert records[0] == ('RM138400000', datetime(2026, 10, 8).toordinal(), 2400, 554, 'Coldharbour Lane, London SE15',
+                          'https://rightmove.co.uk/properties/138400000#/')
+    assert records[1][1] == TODAY.toordinal()
+
+
+def test_malformed_rows_are_dropped_and_counted_by_field():
+    rows = [
+        rightmove_row(),
+        rightmove_row(link=None),
+        rightmove_row(link=''),
+        rightmove_row(location=None),
+        rightmove_row(date='Added on the 40th'),
+        rightmove_row(date=None),
+        rightmove_row(pricepm='POA', pricepw=None),
+        rightmove_row(pricepm=None, pricepw='£554 pw'),
+    ]
+    records, failures = RIGHTMOVE.normalize_page(rows, TODAY, 17.7)
+
+    assert failures == {'link': 2, 'location': 1, 'date': 2, 'pricepm': 1}
+    assert len(records) == 2
+    # The monthly price of a listing with only a weekly one is derived from it
+    assert records[1][2:4] == (int(554 * 17.7), 554)
+
+
+def test_site_without_dates_dates_its_listings_today():
+    rows = [{'pricepw': '£230 pppw', 'link': '/student-accommodation/90210', 'location': 'Long Lane, London SE1'},
+            {'pricepw': None, 'link': '/student-accommodation/90211', 'location': 'Long Lane, London SE1'}]
+    records, failures = UNIHOMES.normalize_page(rows, TODAY, 17.7)
+
+    assert failures == {'pricepm': 1}
+    assert [record[1] for record in records] == [TODAY.toordinal()]
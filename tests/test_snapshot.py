@@ -0,0 +1,49 @@
+import asyncio
+
+from conftest import make_bot
+from scrapers import DataStorage, Property
+from snapshot import Snapshot, read_snapshot, write_snapshot
+
+
+def test_snapshot_round_trip(tmp_path):
+    data_storage = DataStorage()
+    data_storage.add_properties([Property.from_fields('RM1', 738000, 1000, None, '1 Coldharbour Lane, London SE15', 'https://www.rightmove.co.uk/properties/1')])
+    scrapers = [{'num_bedrooms': 4, 'num_people': 4, 'site': 'rightmove', 'high_water_mark': 738000, 'scrapes_since_full_sweep': 3}]
+    path = str(tmp_path / 'snapshot.bin')
+    write_snapshot(path, Snapshot([{'channel_id': 1}], {1: data_storage}, scrapers=scrapers))
+
+    snapshot = read_snapshot(path)
+    assert snapshot.scrapers == scrapers
+    restored = snapshot.stores[1]
+    assert [prop.to_row() for prop in restored.iter_properties()] == [prop.to_row() for prop in data_storage.iter_properties()]
+
+
+def test_restart_keeps_incremental_scrapes_incremental(tmp_path):
+    path = str(tmp_path / 'snapshot.bin')
+
+    async def save():
+        bot = make_bot(path)
+        try:
+            bot.add_parameters(max_ppw=250, num_bedrooms=4, num_ppl=4)
+            bot.build_scrapers()
+            scraper = bot.searches.groups[(4, 4)].scrapers_by_site['rightmove']
+            scraper.high_water_mark, scraper.scrapes_since_full_sweep = 738000, 3
+            await bot.save_snapshot()
+        finally:
+            bot.scrape_executor.shutdown()
+            bot.transport.close()
+
+    async def restore():
+        bot = make_bot(path)
+        try:
+            assert await bot.restore_snapshot()
+            return bot.searches.groups[(4, 4)].scrapers_by_site['rightmove']
+        finally:
+            bot.scheduler.shutdown(wait=False)
+            bot.scrape_executor.shutdown()
+            bot.transport.close()
+
+    asyncio.run(save())
+    scraper = asyncio.run(restore())
+    assert (scraper.high_water_mark, scraper.scrapes_since_full_sweep) == (738000, 3)
+    assert not scraper.full_sweep_due()
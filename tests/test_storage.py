@@ -0,0 +1,23 @@
+from scrapers import DataStorage, Property
+from snapshot import restore_store, store_columns
+from storage import SQLiteDataStorage
+
+COLDHARBOUR = Property.from_fields('RM138403014', 738000, 3475, 802, '108 Coldharbour Lane, London SE15', 'https://www.rightmove.co.uk/properties/138403014')
+OTHER_FLAT = Property.from_fields('ZP60310001', 738000, 3425, None, '167 Coldharbour Lane, London SE15', 'https://www.zoopla.co.uk/to-rent/details/60310001')
+SAME_FLAT = Property.from_fields('ZP60310009', 738000, 3475, None, '108 Coldharbour Lane, London SE15', 'https://www.zoopla.co.uk/to-rent/details/60310009')
+
+
+def test_sqlite_storage_tells_numbered_flats_apart(tmp_path):
+    data_storage = SQLiteDataStorage(str(tmp_path / 'properties.db'))
+    data_storage.add_properties([COLDHARBOUR])
+
+    assert data_storage.check_new_properties([OTHER_FLAT, SAME_FLAT]) == [OTHER_FLAT]
+    data_storage.close()
+
+
+def test_snapshot_keeps_house_numbers():
+    data_storage = DataStorage()
+    data_storage.add_properties([COLDHARBOUR])
+    restored = restore_store(store_columns(data_storage))
+
+    assert restored.check_new_properties([OTHER_FLAT, SAME_FLAT]) == [OTHER_FLAT]
@@ -0,0 +1,30 @@
+from scrapers import DataStorage, Property
+from tables import TableCache
+
+
+def make_property(pricepm: int, num_people: int) -> Property:
+    return Property.from_fields('UH90210', 738000, pricepm, 230, 'Long Lane, London SE1', 'https://www.unihomes.co.uk/student-accommodation/90210',
+                                num_people=num_people)
+
+
+def test_stores_holding_the_same_listing_render_their_own_prices():
+    four_people, two_people = DataStorage(), DataStorage()
+    four_people.add_properties([make_property(4080, 4)])
+    two_people.add_properties([make_property(2040, 2)])
+    table_cache = TableCache()
+
+    assert '4080' in table_cache.latest_table(four_people, 10)
+    table = table_cache.latest_table(two_people, 10)
+    assert '2040' in table and '4080' not in table
+
+
+def test_latest_table_is_rendered_again_after_a_change():
+    data_storage = DataStorage()
+    data_storage.add_properties([make_property(4080, 4)])
+    table_cache = TableCache()
+
+    first = table_cache.latest_table(data_storage, 10)
+    assert table_cache.latest_table(data_storage, 10) is first
+    data_storage.add_properties([Property.from_fields('UH1', 738001, 1000, 100, 'Long Lane, London SE1', 'link')])
+    assert 'UH1' in table_cache.latest_table(data_storage, 10)
+    assert (table_cache.hits, table_cache.misses) == (1, 2)
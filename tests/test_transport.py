@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from transport import CircuitBreaker, CircuitOpenError, Transport
+
+
+def test_cancelled_trial_reopens_the_half_open_circuit():
+    async def run():
+        # Accepts connections but never answers, so the trial request hangs until it is cancelled
+        server = await asyncio.start_server(lambda reader, writer: None, '127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        transport = Transport(failure_threshold=1, reset_timeout=0.0)
+        url = f'http://{host}:{port}/'
+        transport.breaker.record_failure(f'{host}:{port}')
+        try:
+            trial = asyncio.ensure_future(transport.send('GET', url))
+            await asyncio.sleep(0.1)
+            assert transport.breaker.trials[f'{host}:{port}']
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            # The next request is let through as a new trial
+            transport.breaker.before_request(f'{host}:{port}')
+        finally:
+            await transport.close_client()
+            server.close()
+
+    asyncio.run(run())
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure('example.com')
+    breaker.before_request('example.com')
+    breaker.record_failure('example.com')
+
+    breaker.before_request('example.com')
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('example.com')
+    breaker.record_success('example.com')
+    breaker.before_request('example.com')
@@ -0,0 +1,261 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+from multidict import CIMultiDict
+
+from metrics import METRICS, Metrics
+
+
+class TransportError(Exception):
+    """Raised when a request fails before a response arrives: a connection error, a timeout or an open circuit
+    """
+
+
+class CircuitOpenError(TransportError):
+    """Raised instead of sending a request to a host whose circuit is open
+    """
+
+
+def accept_encoding() -> str:
+    # Brotli is only advertised when a decoder is installed, aiohttp decodes it through either package
+    encodings = ['gzip', 'deflate']
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        encodings.append('br')
+        break
+    return ', '.join(encodings)
+
+
+class TransportResponse:
+    """A response read in full: its status, headers, decompressed body and charset
+    """
+
+    def __init__(self, status: int, headers: CIMultiDict, body: bytes, charset: str = None):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.charset = charset
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.charset or 'utf-8', errors='replace')
+
+
+class CircuitBreaker:
+    """Stops requests to a host after failure_threshold failures in a row, for reset_timeout seconds
+
+    Once the timeout is over the circuit is half open: one trial request is let through, closing the circuit
+    if it succeeds and opening it again if it fails
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0, metrics: Metrics = METRICS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.metrics = metrics
+        self.failures: Dict[str, int] = {}
+        self.opened_at: Dict[str, float] = {}
+        self.trials: Dict[str, bool] = {}
+
+    def state(self, host: str) -> str:
+        if host not in self.opened_at:
+            return 'closed'
+        return 'open' if time.monotonic() - self.opened_at[host] < self.reset_timeout else 'half-open'
+
+    def before_request(self, host: str):
+        """Raises CircuitOpenError unless a request to the host may be sent now
+        """
+
+        state = self.state(host)
+        if state == 'open' or (state == 'half-open' and self.trials.get(host)):
+            raise CircuitOpenError(f'Circuit open for {host} after {self.failures[host]} failures')
+        if state == 'half-open':
+            self.trials[host] = True
+
+    def record_success(self, host: str):
+        self.failures.pop(host, None)
+        self.opened_at.pop(host, None)
+        self.trials.pop(host, None)
+        self.metrics.set('propertybot_circuit_open', 0, host=host)
+
+    def release_trial(self, host: str):
+        """Lets another trial request through a half-open circuit, after a trial that ended without telling whether the host
+        recovered, e.g. because it was cancelled
+        """
+        self.trials.pop(host, None)
+
+    def record_failure(self, host: str):
+        self.failures[host] = self.failures.get(host, 0) + 1
+        self.trials.pop(host, None)
+        if self.failures[host] >= self.failure_threshold:
+            if host not in self.opened_at:
+                print(f"Opening the circuit for {host} after {self.failures[host]} failures in a row")
+            self.opened_at[host] = time.monotonic()
+            self.metrics.set('propertybot_circuit_open', 1, host=host)
+
+
+class Transport:
+    """The bot's shared HTTP client: one pool of keep-alive connections, used by every scraper and the pastebin client
+
+    Requests run on the transport's own event loop in a background thread, so callers on any event loop or
+    thread share the same connections: scrapes run in the executor's threads, each on a loop of its own.
+    Responses are decompressed, each request is bounded by a connect, read and total timeout, and a circuit breaker
+    per host fails requests fast while the host keeps failing. HTTP/2 is used if requested and httpx with h2 is installed
+    """
+
+    # Responses counted as failures of the host by the circuit breaker
+    FAILURE_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size: int = 16, per_host: int = 8, keepalive: float = 30.0, connect_timeout: float = 10.0,
+                 read_timeout: float = 20.0, total_timeout: float = 30.0, http2: bool = False, failure_threshold: int = 5,
+                 reset_timeout: float = 60.0, headers: Dict[str, str] = None, metrics: Metrics = METRICS):
+        """Initialises the Transport object, the connections and background loop are only started on the first request
+
+        Args:
+            pool_size (int): The maximum number of open connections
+            per_host (int): The maximum number of open connections to one host
+            keepalive (float): The seconds an idle connection is kept open for reuse
+            connect_timeout (float): The timeout in seconds of opening a connection
+            read_timeout (float): The timeout in seconds between two reads of a response
+            total_timeout (float): The timeout in seconds of a whole request, connecting and reading included
+            http2 (bool): Whether to speak HTTP/2 where the server supports it, needs httpx and h2
+            failure_threshold (int): The number of failures in a row that opens a host's circuit
+            reset_timeout (float): The seconds a circuit stays open before a trial request
+            headers (Dict[str, str]): Extra headers sent with every request
+            metrics (Metrics): The registry the circuit states are recorded in
+        """
+
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.http2 = http2 and self.http2_available()
+        if http2 and not self.http2:
+            print("HTTP/2 needs the httpx and h2 packages, falling back to HTTP/1.1 with keep-alive")
+        self.headers = {'User-Agent': 'Mozilla/5.0 (compatible; PropertyBot)', 'Accept-Encoding': accept_encoding()}
+        self.headers.update(headers or {})
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout, metrics)
+
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.client = None
+
+    @staticmethod
+    def http2_available() -> bool:
+        try:
+            import h2
+            import httpx
+        except ImportError:
+            return False
+        return True
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.thread = threading.Thread(target=self.loop.run_forever, name='http-transport', daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def new_client(self):
+        if self.http2:
+            import httpx
+            limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size, keepalive_expiry=self.keepalive)
+            timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            return httpx.AsyncClient(http2=True, limits=limits, timeout=timeout, headers=self.headers)
+        connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host, keepalive_timeout=self.keepalive, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout, sock_read=self.read_timeout)
+        return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers)
+
+    async def send(self, method: str, url: str, headers: Dict[str, str] = None, data: Dict[str, str] = None) -> TransportResponse:
+        """Sends a request on the transport's loop, through the host's circuit breaker
+        """
+
+        host = urlsplit(url).netloc
+        self.breaker.before_request(host)
+        try:
+            if self.client is None:
+                self.client = self.new_client()
+            if self.http2:
+                import httpx
+                try:
+                    response = await asyncio.wait_for(self.client.request(method, url, headers=headers, data=data), self.total_timeout)
+                except httpx.HTTPError as e:
+                    raise TransportError(repr(e)) from e
+                result = TransportResponse(response.status_code, CIMultiDict(response.headers.multi_items()), response.content, response.charset_encoding)
+            else:
+                try:
+                    async with self.client.request(method, url, headers=headers, data=data) as response:
+                        body = await response.read()
+                        result = TransportResponse(response.status, CIMultiDict(response.headers), body, response.charset)
+                except aiohttp.ClientError as e:
+                    raise TransportError(repr(e)) from e
+        except asyncio.TimeoutError as e:
+            self.breaker.record_failure(host)
+            raise TransportError(f'Timed out requesting {url}') from e
+        except TransportError:
+            self.breaker.record_failure(host)
+            raise
+        except BaseException:
+            # A cancelled request, CancelledError being a BaseException, must not hold the host's trial forever
+            self.breaker.release_trial(host)
+            raise
+
+        if result.status in Transport.FAILURE_STATUSES:
+            self.breaker.record_failure(host)
+        else:
+            self.breaker.record_success(host)
+        return result
+
+    async def request(self, method: str, url: str, headers: Dict[str, str] = None, data: Dict[str, str] = None) -> TransportResponse:
+        """Sends a request from any event loop and returns the response read in full
+
+        Raises:
+            TransportError: If the request failed without a response, CircuitOpenError if the host's circuit is open
+        """
+
+        loop = self.start()
+        if asyncio.get_running_loop() is loop:
+            return await self.send(method, url, headers, data)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.send(method, url, headers, data), loop))
+
+    async def close_client(self):
+        if self.client is not None:
+            await (self.client.aclose() if self.http2 else self.client.close())
+        self.client = None
+
+    def close(self):
+        """Closes the pooled connections and stops the background loop
+        """
+
+        with self.lock:
+            loop, thread = self.loop, self.thread
+            self.loop = self.thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.close_client(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+
+# The transport of scrapers and fetchers not given one, e.g. in benchmarks, started on first use
+SHARED_TRANSPORT = None
+SHARED_TRANSPORT_LOCK = threading.Lock()
+
+
+def shared_transport() -> Transport:
+    global SHARED_TRANSPORT
+    with SHARED_TRANSPORT_LOCK:
+        if SHARED_TRANSPORT is None:
+            SHARED_TRANSPORT = Transport()
+        return SHARED_TRANSPORT
@@ -0,0 +1,110 @@
+"""Scrape worker: leases scrape jobs from the bot's JobQueue, fetches and parses their pages, and stores the listings found
+
+Run one or more next to the bot, sharing its WORKER_QUEUE database:
+
+    python -m worker --queue propertybot-jobs.db
+"""
+
+import argparse
+import os
+import socket
+import time
+from typing import Callable
+
+from jobqueue import Job, JobQueue
+from parsers import available_parsers, default_parser, get_parser
+from scrapers import SITE_SCRAPERS
+from transport import Transport
+
+# Seconds a job is leased for, extended once its pages are fetched
+LEASE_SECONDS = 120
+
+
+def run_job(job: Job, parser_name: str, transport: Transport, on_fetched: Callable[[], object] = None) -> dict:
+    """Fetches and parses the pages of a job, calling on_fetched once the pages are fetched, e.g. to extend the job's lease
+
+    Returns:
+        dict: The normalized listings of each page by page number, as Property.to_row rows, the number of listings dropped
+            for each field, the parse time and, for a job holding the first page, the number of results pages
+    """
+
+    scraper = SITE_SCRAPERS[job.site](**job.search, parser=get_parser(parser_name), transport=transport)
+    html_by_page = scraper.fetch_page_numbers(job.pages)
+    if on_fetched is not None:
+        on_fetched()
+
+    result = {'pages': {}, 'failures': {}, 'parse_seconds': 0.0}
+    first_page = scraper.SPEC.pagination.first_page
+    if first_page in html_by_page:
+        scraper.soup = scraper.SPEC.pagination.soup(html_by_page[first_page])
+        result['num_of_pages'] = scraper.num_of_pages()
+    for page, html in html_by_page.items():
+        start = time.perf_counter()
+        properties, failures = scraper.parse_page(html)
+        result['parse_seconds'] += time.perf_counter() - start
+        result['pages'][str(page)] = [prop.to_row() for prop in properties]
+        for field, dropped in failures.items():
+            result['failures'][field] = result['failures'].get(field, 0) + dropped
+    return result
+
+
+def work(queue: JobQueue, worker: str, parser_name: str = None, sites: list = None, lease_seconds: float = LEASE_SECONDS,
+         poll_interval: float = 1.0, max_jobs: int = None) -> int:
+    """Runs jobs from the queue until max_jobs have been run, or forever
+
+    A job that raises is handed back to the queue for another attempt, by this or another worker
+
+    Returns:
+        int: The number of jobs run
+    """
+
+    transport = Transport()
+    jobs_run = 0
+    try:
+        while max_jobs is None or jobs_run < max_jobs:
+            job = queue.lease(worker, lease_seconds, sites)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            jobs_run += 1
+            start = time.perf_counter()
+            try:
+                result = run_job(job, parser_name, transport, lambda: queue.extend(job.id, worker, lease_seconds))
+            except Exception as e:
+                print(f"Job {job.id} ({job.site} pages {job.pages}, attempt {job.attempts}) failed: {e!r}")
+                queue.fail(job.id, worker, repr(e))
+                continue
+            if queue.complete(job.id, worker, result):
+                print(f"Job {job.id}: {job.site} pages {job.pages} in {time.perf_counter() - start:.2f}s")
+            else:
+                print(f"Job {job.id}: lease lost before the result was stored, another worker will run it")
+    finally:
+        transport.close()
+    return jobs_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run scrape jobs from the bot\'s job queue')
+    parser.add_argument('--queue', default=os.getenv('WORKER_QUEUE'), help='path of the job queue database, WORKER_QUEUE by default')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}-{os.getpid()}', help='name of this worker in the queue')
+    parser.add_argument('--parser', default=os.getenv('PARSER') or default_parser(), choices=available_parsers(), help='parser backend')
+    parser.add_argument('--sites', nargs='+', choices=sorted(SITE_SCRAPERS), help='only run jobs of these sites')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS, help='seconds a job is leased for before another worker may take it')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds to wait when the queue is empty')
+    parser.add_argument('--max-jobs', type=int, help='exit after running this many jobs')
+    args = parser.parse_args()
+    if not args.queue:
+        parser.error('--queue or WORKER_QUEUE is required')
+
+    queue = JobQueue(args.queue)
+    print(f"Worker {args.worker_id} waiting for jobs in {args.queue}")
+    try:
+        work(queue, args.worker_id, args.parser, args.sites, args.lease, args.poll_interval, args.max_jobs)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        queue.close()
+
+
+if __name__ == '__main__':
+    main()